@@ -1,5 +1,5 @@
 import os
-from flask import Flask, send_from_directory
+from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
@@ -19,7 +19,48 @@ def create_app(test_config=None):
         SECRET_KEY=os.environ.get('SECRET_KEY', 'dev'),
         JWT_SECRET_KEY=os.environ.get('JWT_SECRET_KEY', 'dev-jwt-secret'),
         MONGO_URI=os.environ.get('MONGO_URI', 'mongodb://localhost:27017/linkedin_clone'),
+        MONGO_MAX_POOL_SIZE=int(os.environ.get('MONGO_MAX_POOL_SIZE', 100)),
+        MONGO_MIN_POOL_SIZE=int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+        MONGO_WAIT_QUEUE_TIMEOUT_MS=os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+        MONGO_COMPRESSORS=os.environ.get('MONGO_COMPRESSORS'),
+        SYNC_INDEXES_ON_STARTUP=os.environ.get('SYNC_INDEXES_ON_STARTUP', 'false').lower() in ('1', 'true', 'yes'),
+        BCRYPT_ROUNDS=int(os.environ.get('BCRYPT_ROUNDS', 12)),
+        BCRYPT_POOL_SIZE=int(os.environ.get('BCRYPT_POOL_SIZE', 2)),
+        # Derived from SERVER_THREADS when unset
+        BCRYPT_MAX_QUEUE=os.environ.get('BCRYPT_MAX_QUEUE'),
+        USER_CACHE_SIZE=int(os.environ.get('USER_CACHE_SIZE', 10000)),
+        USER_CACHE_TTL=float(os.environ.get('USER_CACHE_TTL', 30)),
+        PROFILE_CACHE_SIZE=int(os.environ.get('PROFILE_CACHE_SIZE', 5000)),
+        PROFILE_CACHE_TTL=float(os.environ.get('PROFILE_CACHE_TTL', 10)),
+        PROFILE_CACHE_L2_URL=os.environ.get('PROFILE_CACHE_L2_URL'),
+        PROFILE_CACHE_L2_TTL=float(os.environ.get('PROFILE_CACHE_L2_TTL', 300)),
+        # Worker processes (as for gunicorn); several need a shared PROFILE_CACHE_L2_URL
+        WEB_CONCURRENCY=int(os.environ.get('WEB_CONCURRENCY', 1)),
+        COMPRESS_MIN_SIZE=int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+        COMPRESS_GZIP_LEVEL=int(os.environ.get('COMPRESS_GZIP_LEVEL', 6)),
+        COMPRESS_BROTLI_QUALITY=int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4)),
+        STATIC_METADATA_TTL=float(os.environ.get('STATIC_METADATA_TTL', 60)),
+        STATIC_ACCEL_PREFIX=os.environ.get('STATIC_ACCEL_PREFIX'),
+        USE_X_SENDFILE=os.environ.get('USE_X_SENDFILE', 'false').lower() in ('1', 'true', 'yes'),
+        IMAGE_WORKERS=int(os.environ.get('IMAGE_WORKERS', 2)),
+        IMAGE_VARIANT_FORMAT=os.environ.get('IMAGE_VARIANT_FORMAT', 'webp'),
+        IMAGE_QUALITY=int(os.environ.get('IMAGE_QUALITY', 80)),
         UPLOAD_FOLDER=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'),
+        MAX_UPLOAD_SIZE=int(os.environ.get('MAX_UPLOAD_SIZE', 10 * 1024 * 1024)),
+        # Whole request bodies, e.g. several images uploaded at once
+        MAX_CONTENT_LENGTH=int(os.environ.get('MAX_CONTENT_LENGTH', 50 * 1024 * 1024)),
+        UPLOAD_CHUNK_SIZE=int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024)),
+        UPLOAD_SESSION_TTL=float(os.environ.get('UPLOAD_SESSION_TTL', 86400)),
+        UPLOAD_MAX_SESSIONS=int(os.environ.get('UPLOAD_MAX_SESSIONS', 5)),
+        UPLOAD_MAX_PENDING_BYTES=int(os.environ.get('UPLOAD_MAX_PENDING_BYTES', 50 * 1024 * 1024)),
+        SERVER_THREADS=int(os.environ.get('SERVER_THREADS', 4)),
+        SOCKETIO_SERVE=os.environ.get('SOCKETIO_SERVE', 'true').lower() in ('1', 'true', 'yes'),
+        SOCKETIO_ASYNC_MODE=os.environ.get('SOCKETIO_ASYNC_MODE', 'threading'),
+        SOCKETIO_MESSAGE_QUEUE=os.environ.get('SOCKETIO_MESSAGE_QUEUE'),
+        SOCKETIO_CORS_ORIGINS=os.environ.get('SOCKETIO_CORS_ORIGINS', '*'),
+        PRESENCE_TTL=float(os.environ.get('PRESENCE_TTL', 60)),
+        PRESENCE_BACKEND_URL=os.environ.get('PRESENCE_BACKEND_URL'),
+        TYPING_TTL=float(os.environ.get('TYPING_TTL', 6)),
     )
     
     # Override with test config if provided
@@ -27,6 +68,14 @@ def create_app(test_config=None):
         # Use a separate test database to avoid conflicts
         app.config['MONGO_URI'] = os.environ.get('TEST_MONGO_URI', 'mongodb://localhost:27017/linkedin_clone_test')
     
+    # Serialize JSON responses with orjson (ISO 8601 datetimes, ObjectIds as strings)
+    from app.api.utils import json_provider
+    json_provider.init_app(app)
+    
+    # Compress large JSON responses (gzip, or brotli when installed)
+    from app.api.utils import compression
+    compression.init_app(app)
+    
     # Initialize JWT
     jwt = JWTManager(app)
     
@@ -43,6 +92,46 @@ def create_app(test_config=None):
     app.register_blueprint(message_bp, url_prefix='/api/message')
     app.register_blueprint(settings_bp, url_prefix='/api/settings')
     
+    # Reset the per-request model identity map after every request
+    from app.api.models import identity_map
+    identity_map.init_app(app)
+    
+    # Run bcrypt on a bounded pool and answer 503 when it is saturated
+    from app.api.services import password_hasher
+    password_hasher.init_app(app)
+    
+    @app.errorhandler(password_hasher.PasswordHasherBusy)
+    def handle_password_hasher_busy(e):
+        response = jsonify({"status": False, "message": "Server is busy, please try again shortly"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+    
+    @app.errorhandler(413)
+    def handle_request_too_large(e):
+        return jsonify({"status": False, "message": "Request is too large"}), 413
+    
+    # Generate image variants on a background pool
+    from app.api.services import image_service
+    image_service.init_app(app)
+    
+    # Track who is online and typing (shared between processes with PRESENCE_BACKEND_URL)
+    from app.api.services import presence
+    presence.init_app(app)
+    
+    # Push new messages, read receipts and collaboration updates over Socket.IO
+    from app.api import sockets
+    sockets.init_app(app)
+    
+    # Register CLI commands (e.g. `flask db sync-indexes`, `flask static precompress`)
+    from app.cli import db_cli, media_cli, static_cli
+    app.cli.add_command(db_cli)
+    app.cli.add_command(media_cli)
+    app.cli.add_command(static_cli)
+    
+    # Optionally build indexes at startup instead of running the CLI command
+    from app.config.database import sync_indexes_on_startup
+    sync_indexes_on_startup(app)
+    
     # Create required directories for uploads if they don't exist
     os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'profiles'), exist_ok=True)
     os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'projects'), exist_ok=True)
@@ -51,22 +140,13 @@ def create_app(test_config=None):
     static_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/.next')
     os.makedirs(static_folder, exist_ok=True)
     
-    # Serve static files from the root route
-    @app.route('/', defaults={'path': 'server/pages/index.html'})
-    @app.route('/<path:path>')
-    def serve_static(path):
-        return send_from_directory(static_folder, path)
-
-    # Serve public images or other public assets
-    @app.route('/images/<path:filename>')
-    def serve_public_images(filename):
-        public_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/images')
-        return send_from_directory(public_folder, filename)
-    
-    # Add route specifically for Next.js static files
-    @app.route('/_next/<path:path>')
-    def serve_next_static(path):
-        return send_from_directory("static/.next", path)
-        # return send_from_directory(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/.next'), path)
+    # Serve the Next.js build and public images (precompressed siblings, cached metadata)
+    from app.api.services import static_files
+    public_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/images')
+    static_files.init_app(app, static_folder, public_folder)
+    
+    # Serve uploaded media (content-addressed files are cached as immutable)
+    from app.api.services import media_storage
+    media_storage.init_app(app)
     
     return app 
\ No newline at end of file
@@ -0,0 +1,47 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# New message, to both participants
+MESSAGE_NEW = "message:new"
+# A single message was read, to both participants
+MESSAGE_READ = "message:read"
+# A participant read a whole conversation, to both participants
+CONVERSATION_READ = "conversation:read"
+# New collaboration request, to the project owner
+COLLABORATION_REQUEST_NEW = "collaboration_request:new"
+# Accepted or rejected collaboration request, to the requester and the owner
+COLLABORATION_REQUEST_UPDATED = "collaboration_request:updated"
+# A participant started or stopped typing, to the other participant
+TYPING = "typing"
+
+_subscribers = []
+_lock = threading.Lock()
+
+def subscribe(handler):
+    """Call handler(event, payload, user_ids) for every published event"""
+    with _lock:
+        if handler not in _subscribers:
+            _subscribers.append(handler)
+    return handler
+
+def unsubscribe(handler):
+    """Stop calling a subscribed handler"""
+    with _lock:
+        if handler in _subscribers:
+            _subscribers.remove(handler)
+
+def publish(event, payload, user_ids):
+    """Deliver an event for a set of users to every subscriber.
+
+    Models publish once their write is committed; the Socket.IO layer in
+    app/api/sockets.py pushes the events to the users' connections. A
+    failing subscriber never fails the write.
+    """
+    user_ids = sorted({str(user_id) for user_id in user_ids if user_id})
+    for handler in list(_subscribers):
+        try:
+            handler(event, payload, user_ids)
+        except Exception:
+            logger.exception("Could not deliver %s event", event)
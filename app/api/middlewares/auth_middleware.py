@@ -26,8 +26,8 @@ def token_required(f):
         if not result["status"]:
             return jsonify(result), 401
         
-        # Get user from database
-        current_user = User.find_by_id(result["user_id"])
+        # Get user from the short-lived user cache (or the database)
+        current_user = User.find_by_id_cached(result["user_id"])
         
         if not current_user:
             return jsonify({"status": False, "message": "User not found"}), 401
@@ -0,0 +1,270 @@
+from bson import ObjectId
+from app.config.database import db
+from app.api.models import identity_map
+
+# Every model class that declares a collection, in definition order
+MODEL_REGISTRY = []
+
+class _Attributes:
+    """Item access over a model's top-level attributes, used to resolve dotted paths"""
+    __slots__ = ("obj",)
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __getitem__(self, key):
+        return getattr(self.obj, key)
+
+    def __setitem__(self, key, value):
+        object.__setattr__(self.obj, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self.obj, key, default)
+
+    def setdefault(self, key, default):
+        try:
+            return getattr(self.obj, key)
+        except AttributeError:
+            object.__setattr__(self.obj, key, default)
+            return default
+
+class Model:
+    """Base class for MongoDB backed models.
+
+    Subclasses declare the collection they live in, the indexes their queries
+    need and representative query shapes used to check those indexes with
+    explain(). See app/config/indexes.py.
+    
+    Models use __slots__, so subclasses must declare every field they store.
+    """
+    __slots__ = ("_id", "_changes")
+    
+    collection_name = None
+
+    # List of pymongo.IndexModel
+    indexes = []
+
+    # Mapping of query name -> (filter, sort) for every query the model issues
+    query_shapes = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.collection_name:
+            MODEL_REGISTRY.append(cls)
+    
+    def __new__(cls, *args, **kwargs):
+        obj = super().__new__(cls)
+        # Not tracking until the document is loaded or inserted
+        object.__setattr__(obj, "_changes", None)
+        return obj
+    
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        # Assigning a public attribute of a loaded document marks it dirty
+        if self._changes is not None and name[0] != "_":
+            self._queue("$set", name, value)
+    
+    # ---- Dirty tracking ----
+    
+    def _start_tracking(self):
+        """Start recording changes, e.g. once the document is loaded or inserted"""
+        self._changes = {}
+    
+    def _is_tracking(self):
+        return self._changes is not None
+    
+    @staticmethod
+    def _paths_conflict(path, other):
+        """Check whether two update paths overlap (equal or one contains the other)"""
+        return path == other or path.startswith(other + ".") or other.startswith(path + ".")
+    
+    def _queue(self, operator, path, value):
+        """Record an update operator for a path.
+        
+        The local attribute must already hold the new state: when operators
+        would conflict in a single MongoDB update, the whole top-level field is
+        written with $set from the local value instead.
+        """
+        changes = self._changes
+        conflicts = [(op, other) for op, other in changes if self._paths_conflict(path, other)]
+        
+        if not conflicts:
+            changes[(operator, path)] = value
+            return
+        
+        if operator == "$set" and all(other.startswith(path) for op, other in conflicts):
+            # A $set of a path replaces any pending change underneath it
+            for key in conflicts:
+                del changes[key]
+            changes[("$set", path)] = value
+            return
+        
+        if operator == "$inc" and conflicts == [("$inc", path)]:
+            changes[("$inc", path)] += value
+            return
+        
+        # Fall back to rewriting the top-level field from local state
+        field = path.split(".", 1)[0]
+        for key in list(changes):
+            if self._paths_conflict(field, key[1]):
+                del changes[key]
+        changes[("$set", field)] = getattr(self, field)
+    
+    def _resolve_path(self, path):
+        """Get the container and key holding a dotted path in local state"""
+        parts = path.split(".")
+        container = _Attributes(self)
+        for part in parts[:-1]:
+            if isinstance(container, list):
+                container = container[int(part)]
+            else:
+                container = container.setdefault(part, {})
+        key = int(parts[-1]) if isinstance(container, list) else parts[-1]
+        return container, key
+    
+    def mark_changed(self, path):
+        """Mark a field as changed after mutating it in place"""
+        if self._is_tracking():
+            container, key = self._resolve_path(path)
+            self._queue("$set", path, container[key])
+    
+    def set_path(self, path, value):
+        """Set a (possibly nested) field, e.g. settings.privacy.show_email"""
+        container, key = self._resolve_path(path)
+        container[key] = value
+        if self._is_tracking():
+            self._queue("$set", path, value)
+    
+    def push(self, path, value):
+        """Append a value to an array field"""
+        container, key = self._resolve_path(path)
+        if not isinstance(container, list):
+            container.setdefault(key, [])
+        container[key].append(value)
+        if self._is_tracking():
+            self._queue("$push", path, value)
+    
+    def add_to_set(self, path, value):
+        """Append a value to an array field unless it is already there"""
+        container, key = self._resolve_path(path)
+        if not isinstance(container, list):
+            container.setdefault(key, [])
+        if value not in container[key]:
+            container[key].append(value)
+        if self._is_tracking():
+            self._queue("$addToSet", path, value)
+    
+    def pull(self, path, value):
+        """Remove every occurrence of a value from an array field"""
+        container, key = self._resolve_path(path)
+        if not isinstance(container, list):
+            container.setdefault(key, [])
+        container[key] = [item for item in container[key] if item != value]
+        if self._is_tracking():
+            self._queue("$pull", path, value)
+    
+    def inc(self, path, amount=1):
+        """Atomically increment a numeric field"""
+        container, key = self._resolve_path(path)
+        if not isinstance(container, list):
+            container[key] = container.get(key, 0) + amount
+        else:
+            container[key] += amount
+        if self._is_tracking():
+            self._queue("$inc", path, amount)
+    
+    def get_changes(self):
+        """Build the MongoDB update document for the pending changes"""
+        update = {}
+        for (operator, path), value in self._changes.items():
+            update.setdefault(operator, {})[path] = value
+        return update
+    
+    def _save_changes(self, **extra_set):
+        """Write only the pending changes of a loaded document.
+        
+        Returns False when there was nothing to write.
+        """
+        update = self.get_changes()
+        if not update:
+            return False
+        
+        if extra_set:
+            update.setdefault("$set", {}).update(extra_set)
+            for field, value in extra_set.items():
+                object.__setattr__(self, field, value)
+        
+        self.get_collection().update_one({"_id": ObjectId(self._id)}, update)
+        self._start_tracking()
+        return True
+
+    @classmethod
+    def get_collection(cls):
+        """Get the MongoDB collection for this model"""
+        return db[cls.collection_name]
+    
+    @classmethod
+    def _from_identity_map(cls, object_id):
+        """Get the instance already loaded in this request, if any"""
+        return identity_map.get(cls.collection_name, object_id)
+    
+    @classmethod
+    def _track(cls, obj):
+        """Register a fully loaded object in the request's identity map"""
+        return identity_map.add(cls.collection_name, obj._id, obj)
+    
+    def _forget(self):
+        """Remove this object from the request's identity map"""
+        if hasattr(self, "_id"):
+            identity_map.discard(self.collection_name, self._id)
+    
+    @staticmethod
+    def to_object_ids(ids):
+        """Convert string IDs to unique ObjectIds, skipping invalid ones"""
+        object_ids = []
+        seen = set()
+        for id_value in ids:
+            if id_value in seen or not ObjectId.is_valid(id_value):
+                continue
+            seen.add(id_value)
+            object_ids.append(ObjectId(id_value))
+        return object_ids
+    
+    @classmethod
+    def find_many_by_ids(cls, ids, fields=None):
+        """Load many documents with one $in query.
+        
+        Returns a dictionary of string ID -> model object. When fields is given
+        only those fields are fetched, so the objects are partial.
+        """
+        objects = {}
+        missing_ids = []
+        for object_id in cls.to_object_ids(ids):
+            # Objects loaded earlier in the request already have every field
+            obj = cls._from_identity_map(object_id)
+            if obj is not None:
+                objects[str(object_id)] = obj
+            else:
+                missing_ids.append(object_id)
+        
+        if not missing_ids:
+            return objects
+        
+        projection = {field: 1 for field in fields} if fields else None
+        for data in cls.get_collection().find({"_id": {"$in": missing_ids}}, projection):
+            data["_id"] = str(data["_id"])
+            objects[data["_id"]] = cls.from_dict(data)
+        return objects
+
+def load_models():
+    """Import every model module so the registry is complete"""
+    import app.api.models.user
+    import app.api.models.project
+    import app.api.models.rating
+    import app.api.models.collaboration_request
+    import app.api.models.message
+    import app.api.models.conversation
+    import app.api.models.unread_counter
+    import app.api.models.verification
+    import app.api.models.media_file
+    return list(MODEL_REGISTRY)
@@ -0,0 +1,179 @@
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.api import events
+from app.api.models.base import Model
+
+class CollaborationRequest(Model):
+    """A user's request to collaborate on a project, stored outside the project document"""
+    __slots__ = ("project_id", "owner_id", "user_id", "message", "status", "created_at", "updated_at")
+
+    collection_name = "collaboration_requests"
+
+    indexes = [
+        IndexModel([("project_id", ASCENDING), ("user_id", ASCENDING)],
+                   name="project_id_1_user_id_1", unique=True),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)],
+                   name="user_id_1_status_1_created_at_-1"),
+        IndexModel([("owner_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)],
+                   name="owner_id_1_status_1_created_at_-1"),
+    ]
+
+    STATUSES = ["pending", "accepted", "rejected"]
+
+    query_shapes = {
+        "find_one": ({"project_id": "", "user_id": ""}, None),
+        "find_sent": ({"user_id": "", "status": "pending"}, [("created_at", DESCENDING)]),
+        "find_received": ({"owner_id": "", "status": "pending"}, [("created_at", DESCENDING)]),
+        "find_sent_all": ({"user_id": "", "status": {"$in": STATUSES}},
+                          [("created_at", DESCENDING)]),
+        "find_received_all": ({"owner_id": "", "status": {"$in": STATUSES}},
+                              [("created_at", DESCENDING)]),
+        "delete_by_project": ({"project_id": ""}, None),
+    }
+
+    def __init__(self, project_id, owner_id, user_id, message=None):
+        self.project_id = project_id
+        self.owner_id = owner_id  # Owner of the project, for the "received" inbox
+        self.user_id = user_id  # User asking to collaborate
+        self.message = message
+        self.status = "pending"  # pending, accepted, rejected
+        self.created_at = datetime.utcnow()
+        self.updated_at = datetime.utcnow()
+
+    def to_dict(self):
+        """Convert CollaborationRequest object to dictionary for database storage"""
+        return {
+            "project_id": self.project_id,
+            "owner_id": self.owner_id,
+            "user_id": self.user_id,
+            "message": self.message,
+            "status": self.status,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+    def to_event(self):
+        """Payload of the events published when the request is created or updated"""
+        return {
+            "id": self._id,
+            "project_id": self.project_id,
+            "owner_id": self.owner_id,
+            "user_id": self.user_id,
+            "message": self.message,
+            "status": self.status,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a CollaborationRequest object from a dictionary"""
+        request = cls.__new__(cls)
+        request.project_id = data["project_id"]
+        request.owner_id = data.get("owner_id")
+        request.user_id = data["user_id"]
+        request.message = data.get("message")
+        request.status = data.get("status", "pending")
+        request.created_at = data.get("created_at")
+        request.updated_at = data.get("updated_at")
+        if "_id" in data:
+            request._id = str(data["_id"])
+        request._start_tracking()
+        return request
+
+    @classmethod
+    def create(cls, project_id, owner_id, user_id, message=None):
+        """Insert a new pending request.
+
+        Returns the request, or None if the user already sent one for this project.
+        """
+        request = cls(project_id, owner_id, user_id, message)
+        try:
+            # Only insert if the user has no request for the project yet
+            result = cls.get_collection().update_one(
+                {"project_id": project_id, "user_id": user_id},
+                {"$setOnInsert": request.to_dict()},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return None
+
+        if result.upserted_id is None:
+            return None
+
+        request._id = str(result.upserted_id)
+        request._start_tracking()
+        events.publish(events.COLLABORATION_REQUEST_NEW, request.to_event(), [owner_id])
+        return request
+
+    @classmethod
+    def find_one(cls, project_id, user_id):
+        """Find a user's request for a project"""
+        data = cls.get_collection().find_one({"project_id": project_id, "user_id": user_id})
+        return cls.from_dict(data) if data else None
+
+    @classmethod
+    def _find_page(cls, query, status=None, skip=0, limit=20):
+        """Find a page of requests, newest first"""
+        # Without a status every status is listed, so the index is scanned per status and merged in created_at order
+        query["status"] = status or {"$in": cls.STATUSES}
+
+        results = cls.get_collection().find(query).sort("created_at", DESCENDING).skip(skip).limit(limit)
+        return [cls.from_dict(data) for data in results]
+
+    @classmethod
+    def find_sent(cls, user_id, status=None, skip=0, limit=20):
+        """Find the requests a user sent"""
+        return cls._find_page({"user_id": user_id}, status, skip, limit)
+
+    @classmethod
+    def find_received(cls, owner_id, status=None, skip=0, limit=20):
+        """Find the requests sent for a user's projects"""
+        return cls._find_page({"owner_id": owner_id}, status, skip, limit)
+
+    @classmethod
+    def transition(cls, project_id, user_id, status, from_status="pending"):
+        """Atomically move a request from from_status to status.
+
+        Returns the updated request, or None if no request in from_status exists.
+        """
+        data = cls.get_collection().find_one_and_update(
+            {"project_id": project_id, "user_id": user_id, "status": from_status},
+            {"$set": {"status": status, "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not data:
+            return None
+
+        request = cls.from_dict(data)
+        events.publish(events.COLLABORATION_REQUEST_UPDATED, request.to_event(), [request.user_id, request.owner_id])
+        return request
+
+    @classmethod
+    def import_embedded(cls, project_id, owner_id, requests):
+        """Copy requests embedded in a legacy project document into the collection.
+
+        Requests that already exist in the collection are left untouched.
+        """
+        operations = []
+        for r in requests:
+            operations.append(UpdateOne(
+                {"project_id": project_id, "user_id": r["user_id"]},
+                {"$setOnInsert": {
+                    "owner_id": owner_id,
+                    "message": r.get("message"),
+                    "status": r.get("status", "pending"),
+                    "created_at": r.get("created_at", datetime.utcnow()),
+                    "updated_at": r.get("updated_at", datetime.utcnow())
+                }},
+                upsert=True
+            ))
+
+        if operations:
+            cls.get_collection().bulk_write(operations, ordered=False)
+
+    @classmethod
+    def delete_by_project(cls, project_id):
+        """Delete every request for a project"""
+        return cls.get_collection().delete_many({"project_id": project_id}).deleted_count
@@ -0,0 +1,228 @@
+from datetime import datetime, timezone
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.api.models.base import Model
+
+class Conversation(Model):
+    """Materialized summary of a conversation, maintained on every Message.save().
+
+    The document _id is the conversation ID used by messages.
+    """
+    __slots__ = ("participants", "last_message", "last_activity_at", "unread_counts",
+                 "created_at", "updated_at")
+
+    collection_name = "conversations"
+
+    indexes = [
+        IndexModel([("participants", ASCENDING), ("last_activity_at", DESCENDING)],
+                   name="participants_1_last_activity_at_-1"),
+    ]
+
+    query_shapes = {
+        "find_by_user": ({"participants": ""}, [("last_activity_at", DESCENDING)]),
+    }
+
+    def __init__(self, conversation_id, participants):
+        self._id = conversation_id
+        self.participants = participants
+        self.last_message = None
+        self.last_activity_at = None
+        self.unread_counts = {}  # user ID -> unread messages for that participant
+        self.created_at = datetime.now(timezone.utc)
+        self.updated_at = datetime.now(timezone.utc)
+
+    def to_dict(self):
+        """Convert Conversation object to dictionary for database storage"""
+        return {
+            "participants": self.participants,
+            "last_message": self.last_message,
+            "last_activity_at": self.last_activity_at,
+            "unread_counts": self.unread_counts,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a Conversation object from a database document"""
+        conversation = cls.__new__(cls)
+        conversation._id = data["_id"]
+        conversation.participants = data.get("participants", [])
+        conversation.last_message = data.get("last_message")
+        conversation.last_activity_at = data.get("last_activity_at")
+        conversation.unread_counts = data.get("unread_counts") or {}
+        conversation.created_at = data.get("created_at")
+        conversation.updated_at = data.get("updated_at")
+        conversation._start_tracking()
+        return conversation
+
+    def other_participant(self, user_id):
+        """Get the participant that is not user_id"""
+        for participant in self.participants:
+            if participant != user_id:
+                return participant
+        return None
+
+    def unread_count_for(self, user_id):
+        """Get the number of unread messages for a participant"""
+        return self.unread_counts.get(user_id, 0)
+
+    @staticmethod
+    def message_snapshot(message):
+        """Build the last message snapshot stored on the conversation"""
+        return {
+            "id": message._id,
+            "sender_id": message.sender_id,
+            "receiver_id": message.receiver_id,
+            "content": message.content,
+            "message_type": message.message_type,
+            "is_read": message.is_read,
+            "created_at": message.created_at
+        }
+
+    @classmethod
+    def find_by_id(cls, conversation_id):
+        """Find conversation by ID"""
+        data = cls.get_collection().find_one({"_id": conversation_id})
+        return cls.from_dict(data) if data else None
+
+    @classmethod
+    def find_by_user(cls, user_id, skip=0, limit=20):
+        """Find a user's conversations, most recently active first"""
+        cursor = cls.get_collection().find({"participants": user_id}).sort(
+            "last_activity_at", DESCENDING
+        ).skip(skip).limit(limit)
+        return [cls.from_dict(data) for data in cursor]
+
+    @classmethod
+    def record_message(cls, message):
+        """Update the conversation summary for a newly inserted message.
+
+        Concurrent saves can land out of order, so last_message only moves
+        to a message at least as new as the current one.
+        """
+        collection = cls.get_collection()
+        now = datetime.now(timezone.utc)
+        counters = {"$set": {"updated_at": now}}
+        if not message.is_read:
+            counters["$inc"] = {f"unread_counts.{message.receiver_id}": 1}
+
+        update = {
+            "$set": {
+                **counters["$set"],
+                "participants": sorted([message.sender_id, message.receiver_id]),
+                "last_message": cls.message_snapshot(message),
+                "last_activity_at": message.created_at
+            },
+            "$setOnInsert": {"created_at": now}
+        }
+        if "$inc" in counters:
+            update["$inc"] = counters["$inc"]
+
+        try:
+            collection.update_one(
+                {"_id": message.conversation_id, "last_activity_at": {"$not": {"$gt": message.created_at}}},
+                update, upsert=True
+            )
+        except DuplicateKeyError:
+            # The conversation already shows a newer message: only count this one
+            collection.update_one({"_id": message.conversation_id}, counters)
+
+    @classmethod
+    def record_message_read(cls, message):
+        """Update the conversation summary after a single message was read"""
+        collection = cls.get_collection()
+        now = datetime.now(timezone.utc)
+        collection.update_one(
+            {"_id": message.conversation_id, f"unread_counts.{message.receiver_id}": {"$gt": 0}},
+            {"$inc": {f"unread_counts.{message.receiver_id}": -1}, "$set": {"updated_at": now}}
+        )
+        collection.update_one(
+            {"_id": message.conversation_id, "last_message.id": message._id},
+            {"$set": {"last_message.is_read": True, "updated_at": now}}
+        )
+
+    @classmethod
+    def record_conversation_read(cls, conversation_id, user_id):
+        """Update the conversation summary after a participant read every message.
+
+        updated_at only moves when something changed, so it can validate
+        cached responses.
+        """
+        collection = cls.get_collection()
+        now = datetime.now(timezone.utc)
+        collection.update_one(
+            {"_id": conversation_id, f"unread_counts.{user_id}": {"$ne": 0}},
+            {"$set": {f"unread_counts.{user_id}": 0, "updated_at": now}}
+        )
+        collection.update_one(
+            {"_id": conversation_id, "last_message.receiver_id": user_id, "last_message.is_read": False},
+            {"$set": {"last_message.is_read": True, "updated_at": now}}
+        )
+
+    @classmethod
+    def rebuild_all(cls, messages_collection, unread_counts):
+        """Rebuild every conversation summary from the messages collection.
+
+        unread_counts maps conversation IDs to {user_id: count}.
+        Returns the number of conversations written.
+        """
+        latest_pipeline = [
+            {"$sort": {"created_at": -1, "_id": -1}},
+            {"$group": {"_id": "$conversation_id",
+                        "latest": {"$first": "$$ROOT"},
+                        "created_at": {"$min": "$created_at"}}}
+        ]
+        now = datetime.now(timezone.utc)
+        operations = []
+        for doc in messages_collection.aggregate(latest_pipeline, allowDiskUse=True):
+            latest = doc["latest"]
+            operations.append(ReplaceOne({"_id": doc["_id"]}, {
+                "participants": sorted([latest["sender_id"], latest["receiver_id"]]),
+                "last_message": {
+                    "id": str(latest["_id"]),
+                    "sender_id": latest["sender_id"],
+                    "receiver_id": latest["receiver_id"],
+                    "content": latest["content"],
+                    "message_type": latest.get("message_type", "personal"),
+                    "is_read": latest.get("is_read", False),
+                    "created_at": latest["created_at"]
+                },
+                "last_activity_at": latest["created_at"],
+                "unread_counts": unread_counts.get(doc["_id"], {}),
+                "created_at": doc["created_at"],
+                "updated_at": now
+            }, upsert=True))
+
+        if operations:
+            cls.get_collection().bulk_write(operations, ordered=False)
+        return len(operations)
+
+    @classmethod
+    def unread_snapshot(cls):
+        """Get every conversation's unread counts as stored, to reconcile against later"""
+        return {data["_id"]: data.get("unread_counts")
+                for data in cls.get_collection().find({}, {"unread_counts": 1})}
+
+    @classmethod
+    def reconcile_unread(cls, unread_counts, snapshot):
+        """Overwrite per-participant unread counts that differ from unread_counts.
+
+        unread_counts maps conversation IDs to {user_id: count}, and snapshot
+        must be taken with unread_snapshot() before counting. Conversations
+        whose counts changed since the snapshot are skipped until the next
+        run. Returns the number of conversations corrected.
+        """
+        now = datetime.now(timezone.utc)
+        operations = []
+
+        for conversation_id, stored in snapshot.items():
+            current = {user_id: count for user_id, count in (stored or {}).items() if count}
+            expected = unread_counts.get(conversation_id, {})
+            if current != expected:
+                operations.append(UpdateOne({"_id": conversation_id, "unread_counts": stored},
+                                            {"$set": {"unread_counts": expected, "updated_at": now}}))
+
+        if not operations:
+            return 0
+        return cls.get_collection().bulk_write(operations, ordered=False).modified_count
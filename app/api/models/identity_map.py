@@ -0,0 +1,42 @@
+from flask import g, has_request_context
+
+def _get_map(create=False):
+    """Get the identity map for the current request, if there is one"""
+    if not has_request_context():
+        return None
+    identity_map = g.get("identity_map")
+    if identity_map is None and create:
+        identity_map = g.identity_map = {}
+    return identity_map
+
+def get(collection_name, object_id):
+    """Get the object loaded earlier in this request, or None"""
+    identity_map = _get_map()
+    if not identity_map:
+        return None
+    return identity_map.get((collection_name, str(object_id)))
+
+def add(collection_name, object_id, obj):
+    """Register a loaded object and return the instance to use.
+
+    If the same document was already loaded in this request the existing
+    instance is returned, so a request never holds two copies of it.
+    """
+    identity_map = _get_map(create=True)
+    if identity_map is None:
+        return obj
+    return identity_map.setdefault((collection_name, str(object_id)), obj)
+
+def discard(collection_name, object_id):
+    """Forget an object, e.g. after it was saved or deleted"""
+    identity_map = _get_map()
+    if identity_map:
+        identity_map.pop((collection_name, str(object_id)), None)
+
+def clear(exception=None):
+    """Drop the identity map of the current request"""
+    g.pop("identity_map", None)
+
+def init_app(app):
+    """Clear the identity map when each request ends"""
+    app.teardown_request(clear)
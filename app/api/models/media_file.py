@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.api.models.base import Model
+
+# Seconds after which a deletion claim is considered abandoned (its process died)
+DELETE_CLAIM_TIMEOUT = 10
+
+class MediaFile(Model):
+    """Reference count of a stored upload, keyed by the SHA-256 of its content.
+
+    Every profile picture and project image using the content holds one
+    reference. The generated variants are shared by all of them.
+    """
+    __slots__ = ()
+
+    collection_name = "media_files"
+
+    query_shapes = {
+        "get": ({"_id": ""}, None),
+    }
+
+    @classmethod
+    def get(cls, digest):
+        """Get the record of stored content, or None"""
+        return cls.get_collection().find_one({"_id": digest})
+
+    @classmethod
+    def acquire(cls, digest, url, size, content_type=None):
+        """Take a reference to content, creating its record if it is new. Returns the record.
+
+        Content whose files are being deleted by release() is waited for, so
+        a new record is only created once they are gone.
+        """
+        while True:
+            try:
+                return cls.get_collection().find_one_and_update(
+                    {"_id": digest, "deleting_at": None},
+                    {
+                        "$inc": {"refs": 1},
+                        "$setOnInsert": {"url": url, "size": size, "content_type": content_type,
+                                         "created_at": datetime.now(timezone.utc)}
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                # Claimed for deletion, or inserted by a concurrent upload: retry once it settles
+                cutoff = datetime.now(timezone.utc) - timedelta(seconds=DELETE_CLAIM_TIMEOUT)
+                cls.get_collection().delete_one({"_id": digest, "deleting_at": {"$lt": cutoff}})
+                time.sleep(0.05)
+
+    @classmethod
+    def release(cls, digest):
+        """Drop a reference to content. Returns the references left, or None if there was none."""
+        data = cls.get_collection().find_one_and_update(
+            {"_id": digest, "refs": {"$gt": 0}},
+            {"$inc": {"refs": -1}},
+            return_document=ReturnDocument.AFTER
+        )
+        return data["refs"] if data else None
+
+    @classmethod
+    def claim_unreferenced(cls, digest):
+        """Mark the record for deletion if nothing references the content. Returns the claimed record or None.
+
+        Until delete_claimed() is called, acquire() waits instead of taking a
+        reference to files that are about to be deleted.
+        """
+        return cls.get_collection().find_one_and_update(
+            {"_id": digest, "refs": {"$lte": 0}, "deleting_at": None},
+            {"$set": {"deleting_at": datetime.now(timezone.utc)}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @classmethod
+    def delete_claimed(cls, media):
+        """Delete a record claimed by claim_unreferenced() once its files are gone"""
+        cls.get_collection().delete_one({"_id": media["_id"], "deleting_at": media["deleting_at"]})
+
+    @classmethod
+    def set_variants(cls, digest, variants):
+        """Record the generated variants of the content"""
+        cls.get_collection().update_one({"_id": digest}, {"$set": {"variants": variants}})
@@ -1,8 +1,34 @@
 from datetime import datetime, timezone
 from bson import ObjectId
-from app.config.database import db
+from pymongo import ASCENDING, IndexModel
+from app.api import events
+from app.api.models.base import Model
+from app.api.models.conversation import Conversation
+from app.api.models.unread_counter import UnreadCounter
+from app.api.utils.pagination import keyset_filter
 
-class Message:
+class Message(Model):
+    __slots__ = ("sender_id", "receiver_id", "conversation_id", "content", "message_type",
+                 "is_read", "created_at", "updated_at")
+    
+    collection_name = "messages"
+    
+    indexes = [
+        # created_at/_id give a stable order for keyset pagination
+        IndexModel([("conversation_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+                   name="conversation_id_1_created_at_1__id_1"),
+        IndexModel([("receiver_id", ASCENDING), ("is_read", ASCENDING)],
+                   name="receiver_id_1_is_read_1"),
+        IndexModel([("sender_id", ASCENDING), ("receiver_id", ASCENDING)],
+                   name="sender_id_1_receiver_id_1"),
+    ]
+    
+    query_shapes = {
+        "find_by_id": ({"_id": ObjectId()}, None),
+        "find_by_conversation": ({"conversation_id": ""}, [("created_at", ASCENDING), ("_id", ASCENDING)]),
+        "mark_conversation_as_read": ({"conversation_id": "", "receiver_id": "", "is_read": False}, None),
+    }
+    
     def __init__(self, sender_id, receiver_id, conversation_id, content, message_type="personal"):
         self.sender_id = sender_id
         self.receiver_id = receiver_id
@@ -13,6 +39,19 @@ class Message:
         self.created_at = datetime.now(timezone.utc)
         self.updated_at = datetime.now(timezone.utc)
     
+    def to_event(self):
+        """Payload of the event published when the message is sent"""
+        return {
+            "id": self._id,
+            "conversation_id": self.conversation_id,
+            "sender_id": self.sender_id,
+            "receiver_id": self.receiver_id,
+            "content": self.content,
+            "is_read": self.is_read,
+            "message_type": self.message_type,
+            "created_at": self.created_at
+        }
+    
     def to_dict(self):
         """Convert Message object to dictionary for database storage"""
         return {
@@ -29,92 +68,122 @@ class Message:
     @classmethod
     def from_dict(cls, data):
         """Create a Message object from a dictionary"""
-        message = cls(
-            sender_id=data["sender_id"],
-            receiver_id=data["receiver_id"],
-            conversation_id=data["conversation_id"],
-            content=data["content"],
-            message_type=data.get("message_type", "personal")
-        )
+        message = cls.__new__(cls)
+        message.sender_id = data["sender_id"]
+        message.receiver_id = data["receiver_id"]
+        message.conversation_id = data["conversation_id"]
+        message.content = data["content"]
+        message.message_type = data.get("message_type", "personal")
         message.is_read = data.get("is_read", False)
-        message.created_at = data.get("created_at", datetime.now(timezone.utc))
-        message.updated_at = data.get("updated_at", datetime.now(timezone.utc))
+        created_at = data.get("created_at")
+        message.created_at = created_at if created_at is not None else datetime.now(timezone.utc)
+        message.updated_at = data.get("updated_at", message.created_at)
         if "_id" in data:
             message._id = str(data["_id"])
+        message._start_tracking()
         return message
     
     @classmethod
     def find_by_id(cls, message_id):
         """Find message by ID"""
-        data = db.messages.find_one({"_id": ObjectId(message_id)})
+        message = cls._from_identity_map(message_id)
+        if message is not None:
+            return message
+        
+        data = cls.get_collection().find_one({"_id": ObjectId(message_id)})
         if data:
             data["_id"] = str(data["_id"])
-            return cls.from_dict(data)
+            return cls._track(cls.from_dict(data))
         return None
     
     @classmethod
-    def find_by_conversation(cls, conversation_id, skip=0, limit=50):
-        """Find messages by conversation ID"""
-        cursor = db.messages.find({"conversation_id": conversation_id}).sort("created_at", 1).skip(skip).limit(limit)
+    def find_by_conversation(cls, conversation_id, skip=0, limit=50, cursor=None):
+        """Find messages by conversation ID, oldest first.
+        
+        With a cursor token the page starts right after it (keyset pagination),
+        otherwise skip is used.
+        """
+        query = {"conversation_id": conversation_id}
+        if cursor:
+            query.update(keyset_filter(cursor, descending=False))
+            skip = 0
+        
+        results = cls.get_collection().find(query).sort([("created_at", ASCENDING), ("_id", ASCENDING)]).skip(skip).limit(limit)
         messages = []
-        for data in cursor:
+        for data in results:
             data["_id"] = str(data["_id"])
             messages.append(cls.from_dict(data))
         return messages
     
     @classmethod
-    def find_by_user(cls, user_id, skip=0, limit=20):
-        """Find conversations for a user"""
-        # Find unique conversation IDs for this user
+    def get_unread_count(cls, user_id):
+        """Get count of unread messages for a user"""
+        return UnreadCounter.get_count(user_id)
+    
+    @classmethod
+    def count_unread_by_conversation(cls):
+        """Count unread messages from scratch as {conversation_id: {receiver_id: count}}"""
         pipeline = [
-            {"$match": {"$or": [{"sender_id": user_id}, {"receiver_id": user_id}]}},
-            {"$group": {"_id": "$conversation_id"}},
-            {"$sort": {"_id.created_at": -1}},
-            {"$skip": skip},
-            {"$limit": limit}
+            {"$match": {"is_read": False}},
+            {"$group": {"_id": {"conversation_id": "$conversation_id", "receiver_id": "$receiver_id"},
+                        "count": {"$sum": 1}}}
         ]
         
-        conversation_ids = [doc["_id"] for doc in db.messages.aggregate(pipeline)]
-        
-        # Get the latest message from each conversation
-        conversations = []
-        for conv_id in conversation_ids:
-            latest_message = db.messages.find({"conversation_id": conv_id}).sort("created_at", -1).limit(1)
-            for msg in latest_message:
-                msg["_id"] = str(msg["_id"])
-                conversations.append({
-                    "conversation_id": conv_id,
-                    "latest_message": cls.from_dict(msg)
-                })
-        
-        return conversations
-    
-    @classmethod
-    def get_unread_count(cls, user_id):
-        """Get count of unread messages for a user"""
-        return db.messages.count_documents({
-            "receiver_id": user_id,
-            "is_read": False
-        })
+        counts = {}
+        for doc in cls.get_collection().aggregate(pipeline, allowDiskUse=True):
+            key = doc["_id"]
+            counts.setdefault(key["conversation_id"], {})[key["receiver_id"]] = doc["count"]
+        return counts
     
     def save(self):
         """Save message to database"""
+        self._forget()
+        
+        if hasattr(self, "_id") and self._is_tracking():
+            # Only write the fields that changed since the message was loaded
+            self._save_changes(updated_at=datetime.now(timezone.utc))
+            return self._id
+        
         message_dict = self.to_dict()
         message_dict["updated_at"] = datetime.now(timezone.utc)
         
         if hasattr(self, "_id"):
-            db.messages.update_one({"_id": ObjectId(self._id)}, {"$set": message_dict})
-            return self._id
+            self.get_collection().update_one({"_id": ObjectId(self._id)}, {"$set": message_dict})
         else:
-            result = db.messages.insert_one(message_dict)
+            result = self.get_collection().insert_one(message_dict)
             self._id = str(result.inserted_id)
-            return self._id
+            Conversation.record_message(self)
+            if not self.is_read:
+                UnreadCounter.increment(self.receiver_id)
+            events.publish(events.MESSAGE_NEW, self.to_event(), [self.sender_id, self.receiver_id])
+        
+        self._start_tracking()
+        return self._id
     
     def mark_as_read(self):
         """Mark message as read"""
-        self.is_read = True
-        self.updated_at = datetime.now(timezone.utc)
-        return self.save()
+        now = datetime.now(timezone.utc)
+        # Only the request that flips is_read adjusts the counters
+        result = self.get_collection().update_one(
+            {"_id": ObjectId(self._id), "is_read": False},
+            {"$set": {"is_read": True, "updated_at": now}}
+        )
+        
+        self._forget()
+        # Already written, so update local state without marking it dirty
+        object.__setattr__(self, "is_read", True)
+        object.__setattr__(self, "updated_at", now)
+        
+        if result.modified_count:
+            UnreadCounter.decrement(self.receiver_id)
+            Conversation.record_message_read(self)
+            events.publish(events.MESSAGE_READ, {
+                "id": self._id,
+                "conversation_id": self.conversation_id,
+                "reader_id": self.receiver_id,
+                "read_at": now
+            }, [self.sender_id, self.receiver_id])
+        return self._id
     
     @classmethod
     def generate_conversation_id(cls, user1_id, user2_id, context=None):
@@ -131,8 +200,44 @@ class Message:
     @classmethod
     def mark_conversation_as_read(cls, conversation_id, user_id):
         """Mark all messages in a conversation as read for a specific user"""
-        result = db.messages.update_many(
+        now = datetime.now(timezone.utc)
+        result = cls.get_collection().update_many(
             {"conversation_id": conversation_id, "receiver_id": user_id, "is_read": False},
-            {"$set": {"is_read": True, "updated_at": datetime.now(timezone.utc)}}
+            {"$set": {"is_read": True, "updated_at": now}}
         )
-        return result.modified_count 
\ No newline at end of file
+        UnreadCounter.decrement(user_id, result.modified_count)
+        Conversation.record_conversation_read(conversation_id, user_id)
+        if result.modified_count:
+            # Conversation IDs start with the two participants' IDs
+            events.publish(events.CONVERSATION_READ, {
+                "conversation_id": conversation_id,
+                "reader_id": user_id,
+                "count": result.modified_count,
+                "read_at": now
+            }, conversation_id.split("_")[:2])
+        return result.modified_count
+    
+    @classmethod
+    def rebuild_conversations(cls):
+        """Rebuild the conversation summaries from the stored messages"""
+        return Conversation.rebuild_all(cls.get_collection(), cls.count_unread_by_conversation())
+    
+    @classmethod
+    def reconcile_unread_counts(cls):
+        """Correct drift in the unread counters by recounting unread messages.
+        
+        Returns the number of (user counters, conversations) corrected.
+        """
+        # Taken first, so counters that move during the count are left alone
+        user_snapshot = UnreadCounter.snapshot()
+        conversation_snapshot = Conversation.unread_snapshot()
+        by_conversation = cls.count_unread_by_conversation()
+        
+        by_user = {}
+        for counts in by_conversation.values():
+            for user_id, count in counts.items():
+                by_user[user_id] = by_user.get(user_id, 0) + count
+        
+        return (UnreadCounter.reconcile(by_user, user_snapshot),
+                Conversation.reconcile_unread(by_conversation, conversation_snapshot))
+ 
\ No newline at end of file
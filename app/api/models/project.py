@@ -1,22 +1,57 @@
 from datetime import datetime
 from bson import ObjectId
-from app.config.database import db
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument
+from app.api.models.base import Model
+from app.api.models.rating import Rating, empty_histogram
+from app.api.models.collaboration_request import CollaborationRequest
+from app.api.utils.pagination import keyset_filter
 
-class Project:
+class Project(Model):
+    __slots__ = ("user_id", "title", "description", "images", "image_variants", "categories", "budget", "is_private",
+                 "collaborators", "favorites_count", "rating_sum", "rating_count", "rating_histogram",
+                 "created_at", "updated_at")
+    
+    collection_name = "projects"
+    
+    indexes = [
+        # created_at/_id give a stable order for keyset pagination
+        IndexModel([("user_id", ASCENDING), ("is_private", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="user_id_1_is_private_1_created_at_-1__id_-1"),
+        IndexModel([("categories", ASCENDING), ("is_private", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                   name="categories_1_is_private_1_created_at_-1__id_-1"),
+    ]
+    
+    # Fields needed to show a project in a listing
+    LISTING_FIELDS = ["user_id", "title", "description", "images", "image_variants", "categories", "budget",
+                      "is_private", "favorites_count", "rating_sum", "rating_count", "created_at"]
+    
+    query_shapes = {
+        "find_by_id": ({"_id": ObjectId()}, None),
+        "find_many_by_ids": ({"_id": {"$in": [ObjectId()]}}, None),
+        "find_by_user_id": ({"user_id": "", "is_private": False},
+                            [("created_at", DESCENDING), ("_id", DESCENDING)]),
+        "find_by_user_id_include_private": ({"user_id": "", "is_private": {"$in": [False, True]}},
+                                            [("created_at", DESCENDING), ("_id", DESCENDING)]),
+        "find_by_categories": ({"categories": {"$in": [""]}, "is_private": False},
+                               [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    }
+    
     def __init__(self, user_id, title, description, images=None, categories=None, 
                  budget=None, is_private=False):
         self.user_id = user_id
         self.title = title
         self.description = description
         self.images = images or []
+        self.image_variants = []  # {"thumb", "medium", "full"} URLs of processed images; "full" is in images
         self.categories = categories or []  # Target audience categories
         self.budget = budget
         self.is_private = is_private
         self.collaborators = []
-        self.collaboration_requests = []
         self.favorites_count = 0
-        self.ratings = []
-        self.avg_rating = 0.0
+        # Ratings live in the project_ratings collection; only the aggregate is kept here
+        self.rating_sum = 0
+        self.rating_count = 0
+        self.rating_histogram = empty_histogram()
         self.created_at = datetime.utcnow()
         self.updated_at = datetime.utcnow()
     
@@ -27,14 +62,15 @@ class Project:
             "title": self.title,
             "description": self.description,
             "images": self.images,
+            "image_variants": self.image_variants,
             "categories": self.categories,
             "budget": self.budget,
             "is_private": self.is_private,
             "collaborators": self.collaborators,
-            "collaboration_requests": self.collaboration_requests,
             "favorites_count": self.favorites_count,
-            "ratings": self.ratings,
-            "avg_rating": self.avg_rating,
+            "rating_sum": self.rating_sum,
+            "rating_count": self.rating_count,
+            "rating_histogram": self.rating_histogram,
             "created_at": self.created_at,
             "updated_at": self.updated_at
         }
@@ -42,72 +78,98 @@ class Project:
     @classmethod
     def from_dict(cls, data):
         """Create a Project object from a dictionary"""
-        project = cls(
-            user_id=data["user_id"],
-            title=data["title"],
-            description=data["description"],
-            images=data.get("images", []),
-            categories=data.get("categories", []),
-            budget=data.get("budget"),
-            is_private=data.get("is_private", False)
-        )
+        project = cls.__new__(cls)
+        project.user_id = data["user_id"]
+        project.title = data["title"]
+        project.description = data["description"]
+        project.images = data.get("images") or []
+        project.image_variants = data.get("image_variants") or []
+        project.categories = data.get("categories") or []
+        project.budget = data.get("budget")
+        project.is_private = data.get("is_private", False)
         project.collaborators = data.get("collaborators", [])
-        project.collaboration_requests = data.get("collaboration_requests", [])
         project.favorites_count = data.get("favorites_count", 0)
-        project.ratings = data.get("ratings", [])
-        project.avg_rating = data.get("avg_rating", 0.0)
-        project.created_at = data.get("created_at", datetime.utcnow())
-        project.updated_at = data.get("updated_at", datetime.utcnow())
+        project.rating_sum = data.get("rating_sum", 0)
+        project.rating_count = data.get("rating_count", 0)
+        project.rating_histogram = data.get("rating_histogram") or empty_histogram()
+        created_at = data.get("created_at")
+        project.created_at = created_at if created_at is not None else datetime.utcnow()
+        project.updated_at = data.get("updated_at", project.created_at)
         if "_id" in data:
             project._id = str(data["_id"])
+        project._start_tracking()
         return project
     
+    @property
+    def avg_rating(self):
+        """Average rating, derived from the maintained sum and count"""
+        return self.rating_sum / self.rating_count if self.rating_count else 0.0
+    
     @classmethod
     def find_by_id(cls, project_id):
         """Find project by ID"""
-        data = db.projects.find_one({"_id": ObjectId(project_id)})
+        project = cls._from_identity_map(project_id)
+        if project is not None:
+            return project
+        
+        data = cls.get_collection().find_one({"_id": ObjectId(project_id)})
         if data:
             data["_id"] = str(data["_id"])
-            return cls.from_dict(data)
+            return cls._track(cls.from_dict(data))
         return None
     
     @classmethod
-    def find_by_user_id(cls, user_id, skip=0, limit=20, include_private=False):
-        """Find projects by user ID"""
-        query = {"user_id": user_id}
-        if not include_private:
-            query["is_private"] = False
-            
-        cursor = db.projects.find(query).sort("created_at", -1).skip(skip).limit(limit)
+    def _find_page(cls, query, skip=0, limit=20, cursor=None):
+        """Find a page of projects, newest first.
+        
+        With a cursor token the page starts right after it (keyset pagination),
+        otherwise skip is used.
+        """
+        if cursor:
+            query = {**query, **keyset_filter(cursor, descending=True)}
+            skip = 0
+        
+        results = cls.get_collection().find(query).sort([("created_at", DESCENDING), ("_id", DESCENDING)]).skip(skip).limit(limit)
         projects = []
-        for data in cursor:
+        for data in results:
             data["_id"] = str(data["_id"])
             projects.append(cls.from_dict(data))
         return projects
     
     @classmethod
-    def find_by_categories(cls, categories, skip=0, limit=20):
+    def find_by_user_id(cls, user_id, skip=0, limit=20, include_private=False, cursor=None):
+        """Find projects by user ID"""
+        # Both values of is_private, so the index is scanned twice and merged in created_at order
+        query = {"user_id": user_id, "is_private": {"$in": [False, True]} if include_private else False}
+        
+        return cls._find_page(query, skip, limit, cursor)
+    
+    @classmethod
+    def find_by_categories(cls, categories, skip=0, limit=20, cursor=None):
         """Find projects by categories"""
         query = {"categories": {"$in": categories}, "is_private": False}
-        cursor = db.projects.find(query).sort("created_at", -1).skip(skip).limit(limit)
-        projects = []
-        for data in cursor:
-            data["_id"] = str(data["_id"])
-            projects.append(cls.from_dict(data))
-        return projects
+        return cls._find_page(query, skip, limit, cursor)
     
     def save(self):
         """Save project to database"""
+        self._forget()
+        
+        if hasattr(self, "_id") and self._is_tracking():
+            # Only write the fields that changed since the project was loaded
+            self._save_changes(updated_at=datetime.utcnow())
+            return self._id
+        
         project_dict = self.to_dict()
         project_dict["updated_at"] = datetime.utcnow()
         
         if hasattr(self, "_id"):
-            db.projects.update_one({"_id": ObjectId(self._id)}, {"$set": project_dict})
-            return self._id
+            self.get_collection().update_one({"_id": ObjectId(self._id)}, {"$set": project_dict})
         else:
-            result = db.projects.insert_one(project_dict)
+            result = self.get_collection().insert_one(project_dict)
             self._id = str(result.inserted_id)
-            return self._id
+        
+        self._start_tracking()
+        return self._id
     
     def update(self, data):
         """Update project with provided data"""
@@ -122,68 +184,150 @@ class Project:
         if not 1 <= rating <= 5:
             raise ValueError("Rating must be between 1 and 5")
         
-        # Check if user already rated this project
-        for i, r in enumerate(self.ratings):
-            if r["user_id"] == user_id:
-                # Update existing rating
-                self.ratings[i] = {
-                    "user_id": user_id,
-                    "rating": rating,
-                    "feedback": feedback,
-                    "created_at": r["created_at"],
-                    "updated_at": datetime.utcnow()
-                }
-                break
-        else:
-            # Add new rating
-            self.ratings.append({
-                "user_id": user_id,
-                "rating": rating,
-                "feedback": feedback,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            })
+        previous = Rating.upsert(self._id, user_id, rating, feedback)
         
-        # Calculate average rating
-        total_rating = sum(r["rating"] for r in self.ratings)
-        self.avg_rating = total_rating / len(self.ratings) if self.ratings else 0
+        # Adjust the aggregate by the difference from the previous rating
+        previous_rating = previous["rating"] if previous else None
+        increments = {"rating_sum": rating - (previous_rating or 0)}
+        if previous_rating is None:
+            increments["rating_count"] = 1
+        if previous_rating != rating:
+            increments[f"rating_histogram.{rating}"] = 1
+            if previous_rating is not None:
+                increments[f"rating_histogram.{previous_rating}"] = -1
         
-        return self.save()
+        data = self.get_collection().find_one_and_update(
+            {"_id": ObjectId(self._id)},
+            {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}},
+            projection={"rating_sum": 1, "rating_count": 1, "rating_histogram": 1, "updated_at": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        
+        self._forget()
+        if data:
+            # Already written, so update local state without marking it dirty
+            object.__setattr__(self, "rating_sum", data.get("rating_sum", 0))
+            object.__setattr__(self, "rating_count", data.get("rating_count", 0))
+            object.__setattr__(self, "rating_histogram", data.get("rating_histogram") or empty_histogram())
+            object.__setattr__(self, "updated_at", data["updated_at"])
+        return self._id
+    
+    @classmethod
+    def migrate_embedded_ratings(cls):
+        """Move ratings embedded in project documents into the project_ratings collection.
+        
+        Returns the number of projects migrated.
+        """
+        collection = cls.get_collection()
+        migrated = 0
+        
+        for data in collection.find({"ratings": {"$exists": True}}, {"ratings": 1}):
+            project_id = str(data["_id"])
+            Rating.import_embedded(project_id, data.get("ratings") or [])
+            rating_sum, rating_count, histogram = Rating.summarize(project_id)
+            
+            collection.update_one({"_id": data["_id"]}, {
+                "$set": {"rating_sum": rating_sum, "rating_count": rating_count, "rating_histogram": histogram},
+                "$unset": {"ratings": "", "avg_rating": ""}
+            })
+            migrated += 1
+        
+        return migrated
     
     def add_collaboration_request(self, user_id, message=None):
-        """Add a collaboration request to the project"""
-        for req in self.collaboration_requests:
-            if req["user_id"] == user_id:
-                return False  # Request already exists
-        
-        self.collaboration_requests.append({
-            "user_id": user_id,
-            "message": message,
-            "status": "pending",  # pending, accepted, rejected
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        })
+        """Add a collaboration request to the project.
         
-        return self.save()
+        Returns the request, or None if the user already sent one.
+        """
+        return CollaborationRequest.create(self._id, self.user_id, user_id, message)
     
     def update_collaboration_request(self, user_id, status):
-        """Update the status of a collaboration request"""
-        for i, req in enumerate(self.collaboration_requests):
-            if req["user_id"] == user_id:
-                self.collaboration_requests[i]["status"] = status
-                self.collaboration_requests[i]["updated_at"] = datetime.utcnow()
-                
-                # If accepted, add user to collaborators
-                if status == "accepted" and user_id not in self.collaborators:
-                    self.collaborators.append(user_id)
-                
-                return self.save()
-        
-        return False  # Request not found
+        """Move a pending collaboration request to a new status.
+        
+        Returns the updated request, or None if no pending request exists.
+        """
+        collaboration_request = CollaborationRequest.transition(self._id, user_id, status)
+        
+        # If accepted, add user to collaborators
+        if collaboration_request and status == "accepted":
+            self.add_to_set("collaborators", user_id)
+            self.save()
+        
+        return collaboration_request
+    
+    @classmethod
+    def migrate_embedded_collaboration_requests(cls):
+        """Move collaboration requests embedded in project documents into their own collection.
+        
+        Returns the number of projects migrated.
+        """
+        collection = cls.get_collection()
+        migrated = 0
+        
+        for data in collection.find({"collaboration_requests": {"$exists": True}},
+                                    {"user_id": 1, "collaboration_requests": 1}):
+            CollaborationRequest.import_embedded(str(data["_id"]), data["user_id"],
+                                                 data.get("collaboration_requests") or [])
+            collection.update_one({"_id": data["_id"]}, {"$unset": {"collaboration_requests": ""}})
+            migrated += 1
+        
+        return migrated
+    
+    def add_image(self, image_url, variants=None):
+        """Append an image URL to the project, with its variants if they were already generated"""
+        self.push("images", image_url)
+        if variants:
+            self.push("image_variants", variants)
+    
+    def remove_image(self, image_index):
+        """Remove the image at an index and return its URL"""
+        image_url = self.images[image_index]
+        # Pull by value, so a concurrent variant update of another image is kept
+        self.pull("images", image_url)
+        variants = self.variants_for(image_url)
+        if variants:
+            self.pull("image_variants", variants)
+        return image_url
+    
+    def variants_for(self, image_url):
+        """Get the generated variants of an image, or None if it was not processed yet"""
+        for variants in self.image_variants:
+            if variants.get("full") == image_url:
+                return variants
+        return None
+    
+    def listing_images(self, limit=1):
+        """Image URLs for listings, thumbnails where they were generated"""
+        images = []
+        for image_url in self.images[:limit]:
+            variants = self.variants_for(image_url)
+            images.append(variants["thumb"] if variants else image_url)
+        return images
+    
+    @classmethod
+    def set_image_variants(cls, project_id, original_url, variants):
+        """Replace a processed image by its full variant and record its variants.
+        
+        Every occurrence of the image is replaced, and its variants are
+        recorded once. Only applies while the project still has the image.
+        Returns True if it was applied.
+        """
+        result = cls.get_collection().update_one(
+            {"_id": ObjectId(project_id), "images": original_url},
+            {
+                "$set": {"images.$[image]": variants["full"], "updated_at": datetime.utcnow()},
+                "$addToSet": {"image_variants": variants}
+            },
+            array_filters=[{"image": original_url}]
+        )
+        return result.modified_count > 0
     
     def delete(self):
         """Delete project from database"""
         if hasattr(self, "_id"):
-            db.projects.delete_one({"_id": ObjectId(self._id)})
+            self.get_collection().delete_one({"_id": ObjectId(self._id)})
+            Rating.delete_by_project(self._id)
+            CollaborationRequest.delete_by_project(self._id)
+            self._forget()
             return True
         return False 
\ No newline at end of file
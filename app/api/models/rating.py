@@ -0,0 +1,130 @@
+from datetime import datetime
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.api.models.base import Model
+
+class Rating(Model):
+    """A user's rating of a project, stored outside the project document"""
+    __slots__ = ("project_id", "user_id", "rating", "feedback", "created_at", "updated_at")
+
+    collection_name = "project_ratings"
+
+    indexes = [
+        IndexModel([("project_id", ASCENDING), ("user_id", ASCENDING)],
+                   name="project_id_1_user_id_1", unique=True),
+    ]
+
+    query_shapes = {
+        "find_by_user": ({"project_id": "", "user_id": ""}, None),
+        "delete_by_project": ({"project_id": ""}, None),
+    }
+
+    def __init__(self, project_id, user_id, rating, feedback=None):
+        self.project_id = project_id
+        self.user_id = user_id
+        self.rating = rating
+        self.feedback = feedback
+        self.created_at = datetime.utcnow()
+        self.updated_at = datetime.utcnow()
+
+    def to_dict(self):
+        """Convert Rating object to dictionary for database storage"""
+        return {
+            "project_id": self.project_id,
+            "user_id": self.user_id,
+            "rating": self.rating,
+            "feedback": self.feedback,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a Rating object from a dictionary"""
+        rating = cls.__new__(cls)
+        rating.project_id = data["project_id"]
+        rating.user_id = data["user_id"]
+        rating.rating = data["rating"]
+        rating.feedback = data.get("feedback")
+        rating.created_at = data.get("created_at")
+        rating.updated_at = data.get("updated_at")
+        if "_id" in data:
+            rating._id = str(data["_id"])
+        rating._start_tracking()
+        return rating
+
+    @classmethod
+    def find_by_user(cls, project_id, user_id):
+        """Find a user's rating of a project"""
+        data = cls.get_collection().find_one({"project_id": project_id, "user_id": user_id})
+        return cls.from_dict(data) if data else None
+
+    @classmethod
+    def upsert(cls, project_id, user_id, rating, feedback=None):
+        """Insert or replace a user's rating of a project.
+
+        Returns the previous rating document, or None if this is the user's
+        first rating of the project.
+        """
+        now = datetime.utcnow()
+        query = {"project_id": project_id, "user_id": user_id}
+        update = {
+            "$set": {"rating": rating, "feedback": feedback, "updated_at": now},
+            "$setOnInsert": {"created_at": now}
+        }
+
+        try:
+            return cls.get_collection().find_one_and_update(
+                query, update, upsert=True, return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            # A concurrent request inserted the rating first, so update it instead
+            return cls.get_collection().find_one_and_update(
+                query, update, return_document=ReturnDocument.BEFORE
+            )
+
+    @classmethod
+    def summarize(cls, project_id):
+        """Compute (rating_sum, rating_count, rating_histogram) from stored ratings"""
+        pipeline = [
+            {"$match": {"project_id": project_id}},
+            {"$group": {"_id": "$rating", "count": {"$sum": 1}}}
+        ]
+
+        histogram = empty_histogram()
+        for doc in cls.get_collection().aggregate(pipeline):
+            histogram[str(doc["_id"])] = doc["count"]
+
+        rating_sum = sum(int(value) * count for value, count in histogram.items())
+        return rating_sum, sum(histogram.values()), histogram
+
+    @classmethod
+    def import_embedded(cls, project_id, ratings):
+        """Copy ratings embedded in a legacy project document into the collection.
+
+        Ratings that already exist in the collection are left untouched.
+        """
+        operations = []
+        for r in ratings:
+            operations.append(UpdateOne(
+                {"project_id": project_id, "user_id": r["user_id"]},
+                {"$setOnInsert": {
+                    "rating": r["rating"],
+                    "feedback": r.get("feedback"),
+                    "created_at": r.get("created_at", datetime.utcnow()),
+                    "updated_at": r.get("updated_at", datetime.utcnow())
+                }},
+                upsert=True
+            ))
+
+        if operations:
+            cls.get_collection().bulk_write(operations, ordered=False)
+
+    @classmethod
+    def delete_by_project(cls, project_id):
+        """Delete every rating of a project"""
+        return cls.get_collection().delete_many({"project_id": project_id}).deleted_count
+
+def empty_histogram():
+    """Histogram of ratings keyed by the rating value as a string"""
+    return {str(value): 0 for value in range(1, 6)}
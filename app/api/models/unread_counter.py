@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from app.api.models.base import Model
+
+class UnreadCounter(Model):
+    """Per-user count of unread messages, kept up to date with atomic $inc.
+
+    The document _id is the user ID, so reading a badge count is a point read.
+    """
+    __slots__ = ()
+
+    collection_name = "unread_counters"
+
+    query_shapes = {
+        "get_count": ({"_id": ""}, None),
+    }
+
+    @classmethod
+    def get_count(cls, user_id):
+        """Get the number of unread messages for a user"""
+        data = cls.get_collection().find_one({"_id": user_id}, {"count": 1})
+        return max(data.get("count", 0), 0) if data else 0
+
+    @classmethod
+    def increment(cls, user_id, amount=1):
+        """Add unread messages to a user's counter"""
+        cls.get_collection().update_one(
+            {"_id": user_id},
+            {"$inc": {"count": amount}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    @classmethod
+    def decrement(cls, user_id, amount=1):
+        """Remove read messages from a user's counter without going below zero"""
+        if amount <= 0:
+            return
+
+        collection = cls.get_collection()
+        now = datetime.now(timezone.utc)
+        result = collection.update_one(
+            {"_id": user_id, "count": {"$gte": amount}},
+            {"$inc": {"count": -amount}, "$set": {"updated_at": now}}
+        )
+        if not result.matched_count:
+            # The counter had drifted below the real value
+            collection.update_one({"_id": user_id}, {"$set": {"count": 0, "updated_at": now}})
+
+    @classmethod
+    def snapshot(cls):
+        """Get every counter as stored, {user_id: count}, to reconcile against later"""
+        return {data["_id"]: data.get("count") for data in cls.get_collection().find({}, {"count": 1})}
+
+    @classmethod
+    def reconcile(cls, counts, snapshot):
+        """Overwrite counters that differ from the given {user_id: count} totals.
+
+        snapshot must be taken with snapshot() before counting, and a counter
+        is only written while it still holds its snapshot value: one that
+        moved since is skipped and corrected by the next run. Users without
+        unread messages should be absent from counts; their counters are
+        reset to zero. Returns the number of counters corrected.
+        """
+        now = datetime.now(timezone.utc)
+        operations = []
+
+        for user_id, current in snapshot.items():
+            expected = counts.get(user_id, 0)
+            if (current or 0) != expected:
+                operations.append(UpdateOne({"_id": user_id, "count": current},
+                                            {"$set": {"count": expected, "updated_at": now}}))
+
+        for user_id, count in counts.items():
+            if user_id not in snapshot:
+                # Not overwritten if an increment created the counter in the meantime
+                operations.append(UpdateOne({"_id": user_id},
+                                            {"$setOnInsert": {"count": count, "updated_at": now}}, upsert=True))
+
+        if not operations:
+            return 0
+        result = cls.get_collection().bulk_write(operations, ordered=False)
+        return result.modified_count + result.upserted_count
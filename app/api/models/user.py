@@ -1,9 +1,66 @@
+import copy
 from datetime import datetime, timezone
+import bson
 from bson import ObjectId
-import bcrypt
-from app.config.database import db
+from pymongo import ASCENDING, IndexModel
+from app.api.models.base import Model
+from app.api.services.password_hasher import get_password_hasher
+from app.api.utils.cache import get_cache
 
-class User:
+DEFAULT_SETTINGS = {
+    "notifications": {
+        "email_notifications": True,
+        "push_notifications": True,
+        "message_notifications": True,
+        "collaboration_notifications": True
+    },
+    "privacy": {
+        "show_email": False,
+        "show_phone": False,
+        "show_projects": True,
+        "allow_messages_from": "everyone",
+        "profile_visibility": "public"
+    },
+    "theme": {
+        "mode": "light",
+        "color": "blue",
+        "font_size": "medium"
+    }
+}
+
+def default_settings():
+    """Get a fresh copy of the default user settings"""
+    return copy.deepcopy(DEFAULT_SETTINGS)
+
+class User(Model):
+    __slots__ = ("username", "email", "phone", "password_hash", "user_type", "profile_picture",
+                 "profile_picture_variants", "bio", "social_links", "onboarding_responses", "favorites", "_settings",
+                 "created_at", "updated_at", "email_verified", "phone_verified", "is_open_to_more")
+    
+    # Users live alongside the imported public figures
+    collection_name = "sports_figures_data_combined"
+    
+    # Imported figures have no unique email/phone/username, so these are lookup indexes
+    indexes = [
+        IndexModel([("email", ASCENDING)], name="email_1"),
+        IndexModel([("username", ASCENDING)], name="username_1"),
+        IndexModel([("phone", ASCENDING)], name="phone_1"),
+    ]
+    
+    # Fields needed to show a user next to a project, message or favorite
+    SUMMARY_FIELDS = ["username", "user_type", "profile_picture", "profile_picture_variants", "bio"]
+    
+    # Fields shown on another user's profile, served from the profile cache
+    PUBLIC_PROFILE_FIELDS = SUMMARY_FIELDS + ["social_links", "is_open_to_more", "updated_at"]
+    
+    query_shapes = {
+        "find_by_id": ({"_id": ObjectId()}, None),
+        "find_many_by_ids": ({"_id": {"$in": [ObjectId()]}}, None),
+        "find_by_username": ({"username": ""}, None),
+        "find_by_email": ({"email": ""}, None),
+        "find_by_phone": ({"phone": ""}, None),
+    }
+    
     def __init__(self, username, email, phone, password, user_type, 
                  profile_picture=None, social_links=None, onboarding_responses=None):
         self.username = username
@@ -12,6 +69,7 @@ class User:
         self.password_hash = self._hash_password(password)
         self.user_type = user_type  # Public Figure, Fashion & Beauty, Company, Industry Expert
         self.profile_picture = profile_picture
+        self.profile_picture_variants = {}  # thumb/medium/full URLs once the picture is processed
         self.bio = ""
         self.social_links = social_links or {}
         self.onboarding_responses = onboarding_responses or {}
@@ -19,39 +77,49 @@ class User:
             "users": [],
             "projects": []
         }
-        self.settings = {
-            "notifications": {
-                "email_notifications": True,
-                "push_notifications": True,
-                "message_notifications": True,
-                "collaboration_notifications": True
-            },
-            "privacy": {
-                "show_email": False,
-                "show_phone": False,
-                "show_projects": True,
-                "allow_messages_from": "everyone",
-                "profile_visibility": "public"
-            },
-            "theme": {
-                "mode": "light",
-                "color": "blue",
-                "font_size": "medium"
-            }
-        }
+        self.settings = default_settings()
         self.created_at = datetime.now(timezone.utc)
         self.updated_at = datetime.now(timezone.utc)
         self.email_verified = False
         self.phone_verified = False
         self.is_open_to_more = True  # Open to more light option in settings
     
+    @property
+    def settings(self):
+        """User settings, falling back to the defaults for documents without any"""
+        if self._settings is None:
+            self._settings = default_settings()
+        return self._settings
+    
+    @settings.setter
+    def settings(self, value):
+        self._settings = value
+    
+    @property
+    def profile_picture_thumb(self):
+        """Profile picture URL for lists, the thumbnail once it was generated"""
+        return self.profile_picture_variants.get("thumb") or self.profile_picture
+    
     def _hash_password(self, password):
-        """Hash the password using bcrypt"""
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        """Hash the password using bcrypt (on the password hashing pool)"""
+        return get_password_hasher().hash(password)
     
     def check_password(self, password):
         """Check if the provided password matches the stored hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return get_password_hasher().check(password, self.password_hash)
+    
+    def rehash_password_if_needed(self, password):
+        """Re-hash a just verified password if the configured bcrypt cost changed.
+        
+        Returns True if the new hash was saved.
+        """
+        hasher = get_password_hasher()
+        if not hasher.needs_rehash(self.password_hash):
+            return False
+        
+        self.password_hash = hasher.hash(password)
+        self.save()
+        return True
     
     def to_dict(self):
         """Convert User object to dictionary for database storage"""
@@ -62,6 +130,7 @@ class User:
             "password_hash": self.password_hash,
             "user_type": self.user_type,
             "profile_picture": self.profile_picture,
+            "profile_picture_variants": self.profile_picture_variants,
             "bio": self.bio,
             "social_links": self.social_links,
             "onboarding_responses": self.onboarding_responses,
@@ -76,117 +145,223 @@ class User:
     
     @classmethod
     def from_dict(cls, data):
-        """Create a User object from a dictionary"""
-        user = cls(
-            username=data["username"],
-            email=data["email"],
-            phone=data["phone"],
-            password="",  # Not used when creating from dictionary
-            user_type=data["user_type"],
-            profile_picture=data.get("profile_picture"),
-            social_links=data.get("social_links"),
-            onboarding_responses=data.get("onboarding_responses")
-        )
-        user.password_hash = data["password_hash"]
+        """Create a User object from a database document.
+        
+        Bypasses __init__ so loading a user never runs bcrypt; defaults are only
+        built for fields missing from the document.
+        """
+        user = cls.__new__(cls)
+        user.username = data.get("username")
+        user.email = data.get("email")
+        user.phone = data.get("phone")
+        user.password_hash = data.get("password_hash")
+        user.user_type = data.get("user_type")
+        user.profile_picture = data.get("profile_picture")
+        user.profile_picture_variants = data.get("profile_picture_variants") or {}
         user.bio = data.get("bio", "")
-        user.favorites = data.get("favorites", {"users": [], "projects": []})
-        
-        # Set settings with defaults if not present
-        user.settings = data.get("settings", {
-            "notifications": {
-                "email_notifications": True,
-                "push_notifications": True,
-                "message_notifications": True,
-                "collaboration_notifications": True
-            },
-            "privacy": {
-                "show_email": False,
-                "show_phone": False,
-                "show_projects": True,
-                "allow_messages_from": "everyone",
-                "profile_visibility": "public"
-            },
-            "theme": {
-                "mode": "light",
-                "color": "blue",
-                "font_size": "medium"
-            }
-        })
-        
-        user.created_at = data.get("created_at", datetime.now(timezone.utc))
-        user.updated_at = data.get("updated_at", datetime.now(timezone.utc))
+        user.social_links = data.get("social_links") or {}
+        user.onboarding_responses = data.get("onboarding_responses") or {}
+        user.favorites = data.get("favorites") or {"users": [], "projects": []}
+        
+        # Default settings are only built if the settings are used
+        user._settings = data.get("settings")
+        
+        created_at = data.get("created_at")
+        updated_at = data.get("updated_at")
+        user.created_at = created_at if created_at is not None else datetime.now(timezone.utc)
+        user.updated_at = updated_at if updated_at is not None else user.created_at
+        
         user.email_verified = data.get("email_verified", False)
         user.phone_verified = data.get("phone_verified", False)
         user.is_open_to_more = data.get("is_open_to_more", True)
         
         if "_id" in data:
             user._id = data["_id"]
-            
+        
+        user._start_tracking()
         return user
     
     @classmethod
     def find_by_id(cls, user_id):
         """Find user by ID"""
-        data = db.sports_figures_data_combined.find_one({"_id": ObjectId(user_id)})
+        user = cls._from_identity_map(user_id)
+        if user is not None:
+            return user
+        
+        data = cls.get_collection().find_one({"_id": ObjectId(user_id)})
         if data:
             data["_id"] = str(data["_id"])
-            return cls.from_dict(data)
+            return cls._track(cls.from_dict(data))
         return None
 
+    @classmethod
+    def find_by_id_cached(cls, user_id):
+        """Find user by ID through the short-lived in-process user cache.
+        
+        The cache holds BSON-encoded documents, so every request still gets
+        its own User object to modify.
+        """
+        user = cls._from_identity_map(user_id)
+        if user is not None:
+            return user
+        
+        def load():
+            data = cls.get_collection().find_one({"_id": ObjectId(user_id)})
+            return bson.encode(data) if data else None
+        
+        encoded = get_cache("user").get_or_load(str(user_id), load)
+        if encoded is None:
+            return None
+        
+        data = bson.decode(encoded)
+        data["_id"] = str(data["_id"])
+        return cls._track(cls.from_dict(data))
+    
+    def _invalidate_cache(self):
+        """Drop this user from the user and profile caches after it was written"""
+        if hasattr(self, "_id"):
+            self.invalidate_cached(self._id)
+    
+    @staticmethod
+    def invalidate_cached(user_id):
+        """Drop a user from the user and profile caches"""
+        # Imported here, the profile cache depends on this module
+        from app.api.services import profile_cache
+        get_cache("user").delete(str(user_id))
+        profile_cache.invalidate(user_id)
+    
+    @classmethod
+    def set_profile_picture_variants(cls, user_id, original_url, variants):
+        """Switch a processed profile picture to its variants.
+        
+        Only applies while original_url is still the user's picture, so a
+        newer upload is never overwritten. Returns True if it was applied.
+        """
+        result = cls.get_collection().update_one(
+            {"_id": ObjectId(user_id), "profile_picture": original_url},
+            {"$set": {
+                "profile_picture": variants["full"],
+                "profile_picture_variants": variants,
+                "updated_at": datetime.now(timezone.utc)
+            }}
+        )
+        cls.invalidate_cached(user_id)
+        return result.modified_count > 0
+    
     @classmethod
     def find_by_username(cls, username):
         """Find user by username"""
-        data = db.sports_figures_data_combined.find_one({"username": username})
+        data = cls.get_collection().find_one({"username": username})
         if data:
             data["_id"] = str(data["_id"])
-            return cls.from_dict(data)
+            return cls._track(cls.from_dict(data))
         return None
     
     @classmethod
     def find_by_email(cls, email):
         """Find user by email"""
-        data = db.sports_figures_data_combined.find_one({"email": email})
+        data = cls.get_collection().find_one({"email": email})
         if data:
             data["_id"] = str(data["_id"])
-            return cls.from_dict(data)
+            return cls._track(cls.from_dict(data))
         return None
     
     @classmethod
     def find_by_phone(cls, phone):
         """Find user by phone number"""
-        data = db.sports_figures_data_combined.find_one({"phone": phone})
+        data = cls.get_collection().find_one({"phone": phone})
         if data:
             data["_id"] = str(data["_id"])
-            return cls.from_dict(data)
+            return cls._track(cls.from_dict(data))
         return None
     
     def save(self):
         """Save user to database"""
+        try:
+            return self._write()
+        finally:
+            # Invalidate after writing so a concurrent load cannot re-cache the old document
+            self._invalidate_cache()
+    
+    def _write(self):
+        """Write the user's changes, or the whole user if it was never loaded"""
+        self._forget()
+        
+        if hasattr(self, "_id") and self._is_tracking():
+            # Only write the fields that changed since the user was loaded
+            self._save_changes(updated_at=datetime.now(timezone.utc))
+            return self._id
+        
         user_dict = self.to_dict()
         user_dict["updated_at"] = datetime.now(timezone.utc)
         
         if hasattr(self, "_id"):
             # Update existing user
-            result = db.sports_figures_data_combined.update_one(
+            result = self.get_collection().update_one(
                 {"_id": ObjectId(self._id)}, 
                 {"$set": user_dict}
             )
+            self._start_tracking()
             return self._id
         else:
             # Check if a user with this email already exists
             existing_user = User.find_by_email(self.email)
             if existing_user:
                 self._id = existing_user._id
-                return db.sports_figures_data_combined.update_one(
+                return self.get_collection().update_one(
                     {"_id": ObjectId(self._id)}, 
                     {"$set": user_dict}
                 )
             else:
                 # Insert new user
-                result = db.sports_figures_data_combined.insert_one(user_dict)
+                result = self.get_collection().insert_one(user_dict)
                 self._id = str(result.inserted_id)
+                self._start_tracking()
                 return self._id
     
+    def toggle_favorite(self, kind, object_id):
+        """Add or remove a user/project from favorites, returning whether it is now favorited.
+        
+        Written immediately, with updates conditioned on the stored list rather
+        than on this object, which may be a stale copy from the user cache. The
+        result always comes from an update that changed the document, so
+        counters can follow it; None means the user no longer exists.
+        """
+        path = f"favorites.{kind}"
+        collection = self.get_collection()
+        query = {"_id": ObjectId(self._id)}
+        favorited = None
+        try:
+            # Retried when a concurrent toggle changes the list between the two updates
+            for _ in range(3):
+                now = datetime.now(timezone.utc)
+                if collection.update_one({**query, path: {"$ne": object_id}},
+                                         {"$addToSet": {path: object_id}, "$set": {"updated_at": now}}).modified_count:
+                    favorited = True
+                    break
+                if collection.update_one({**query, path: object_id},
+                                         {"$pull": {path: object_id}, "$set": {"updated_at": now}}).modified_count:
+                    favorited = False
+                    break
+        finally:
+            self._invalidate_cache()
+        
+        if favorited is not None:
+            # Keep this object in line without queueing another write
+            favorites = self.favorites.setdefault(kind, [])
+            if favorited and object_id not in favorites:
+                favorites.append(object_id)
+            elif not favorited and object_id in favorites:
+                favorites.remove(object_id)
+        return favorited
+    
+    def update_settings(self, section, values):
+        """Update one section of the user's settings, e.g. privacy"""
+        if not isinstance(self.settings.get(section), dict):
+            self.set_path(f"settings.{section}", {})
+        for key, value in values.items():
+            self.set_path(f"settings.{section}.{key}", value)
+    
     def update(self, data):
         """Update user with provided data"""
         for key, value in data.items():
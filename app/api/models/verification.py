@@ -1,9 +1,30 @@
 import random
 import string
 from datetime import datetime, timedelta, timezone
-from app.config.database import db
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+from app.api.models.base import Model
 
-class VerificationCode:
+class VerificationCode(Model):
+    __slots__ = ("user_id", "email", "phone", "code_type", "purpose", "code", "is_used",
+                 "attempts", "expires_at", "created_at")
+    
+    collection_name = "verification_codes"
+    
+    indexes = [
+        IndexModel([("user_id", ASCENDING), ("code_type", ASCENDING), ("purpose", ASCENDING)],
+                   name="user_id_1_code_type_1_purpose_1"),
+        IndexModel([("code", ASCENDING)], name="code_1"),
+        # Expire after 1 hour
+        IndexModel([("created_at", ASCENDING)], name="created_at_1", expireAfterSeconds=3600),
+    ]
+    
+    query_shapes = {
+        "find_active_code": ({"user_id": "", "code_type": "email", "purpose": "verification",
+                              "is_used": False, "expires_at": {"$gt": datetime(1970, 1, 1)}}, None),
+        "find_by_code": ({"code": "", "is_used": False, "expires_at": {"$gt": datetime(1970, 1, 1)}}, None),
+    }
+    
     def __init__(self, user_id, email=None, phone=None, code_type="email", purpose="verification"):
         self.user_id = user_id
         self.email = email
@@ -38,13 +59,12 @@ class VerificationCode:
     @classmethod
     def from_dict(cls, data):
         """Create a VerificationCode object from a dictionary"""
-        code = cls(
-            user_id=data["user_id"],
-            email=data.get("email"),
-            phone=data.get("phone"),
-            code_type=data["code_type"],
-            purpose=data["purpose"]
-        )
+        code = cls.__new__(cls)
+        code.user_id = data["user_id"]
+        code.email = data.get("email")
+        code.phone = data.get("phone")
+        code.code_type = data["code_type"]
+        code.purpose = data["purpose"]
         code.code = data["code"]
         code.is_used = data["is_used"]
         code.attempts = data["attempts"]
@@ -62,12 +82,13 @@ class VerificationCode:
         
         if "_id" in data:
             code._id = str(data["_id"])
+        code._start_tracking()
         return code
     
     @classmethod
     def find_active_code(cls, user_id, code_type, purpose):
         """Find an active verification code for a user"""
-        data = db.verification_codes.find_one({
+        data = cls.get_collection().find_one({
             "user_id": user_id,
             "code_type": code_type,
             "purpose": purpose,
@@ -94,7 +115,7 @@ class VerificationCode:
         if purpose:
             query["purpose"] = purpose
         
-        data = db.verification_codes.find_one(query)
+        data = cls.get_collection().find_one(query)
         if data:
             data["_id"] = str(data["_id"])
             return cls.from_dict(data)
@@ -102,21 +123,27 @@ class VerificationCode:
     
     def save(self):
         """Save verification code to database"""
+        if hasattr(self, "_id") and self._is_tracking():
+            # Only write the fields that changed since the code was loaded
+            self._save_changes()
+            return self._id
+        
         if hasattr(self, "_id"):
-            db.verification_codes.update_one(
-                {"_id": self._id},
+            self.get_collection().update_one(
+                {"_id": ObjectId(self._id)},
                 {"$set": self.to_dict()}
             )
-            return self._id
         else:
-            result = db.verification_codes.insert_one(self.to_dict())
+            result = self.get_collection().insert_one(self.to_dict())
             self._id = str(result.inserted_id)
-            return self._id
+        
+        self._start_tracking()
+        return self._id
     
     def verify(self, code):
         """Verify that the provided code matches this verification code"""
         # Increment attempts
-        self.attempts += 1
+        self.inc("attempts")
         
         if self.is_used:
             return {"status": False, "message": "Code already used"}
@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
 from app.api.models.message import Message
+from app.api.models.conversation import Conversation
 from app.api.models.user import User
+from app.api.services import presence, profile_cache
 from app.api.middlewares.auth_middleware import token_required, requires_verification
+from app.api.utils import http_cache
+from app.api.utils.pagination import next_cursor
 
 message_bp = Blueprint('message', __name__)
 
@@ -15,47 +19,63 @@ def get_conversations(current_user):
     limit = min(request.args.get('limit', 20, type=int), 50)  # Maximum 50 per page
     skip = (page - 1) * limit
     
-    # Get conversations
-    conversations = Message.find_by_user(current_user._id, skip, limit)
+    # Get conversation summaries with a single indexed query
+    conversations = Conversation.find_by_user(current_user._id, skip, limit)
+    
+    # Load every other user from the profile cache
+    other_user_ids = [conversation.other_participant(current_user._id) for conversation in conversations]
+    other_users = profile_cache.get_profiles(other_user_ids)
+    
+    # Get unread count
+    unread_count = Message.get_unread_count(current_user._id)
+    
+    # One batched lookup in the presence store, no database read
+    online_user_ids = presence.online_many(other_user_ids)
+    
+    # Every change to a conversation (new message, read receipt) moves its updated_at
+    etag = http_cache.make_etag(
+        current_user._id, unread_count,
+        [(conversation._id, conversation.updated_at) for conversation in conversations],
+        sorted((user._id, user.updated_at) for user in other_users.values()),
+        sorted(online_user_ids)
+    )
+    not_modified = http_cache.not_modified(etag)
+    if not_modified:
+        return not_modified
     
     # Format response
     formatted_conversations = []
-    for conversation in conversations:
-        conversation_id = conversation["conversation_id"]
-        latest_message = conversation["latest_message"]
-        
-        # Determine the other user in the conversation
-        other_user_id = latest_message.sender_id if latest_message.sender_id != current_user._id else latest_message.receiver_id
-        other_user = User.find_by_id(other_user_id)
+    for conversation, other_user_id in zip(conversations, other_user_ids):
+        other_user = other_users.get(other_user_id)
+        latest_message = conversation.last_message
         
-        if other_user:
+        if other_user and latest_message:
             formatted_conversations.append({
-                "conversation_id": conversation_id,
+                "conversation_id": conversation._id,
                 "other_user": {
                     "id": other_user._id,
                     "username": other_user.username,
-                    "profile_picture": other_user.profile_picture
+                    "profile_picture": other_user.profile_picture_thumb,
+                    "is_online": other_user_id in online_user_ids
                 },
                 "latest_message": {
-                    "id": latest_message._id,
-                    "content": latest_message.content,
-                    "sender_id": latest_message.sender_id,
-                    "is_read": latest_message.is_read,
-                    "message_type": latest_message.message_type,
-                    "created_at": latest_message.created_at
-                }
+                    "id": latest_message["id"],
+                    "content": latest_message["content"],
+                    "sender_id": latest_message["sender_id"],
+                    "is_read": latest_message["is_read"],
+                    "message_type": latest_message["message_type"],
+                    "created_at": latest_message["created_at"]
+                },
+                "unread_count": conversation.unread_count_for(current_user._id)
             })
     
-    # Get unread count
-    unread_count = Message.get_unread_count(current_user._id)
-    
-    return jsonify({
+    return http_cache.cacheable(jsonify({
         "status": True,
         "conversations": formatted_conversations,
         "unread_count": unread_count,
         "page": page,
         "limit": limit
-    }), 200
+    }), etag), 200
 
 @message_bp.route('/conversations/<conversation_id>', methods=['GET'])
 @token_required
@@ -80,20 +100,38 @@ def get_conversation_messages(current_user, conversation_id):
     if not is_participant:
         return jsonify({"status": False, "message": "You are not a participant in this conversation"}), 403
     
-    # Get pagination parameters
+    # Get pagination parameters (cursor takes precedence over page)
     page = request.args.get('page', 1, type=int)
     limit = min(request.args.get('limit', 50, type=int), 100)  # Maximum 100 per page
     skip = (page - 1) * limit
+    cursor = request.args.get('cursor')
+    
+    # Get other user information
+    other_user = profile_cache.get_profile(other_user_id) if other_user_id else None
+    
+    # Messages are only added or marked read through the conversation summary,
+    # so an unchanged summary means the client's page is still current and
+    # there is nothing left to mark as read
+    conversation = Conversation.find_by_id(conversation_id)
+    etag = None
+    if conversation:
+        etag = http_cache.make_etag(
+            current_user._id, conversation._id, conversation.updated_at,
+            other_user.updated_at if other_user else None
+        )
+        not_modified = http_cache.not_modified(etag)
+        if not_modified:
+            return not_modified
     
     # Get messages
-    messages = Message.find_by_conversation(conversation_id, skip, limit)
+    try:
+        messages = Message.find_by_conversation(conversation_id, skip, limit, cursor=cursor)
+    except ValueError:
+        return jsonify({"status": False, "message": "Invalid cursor"}), 400
     
     # Mark messages as read
     Message.mark_conversation_as_read(conversation_id, current_user._id)
     
-    # Get other user information
-    other_user = User.find_by_id(other_user_id) if other_user_id else None
-    
     # Format response
     formatted_messages = []
     for msg in messages:
@@ -106,19 +144,20 @@ def get_conversation_messages(current_user, conversation_id):
             "created_at": msg.created_at
         })
     
-    return jsonify({
+    return http_cache.cacheable(jsonify({
         "status": True,
         "conversation_id": conversation_id,
         "messages": formatted_messages,
         "other_user": {
             "id": other_user._id,
             "username": other_user.username,
-            "profile_picture": other_user.profile_picture,
+            "profile_picture": other_user.profile_picture_thumb,
             "user_type": other_user.user_type
         } if other_user else None,
         "page": page,
-        "limit": limit
-    }), 200
+        "limit": limit,
+        "next_cursor": next_cursor(messages, limit)
+    }), etag), 200
 
 @message_bp.route('/send/<user_id>', methods=['POST'])
 @token_required
@@ -1,8 +1,9 @@
-import os
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
+from bson import ObjectId
 from app.api.models.user import User
+from app.api.services import image_service, media_storage, profile_cache
+from app.api.utils import http_cache
 from app.api.middlewares.auth_middleware import token_required, requires_verification
-from werkzeug.utils import secure_filename
 import validators
 
 profile_bp = Blueprint('profile', __name__)
@@ -11,7 +12,12 @@ profile_bp = Blueprint('profile', __name__)
 @token_required
 def get_profile(current_user):
     """Get the current user's profile"""
-    return jsonify({
+    etag = http_cache.make_etag(current_user._id, current_user.updated_at)
+    not_modified = http_cache.not_modified(etag, current_user.updated_at)
+    if not_modified:
+        return not_modified
+    
+    return http_cache.cacheable(jsonify({
         "status": True,
         "profile": {
             "id": current_user._id,
@@ -20,6 +26,7 @@ def get_profile(current_user):
             "phone": current_user.phone,
             "user_type": current_user.user_type,
             "profile_picture": current_user.profile_picture,
+            "profile_picture_variants": current_user.profile_picture_variants,
             "bio": current_user.bio,
             "social_links": current_user.social_links,
             "onboarding_responses": current_user.onboarding_responses,
@@ -27,30 +34,38 @@ def get_profile(current_user):
             "phone_verified": current_user.phone_verified,
             "is_open_to_more": current_user.is_open_to_more
         }
-    }), 200
+    }), etag, current_user.updated_at), 200
 
 @profile_bp.route('/<user_id>', methods=['GET'])
 @token_required
 def get_user_profile(current_user, user_id):
     """Get another user's profile"""
-    user = User.find_by_username(user_id)
+    user = profile_cache.get_profile(user_id) if ObjectId.is_valid(user_id) else None
     
     if not user:
         return jsonify({"status": False, "message": "User not found"}), 404
     
-    return jsonify({
+    # Only the favorite flag depends on the viewer
+    is_favorited = user._id in current_user.favorites['users']
+    etag = http_cache.make_etag(current_user._id, user._id, user.updated_at, is_favorited)
+    not_modified = http_cache.not_modified(etag)
+    if not_modified:
+        return not_modified
+    
+    return http_cache.cacheable(jsonify({
         "status": True,
         "profile": {
             "id": user._id,
             "username": user.username,
             "user_type": user.user_type,
             "profile_picture": user.profile_picture,
+            "profile_picture_variants": user.profile_picture_variants,
             "bio": user.bio,
             "social_links": user.social_links,
             "is_open_to_more": user.is_open_to_more,
-            "is_favorited": user._id in current_user.favorites['users']
+            "is_favorited": is_favorited
         }
-    }), 200
+    }), etag), 200
 
 @profile_bp.route('/onboarding', methods=['POST'])
 @token_required
@@ -145,22 +160,34 @@ def update_profile_picture(current_user):
         if '.' not in file.filename or file.filename.rsplit('.', 1)[1].lower() not in allowed_extensions:
             return jsonify({"status": False, "message": "Invalid file type. Allowed types: png, jpg, jpeg, gif"}), 400
         
-        # Create a secure filename
-        filename = secure_filename(f"{current_user._id}_{file.filename}")
-        
-        # Save file
-        profile_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'profiles')
-        file_path = os.path.join(profile_dir, filename)
-        file.save(file_path)
+        # Store the upload by content hash, variants are generated in the background
+        try:
+            stored = media_storage.store_upload(file, allowed_extensions)
+        except media_storage.UploadTooLarge as e:
+            return jsonify({"status": False, "message": str(e)}), 413
+        except media_storage.UploadError as e:
+            return jsonify({"status": False, "message": str(e)}), 400
         
         # Update user's profile_picture field
-        current_user.profile_picture = f"/profiles/{filename}"
+        previous_picture = current_user.profile_picture
+        if stored.variants:
+            # The same image was uploaded and processed before
+            current_user.profile_picture = stored.variants["full"]
+            current_user.profile_picture_variants = stored.variants
+        else:
+            current_user.profile_picture = stored.url
+            current_user.profile_picture_variants = {}
         current_user.save()
+        if not stored.variants:
+            image_service.schedule_profile_picture(current_user._id, current_user.profile_picture)
+        # Free the old picture unless someone else uses it
+        media_storage.release_all([previous_picture] if previous_picture else [])
         
         return jsonify({
             "status": True,
             "message": "Profile picture updated successfully",
-            "profile_picture": current_user.profile_picture
+            "profile_picture": current_user.profile_picture,
+            "processing": not stored.variants
         }), 200
     
     return jsonify({"status": False, "message": "Failed to upload profile picture"}), 400
@@ -179,20 +206,14 @@ def favorite_user(current_user, user_id):
     if user_id == current_user._id:
         return jsonify({"status": False, "message": "Cannot favorite yourself"}), 400
     
-    # Toggle favorite
-    if user_id in current_user.favorites['users']:
-        current_user.favorites['users'].remove(user_id)
-        action = "removed from"
-    else:
-        current_user.favorites['users'].append(user_id)
-        action = "added to"
-    
-    current_user.save()
+    # Toggle favorite (written by the toggle itself)
+    is_favorited = current_user.toggle_favorite('users', user_id)
+    action = "added to" if is_favorited else "removed from"
     
     return jsonify({
         "status": True,
         "message": f"User {action} favorites",
-        "is_favorited": user_id in current_user.favorites['users']
+        "is_favorited": is_favorited
     }), 200
 
 @profile_bp.route('/favorites/users', methods=['GET'])
@@ -202,14 +223,17 @@ def get_favorite_users(current_user):
     """Get user's favorite users"""
     favorite_users = []
     
+    # Load every favorite with a single query
+    users = profile_cache.get_profiles(current_user.favorites['users'])
+    
     for user_id in current_user.favorites['users']:
-        user = User.find_by_id(user_id)
+        user = users.get(user_id)
         if user:
             favorite_users.append({
                 "id": user._id,
                 "username": user.username,
                 "user_type": user.user_type,
-                "profile_picture": user.profile_picture,
+                "profile_picture": user.profile_picture_thumb,
                 "bio": user.bio
             })
     
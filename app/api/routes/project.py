@@ -1,12 +1,16 @@
-import os
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
 from app.api.models.project import Project
-from app.api.models.user import User
+from app.api.models.collaboration_request import CollaborationRequest
+from app.api.services import chunked_upload, image_service, media_storage, profile_cache
+from app.api.utils import http_cache
 from app.api.middlewares.auth_middleware import token_required, requires_verification
-from werkzeug.utils import secure_filename
+from app.api.utils.pagination import next_cursor
 
 project_bp = Blueprint('project', __name__)
 
+# Image types accepted for project uploads
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
 @project_bp.route('/', methods=['POST'])
 @token_required
 @requires_verification
@@ -54,28 +58,40 @@ def get_project(current_user, project_id):
     # Check if project is in user's favorites
     is_favorited = project_id in current_user.favorites['projects']
     
+    # Load the owner and collaborators from the profile cache
+    users = profile_cache.get_profiles([project.user_id] + project.collaborators)
+    
+    # The response changes with the project, the viewer's favorite and the shown profiles
+    etag = http_cache.make_etag(
+        current_user._id, project._id, project.updated_at, is_favorited,
+        sorted((user._id, user.updated_at) for user in users.values())
+    )
+    not_modified = http_cache.not_modified(etag)
+    if not_modified:
+        return not_modified
+    
     # Get project owner
-    owner = User.find_by_id(project.user_id)
+    owner = users.get(project.user_id)
     owner_info = {
         "id": owner._id,
         "username": owner.username,
         "user_type": owner.user_type,
-        "profile_picture": owner.profile_picture
+        "profile_picture": owner.profile_picture_thumb
     } if owner else {"id": project.user_id, "username": "Unknown User"}
     
     # Get collaborators
     collaborators = []
     for collab_id in project.collaborators:
-        collab = User.find_by_id(collab_id)
+        collab = users.get(collab_id)
         if collab:
             collaborators.append({
                 "id": collab._id,
                 "username": collab.username,
                 "user_type": collab.user_type,
-                "profile_picture": collab.profile_picture
+                "profile_picture": collab.profile_picture_thumb
             })
     
-    return jsonify({
+    return http_cache.cacheable(jsonify({
         "status": True,
         "project": {
             "id": project._id,
@@ -95,7 +111,7 @@ def get_project(current_user, project_id):
             "created_at": project.created_at,
             "updated_at": project.updated_at
         }
-    }), 200
+    }), etag), 200
 
 @project_bp.route('/<project_id>', methods=['PUT'])
 @token_required
@@ -140,14 +156,9 @@ def update_project(current_user, project_id):
 @requires_verification
 def upload_project_images(current_user, project_id):
     """Upload images for a project"""
-    project = Project.find_by_id(project_id)
-    
-    if not project:
-        return jsonify({"status": False, "message": "Project not found"}), 404
-    
-    # Check if user is the owner or a collaborator
-    if project.user_id != current_user._id and current_user._id not in project.collaborators:
-        return jsonify({"status": False, "message": "You don't have permission to update this project"}), 403
+    project, error = _find_editable_project(current_user, project_id)
+    if error:
+        return error
     
     if 'files' not in request.files:
         return jsonify({"status": False, "message": "No files provided"}), 400
@@ -157,35 +168,177 @@ def upload_project_images(current_user, project_id):
     if not files or files[0].filename == '':
         return jsonify({"status": False, "message": "No files selected"}), 400
     
-    # Validate file types and save
-    allowed_extensions = {'png', 'jpg', 'jpeg', 'gif'}
-    uploaded_files = []
+    stored_files = []
+    too_large = None
     
     for file in files:
-        if file and '.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in allowed_extensions:
-            # Create a secure filename
-            filename = secure_filename(f"{project._id}_{len(project.images)}_{file.filename}")
-            
-            # Save file
-            project_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'projects')
-            file_path = os.path.join(project_dir, filename)
-            file.save(file_path)
-            
-            # Add to project images
-            image_url = f"/projects/{filename}"
-            project.images.append(image_url)
-            uploaded_files.append(image_url)
+        # Store each upload by content hash, variants are generated in the background
+        try:
+            stored_files.append(media_storage.store_upload(file, IMAGE_EXTENSIONS))
+        except media_storage.UploadTooLarge as e:
+            too_large = str(e)
+        except media_storage.UploadError:
+            continue
+    
+    uploaded_files, pending = _attach_images(project, stored_files)
     
     if uploaded_files:
-        project.save()
         return jsonify({
             "status": True,
             "message": f"{len(uploaded_files)} images uploaded successfully",
-            "images": uploaded_files
+            "images": uploaded_files,
+            "processing": bool(pending)
         }), 200
+    elif too_large:
+        return jsonify({"status": False, "message": too_large}), 413
     else:
         return jsonify({"status": False, "message": "No valid images to upload"}), 400
 
+def _attach_images(project, stored_files):
+    """Add stored uploads to a project's images and schedule their processing.
+    
+    Images the project already has are released. Returns (image URLs
+    added, image URLs still being processed).
+    """
+    uploaded_files = []
+    pending = []
+    for stored in stored_files:
+        image_url = stored.variants["full"] if stored.variants else stored.url
+        if image_url in project.images or image_url in uploaded_files:
+            # The project already has this image
+            media_storage.release(stored.url)
+            continue
+        project.add_image(image_url, stored.variants)
+        uploaded_files.append(image_url)
+        if not stored.variants:
+            pending.append(image_url)
+    
+    if uploaded_files:
+        project.save()
+        for image_url in pending:
+            image_service.schedule_project_image(project._id, image_url)
+    return uploaded_files, pending
+
+def _find_editable_project(current_user, project_id):
+    """Get a project the user may add images to, or an error response"""
+    project = Project.find_by_id(project_id)
+    
+    if not project:
+        return None, (jsonify({"status": False, "message": "Project not found"}), 404)
+    
+    if project.user_id != current_user._id and current_user._id not in project.collaborators:
+        return None, (jsonify({"status": False, "message": "You don't have permission to update this project"}), 403)
+    
+    return project, None
+
+def _upload_error(e):
+    """Response for a rejected chunked upload"""
+    if isinstance(e, chunked_upload.UploadNotFound):
+        return jsonify({"status": False, "message": str(e)}), 404
+    if isinstance(e, media_storage.UploadTooLarge):
+        return jsonify({"status": False, "message": str(e)}), 413
+    if isinstance(e, (chunked_upload.UploadIncomplete, chunked_upload.UploadInProgress)):
+        return jsonify({"status": False, "message": str(e)}), 409
+    if isinstance(e, chunked_upload.UploadLimitReached):
+        return jsonify({"status": False, "message": str(e)}), 429
+    return jsonify({"status": False, "message": str(e)}), 400
+
+def _upload_status(session):
+    received = chunked_upload.received_chunks(session)
+    return {
+        "upload_id": session["id"],
+        "size": session["size"],
+        "chunk_size": session["chunk_size"],
+        "chunk_count": session["chunk_count"],
+        "received": received
+    }
+
+@project_bp.route('/<project_id>/uploads', methods=['POST'])
+@token_required
+@requires_verification
+def start_image_upload(current_user, project_id):
+    """Start a resumable upload of one image.
+    
+    The file is then sent with PUT /uploads/<upload_id>/chunks/<index>, in any
+    order and with retries, and attached with POST /uploads/<upload_id>/finalize.
+    """
+    project, error = _find_editable_project(current_user, project_id)
+    if error:
+        return error
+    
+    data = request.get_json() or {}
+    if not data.get('filename') or 'size' not in data:
+        return jsonify({"status": False, "message": "filename and size are required"}), 400
+    
+    try:
+        session = chunked_upload.create_session(current_user._id, project_id, data['filename'], data['size'],
+                                                IMAGE_EXTENSIONS, sha256=data.get('sha256'))
+    except media_storage.UploadError as e:
+        return _upload_error(e)
+    
+    return jsonify({"status": True, **_upload_status(session)}), 201
+
+@project_bp.route('/<project_id>/uploads/<upload_id>', methods=['GET'])
+@token_required
+def get_image_upload(current_user, project_id, upload_id):
+    """Get the chunks received so far, to resume an upload"""
+    try:
+        session = chunked_upload.load_session(upload_id, current_user._id, project_id)
+        status = _upload_status(session)
+    except media_storage.UploadError as e:
+        return _upload_error(e)
+    
+    return jsonify({"status": True, **status}), 200
+
+@project_bp.route('/<project_id>/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@token_required
+@requires_verification
+def upload_image_chunk(current_user, project_id, upload_id, index):
+    """Receive one chunk of a resumable upload, sent as the raw request body"""
+    try:
+        session = chunked_upload.load_session(upload_id, current_user._id, project_id)
+        chunked_upload.write_chunk(session, index, request.stream, request.content_length)
+    except media_storage.UploadError as e:
+        return _upload_error(e)
+    
+    return jsonify({"status": True, "index": index}), 200
+
+@project_bp.route('/<project_id>/uploads/<upload_id>/finalize', methods=['POST'])
+@token_required
+@requires_verification
+def finalize_image_upload(current_user, project_id, upload_id):
+    """Store a completely received upload and add it to the project's images"""
+    project, error = _find_editable_project(current_user, project_id)
+    if error:
+        return error
+    
+    try:
+        session = chunked_upload.load_session(upload_id, current_user._id, project_id)
+        stored = chunked_upload.finalize(session, IMAGE_EXTENSIONS)
+    except media_storage.UploadError as e:
+        return _upload_error(e)
+    
+    uploaded_files, pending = _attach_images(project, [stored])
+    return jsonify({
+        "status": True,
+        "message": "Image uploaded successfully" if uploaded_files else "The project already has this image",
+        "images": uploaded_files,
+        "processing": bool(pending)
+    }), 200
+
+@project_bp.route('/<project_id>/uploads/<upload_id>', methods=['DELETE'])
+@token_required
+@requires_verification
+def cancel_image_upload(current_user, project_id, upload_id):
+    """Abandon a resumable upload and delete what was received"""
+    try:
+        session = chunked_upload.load_session(upload_id, current_user._id, project_id)
+        chunked_upload.cancel(session)
+    except media_storage.UploadError as e:
+        return _upload_error(e)
+    
+    return jsonify({"status": True, "message": "Upload cancelled"}), 200
+
 @project_bp.route('/<project_id>/images/<int:image_index>', methods=['DELETE'])
 @token_required
 @requires_verification
@@ -204,10 +357,11 @@ def delete_project_image(current_user, project_id, image_index):
         return jsonify({"status": False, "message": "Invalid image index"}), 400
     
     # Get the image URL and remove from project
-    image_url = project.images.pop(image_index)
+    image_url = project.remove_image(image_index)
     project.save()
     
-    # TODO: delete the actual file (optional)
+    # Delete the file unless another project or profile uses it
+    media_storage.release(image_url)
     
     return jsonify({
         "status": True,
@@ -224,23 +378,22 @@ def favorite_project(current_user, project_id):
     if not project:
         return jsonify({"status": False, "message": "Project not found"}), 404
     
-    # Toggle favorite
-    if project_id in current_user.favorites['projects']:
-        current_user.favorites['projects'].remove(project_id)
-        project.favorites_count = max(0, project.favorites_count - 1)
-        action = "removed from"
-    else:
-        current_user.favorites['projects'].append(project_id)
-        project.favorites_count += 1
+    # Toggle favorite (written by the toggle itself, and only counted when it changed the list)
+    is_favorited = current_user.toggle_favorite('projects', project_id)
+    if is_favorited:
+        project.inc("favorites_count", 1)
         action = "added to"
+    else:
+        if is_favorited is False and project.favorites_count > 0:
+            project.inc("favorites_count", -1)
+        action = "removed from"
     
-    current_user.save()
     project.save()
     
     return jsonify({
         "status": True,
         "message": f"Project {action} favorites",
-        "is_favorited": project_id in current_user.favorites['projects'],
+        "is_favorited": is_favorited,
         "favorites_count": project.favorites_count
     }), 200
 
@@ -251,11 +404,15 @@ def get_favorite_projects(current_user):
     """Get user's favorite projects"""
     favorite_projects = []
     
+    # Load every favorite project, then every owner, with one query each
+    projects = Project.find_many_by_ids(current_user.favorites['projects'], fields=Project.LISTING_FIELDS)
+    owners = profile_cache.get_profiles([project.user_id for project in projects.values()])
+    
     for project_id in current_user.favorites['projects']:
-        project = Project.find_by_id(project_id)
+        project = projects.get(project_id)
         if project and not project.is_private:
             # Get owner
-            owner = User.find_by_id(project.user_id)
+            owner = owners.get(project.user_id)
             owner_info = {
                 "id": owner._id,
                 "username": owner.username
@@ -265,7 +422,7 @@ def get_favorite_projects(current_user):
                 "id": project._id,
                 "title": project.title,
                 "description": project.description,
-                "images": project.images[:1] if project.images else [],
+                "images": project.listing_images(),
                 "categories": project.categories,
                 "owner": owner_info,
                 "avg_rating": project.avg_rating
@@ -340,20 +497,18 @@ def send_project_collaboration_request(current_user, project_id):
     if current_user._id in project.collaborators:
         return jsonify({"status": False, "message": "You are already a collaborator on this project"}), 400
     
-    # Check for existing request
-    for req in project.collaboration_requests:
-        if req["user_id"] == current_user._id:
-            return jsonify({"status": False, "message": "You have already sent a collaboration request"}), 400
-    
     data = request.get_json() or {}
     message = data.get('message', 'I would like to collaborate on this project')
     
-    # Add request to project
-    project.add_collaboration_request(
+    # Add request to project (the unique index rejects a second request)
+    collaboration_request = project.add_collaboration_request(
         user_id=current_user._id,
         message=message
     )
     
+    if not collaboration_request:
+        return jsonify({"status": False, "message": "You have already sent a collaboration request"}), 400
+    
     # Notify the project owner via message
     from app.api.models.message import Message
     
@@ -398,11 +553,14 @@ def update_collaboration_request(current_user, project_id, user_id):
     if status not in ['accepted', 'rejected']:
         return jsonify({"status": False, "message": "Status must be 'accepted' or 'rejected'"}), 400
     
-    # Update request
+    # Update request (only a pending request can change status)
     result = project.update_collaboration_request(user_id, status)
     
     if not result:
-        return jsonify({"status": False, "message": "Collaboration request not found"}), 404
+        existing = CollaborationRequest.find_one(project._id, user_id)
+        if not existing:
+            return jsonify({"status": False, "message": "Collaboration request not found"}), 404
+        return jsonify({"status": False, "message": f"Collaboration request was already {existing.status}"}), 400
     
     # Notify the requester via message
     from app.api.models.message import Message
@@ -426,6 +584,81 @@ def update_collaboration_request(current_user, project_id, user_id):
         "message": f"Collaboration request {status}"
     }), 200
 
+def _format_collaboration_requests(collaboration_requests, include_user):
+    """Format collaboration requests with their projects (and requesters) loaded in batches"""
+    projects = Project.find_many_by_ids([r.project_id for r in collaboration_requests], fields=["user_id", "title", "description"])
+    users = profile_cache.get_profiles([r.user_id for r in collaboration_requests]) if include_user else {}
+    
+    formatted_requests = []
+    for r in collaboration_requests:
+        project = projects.get(r.project_id)
+        item = {
+            "id": r._id,
+            "project": {"id": r.project_id, "title": project.title if project else None},
+            "message": r.message,
+            "status": r.status,
+            "created_at": r.created_at,
+            "updated_at": r.updated_at
+        }
+        if include_user:
+            user = users.get(r.user_id)
+            item["user"] = {
+                "id": r.user_id,
+                "username": user.username if user else "Unknown User",
+                "user_type": user.user_type if user else None,
+                "profile_picture": user.profile_picture_thumb if user else None
+            }
+        formatted_requests.append(item)
+    return formatted_requests
+
+def _get_collaboration_request_filters():
+    """Get the status filter and pagination parameters, or an error response"""
+    status = request.args.get('status')
+    if status and status not in CollaborationRequest.STATUSES:
+        return None, (jsonify({"status": False, "message": "Status must be 'pending', 'accepted' or 'rejected'"}), 400)
+    
+    page = request.args.get('page', 1, type=int)
+    limit = min(request.args.get('limit', 20, type=int), 50)  # Maximum 50 per page
+    return (status, page, limit), None
+
+@project_bp.route('/collaboration-requests', methods=['GET'])
+@token_required
+@requires_verification
+def get_sent_collaboration_requests(current_user):
+    """Get the collaboration requests the current user sent"""
+    filters, error = _get_collaboration_request_filters()
+    if error:
+        return error
+    status, page, limit = filters
+    
+    collaboration_requests = CollaborationRequest.find_sent(current_user._id, status, (page - 1) * limit, limit)
+    
+    return jsonify({
+        "status": True,
+        "requests": _format_collaboration_requests(collaboration_requests, include_user=False),
+        "page": page,
+        "limit": limit
+    }), 200
+
+@project_bp.route('/collaboration-requests/received', methods=['GET'])
+@token_required
+@requires_verification
+def get_received_collaboration_requests(current_user):
+    """Get the collaboration requests sent for the current user's projects"""
+    filters, error = _get_collaboration_request_filters()
+    if error:
+        return error
+    status, page, limit = filters
+    
+    collaboration_requests = CollaborationRequest.find_received(current_user._id, status, (page - 1) * limit, limit)
+    
+    return jsonify({
+        "status": True,
+        "requests": _format_collaboration_requests(collaboration_requests, include_user=True),
+        "page": page,
+        "limit": limit
+    }), 200
+
 @project_bp.route('/<project_id>', methods=['DELETE'])
 @token_required
 @requires_verification
@@ -444,6 +677,7 @@ def delete_project(current_user, project_id):
     result = project.delete()
     
     if result:
+        media_storage.release_all(project.images)
         return jsonify({
             "status": True,
             "message": "Project deleted successfully"
@@ -461,18 +695,25 @@ def get_user_projects(current_user, user_id):
     # Determine if we should include private projects
     include_private = user_id == current_user._id
     
-    # Get pagination parameters
+    # Get pagination parameters (cursor takes precedence over page)
     page = request.args.get('page', 1, type=int)
     limit = min(request.args.get('limit', 10, type=int), 50)  # Maximum 50 per page
     skip = (page - 1) * limit
+    cursor = request.args.get('cursor')
     
     # Get projects
-    projects = Project.find_by_user_id(user_id, skip, limit, include_private)
+    try:
+        projects = Project.find_by_user_id(user_id, skip, limit, include_private, cursor=cursor)
+    except ValueError:
+        return jsonify({"status": False, "message": "Invalid cursor"}), 400
+    
+    # Load every owner from the profile cache
+    owners = profile_cache.get_profiles([project.user_id for project in projects])
     
     # Format response
     formatted_projects = []
     for project in projects:
-        owner = User.find_by_id(project.user_id)
+        owner = owners.get(project.user_id)
         owner_info = {
             "id": owner._id,
             "username": owner.username
@@ -482,7 +723,7 @@ def get_user_projects(current_user, user_id):
             "id": project._id,
             "title": project.title,
             "description": project.description,
-            "images": project.images[:1] if project.images else [],
+            "images": project.listing_images(),
             "categories": project.categories,
             "budget": project.budget,
             "owner": owner_info,
@@ -496,7 +737,8 @@ def get_user_projects(current_user, user_id):
         "status": True,
         "projects": formatted_projects,
         "page": page,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor(projects, limit)
     }), 200
 
 @project_bp.route('/categories', methods=['GET'])
@@ -509,18 +751,25 @@ def get_projects_by_categories(current_user):
     if not categories:
         return jsonify({"status": False, "message": "At least one category is required"}), 400
     
-    # Get pagination parameters
+    # Get pagination parameters (cursor takes precedence over page)
     page = request.args.get('page', 1, type=int)
     limit = min(request.args.get('limit', 10, type=int), 50)  # Maximum 50 per page
     skip = (page - 1) * limit
+    cursor = request.args.get('cursor')
     
     # Get projects
-    projects = Project.find_by_categories(categories, skip, limit)
+    try:
+        projects = Project.find_by_categories(categories, skip, limit, cursor=cursor)
+    except ValueError:
+        return jsonify({"status": False, "message": "Invalid cursor"}), 400
+    
+    # Load every owner from the profile cache
+    owners = profile_cache.get_profiles([project.user_id for project in projects])
     
     # Format response
     formatted_projects = []
     for project in projects:
-        owner = User.find_by_id(project.user_id)
+        owner = owners.get(project.user_id)
         owner_info = {
             "id": owner._id,
             "username": owner.username
@@ -530,7 +779,7 @@ def get_projects_by_categories(current_user):
             "id": project._id,
             "title": project.title,
             "description": project.description,
-            "images": project.images[:1] if project.images else [],
+            "images": project.listing_images(),
             "categories": project.categories,
             "owner": owner_info,
             "favorites_count": project.favorites_count,
@@ -544,5 +793,6 @@ def get_projects_by_categories(current_user):
         "projects": formatted_projects,
         "categories": categories,
         "page": page,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor(projects, limit)
     }), 200 
\ No newline at end of file
@@ -73,14 +73,8 @@ def update_notification_settings(current_user):
                 "message": f"Value for {key} must be a boolean"
             }), 400
     
-    # Initialize settings if not exist
-    if not hasattr(current_user, 'settings'):
-        current_user.settings = {}
-    if 'notifications' not in current_user.settings:
-        current_user.settings['notifications'] = {}
-    
     # Update notification settings
-    current_user.settings['notifications'].update(data)
+    current_user.update_settings('notifications', data)
     current_user.save()
     
     return jsonify({
@@ -123,14 +117,8 @@ def update_privacy_settings(current_user):
                 "message": f"Value for {key} must be a {valid_privacy_settings[key].__name__}"
             }), 400
     
-    # Initialize settings if not exist
-    if not hasattr(current_user, 'settings'):
-        current_user.settings = {}
-    if 'privacy' not in current_user.settings:
-        current_user.settings['privacy'] = {}
-    
     # Update privacy settings
-    current_user.settings['privacy'].update(data)
+    current_user.update_settings('privacy', data)
     current_user.save()
     
     return jsonify({
@@ -165,14 +153,8 @@ def update_theme_settings(current_user):
                 "message": f"Invalid value for {key}. Valid values are: {', '.join(valid_theme_settings[key])}"
             }), 400
     
-    # Initialize settings if not exist
-    if not hasattr(current_user, 'settings'):
-        current_user.settings = {}
-    if 'theme' not in current_user.settings:
-        current_user.settings['theme'] = {}
-    
     # Update theme settings
-    current_user.settings['theme'].update(data)
+    current_user.update_settings('theme', data)
     current_user.save()
     
     return jsonify({
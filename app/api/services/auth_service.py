@@ -5,6 +5,7 @@ from datetime import datetime, timedelta, timezone
 import jwt
 from app.api.models.user import User
 from app.api.models.verification import VerificationCode
+from app.api.services.password_hasher import PasswordHasherBusy
 
 class AuthService:
     @staticmethod
@@ -55,6 +56,12 @@ class AuthService:
         if not user.check_password(password):
             return {"status": False, "message": "Invalid password"}
         
+        # Upgrade the hash if the bcrypt cost changed; this can wait for a quieter moment
+        try:
+            user.rehash_password_if_needed(password)
+        except PasswordHasherBusy:
+            pass
+        
         # Generate JWT token
         token = AuthService.generate_token(user._id)
         
@@ -0,0 +1,251 @@
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from flask import current_app
+from app.api.services import media_storage
+from app.api.services.media_storage import CHUNK_SIZE, UploadError, UploadTooLarge
+
+# Upload IDs are UUID4 hex strings, which also keeps them safe as directory names
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+class UploadNotFound(UploadError):
+    """Raised when an upload session does not exist, expired or belongs to someone else"""
+
+class UploadIncomplete(UploadError):
+    """Raised when finalizing an upload that is still missing chunks"""
+
+class UploadInProgress(UploadError):
+    """Raised when an upload is already being finalized by another request"""
+
+class UploadLimitReached(UploadError):
+    """Raised when a user has too many unfinished uploads, or too many bytes in them"""
+
+def _sessions_dir():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'partial')
+
+def _session_dir(upload_id):
+    return os.path.join(_sessions_dir(), upload_id)
+
+def _data_path(session):
+    return os.path.join(_session_dir(session["id"]), "data")
+
+def _chunks_dir(session):
+    return os.path.join(_session_dir(session["id"]), "chunks")
+
+def _finalizing_path(session):
+    return os.path.join(_session_dir(session["id"]), "finalizing")
+
+def _expired(session):
+    return time.time() - session["created_at"] > current_app.config.get('UPLOAD_SESSION_TTL', 86400)
+
+def _user_sessions(user_id):
+    """Get the unexpired upload sessions of a user"""
+    try:
+        upload_ids = os.listdir(_sessions_dir())
+    except FileNotFoundError:
+        return []
+
+    sessions = []
+    for upload_id in upload_ids:
+        try:
+            with open(os.path.join(_session_dir(upload_id), "session.json")) as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if session["user_id"] == user_id and not _expired(session):
+            sessions.append(session)
+    return sessions
+
+def _check_user_limits(session):
+    """Raise UploadLimitReached if a new session takes its user over the limits"""
+    sessions = _user_sessions(session["user_id"])
+    # Counted after the session was written, so concurrent starts cannot both slip under the limits
+    if not any(other["id"] == session["id"] for other in sessions):
+        sessions.append(session)
+
+    max_sessions = current_app.config.get('UPLOAD_MAX_SESSIONS', 5)
+    if len(sessions) > max_sessions:
+        raise UploadLimitReached(f"At most {max_sessions} uploads can be in progress, finish or cancel one first")
+    max_bytes = current_app.config.get('UPLOAD_MAX_PENDING_BYTES', 50 * 1024 * 1024)
+    if sum(other["size"] for other in sessions) > max_bytes:
+        raise UploadLimitReached(f"Uploads in progress may not exceed {max_bytes} bytes, finish or cancel one first")
+
+def create_session(user_id, project_id, filename, size, allowed_extensions=None, sha256=None):
+    """Start a resumable upload of a file of a known size.
+
+    The partial file and the session state are kept below
+    UPLOAD_FOLDER/partial/<upload_id>, so every chunk of an upload must
+    reach the same server. A user may have UPLOAD_MAX_SESSIONS unfinished
+    uploads of UPLOAD_MAX_PENDING_BYTES in total. Returns the session.
+    """
+    media_storage.check_extension(filename, allowed_extensions)
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        raise UploadError("Invalid file size")
+    max_size = current_app.config.get('MAX_UPLOAD_SIZE')
+    if max_size is not None and size > max_size:
+        raise UploadTooLarge(f"File is larger than {max_size} bytes")
+    if sha256 is not None and not re.match(r"^[0-9a-f]{64}$", str(sha256)):
+        raise UploadError("Invalid sha256")
+
+    chunk_size = current_app.config.get('UPLOAD_CHUNK_SIZE', 1024 * 1024)
+    session = {
+        "id": uuid.uuid4().hex,
+        "user_id": user_id,
+        "project_id": project_id,
+        "filename": filename,
+        "size": size,
+        "sha256": sha256,
+        "chunk_size": chunk_size,
+        "chunk_count": -(-size // chunk_size),
+        "created_at": time.time()
+    }
+
+    os.makedirs(_chunks_dir(session))
+    with open(os.path.join(_session_dir(session["id"]), "session.json"), "w") as f:
+        json.dump(session, f)
+    try:
+        _check_user_limits(session)
+        # Chunks are written in place, in any order
+        with open(_data_path(session), "wb") as f:
+            f.truncate(size)
+    except BaseException:
+        delete_session(session["id"])
+        raise
+    return session
+
+def load_session(upload_id, user_id, project_id):
+    """Get an upload session of a user and project, raising UploadNotFound otherwise"""
+    if not UPLOAD_ID_PATTERN.match(upload_id or ""):
+        raise UploadNotFound("Upload not found")
+    try:
+        with open(os.path.join(_session_dir(upload_id), "session.json")) as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        raise UploadNotFound("Upload not found")
+
+    if session["user_id"] != user_id or session["project_id"] != project_id:
+        raise UploadNotFound("Upload not found")
+    if _expired(session):
+        delete_session(upload_id)
+        raise UploadNotFound("Upload expired")
+    return session
+
+def chunk_length(session, index):
+    """Get the number of bytes of a chunk; the last one may be short"""
+    if not 0 <= index < session["chunk_count"]:
+        raise UploadError("Invalid chunk index")
+    return min(session["chunk_size"], session["size"] - index * session["chunk_size"])
+
+def write_chunk(session, index, stream, length):
+    """Write one chunk of the file from a stream. Chunks may be sent again, e.g. after a failure."""
+    expected = chunk_length(session, index)
+    if length != expected:
+        raise UploadError(f"Chunk {index} must be {expected} bytes")
+    if os.path.exists(_finalizing_path(session)):
+        raise UploadInProgress("Upload is being finalized")
+
+    remaining = expected
+    try:
+        with open(_data_path(session), "r+b") as f:
+            f.seek(index * session["chunk_size"])
+            while remaining:
+                data = stream.read(min(CHUNK_SIZE, remaining))
+                if not data:
+                    raise UploadError(f"Chunk {index} is incomplete")
+                f.write(data)
+                remaining -= len(data)
+
+        # Only marked as received once it was written completely
+        open(os.path.join(_chunks_dir(session), str(index)), "w").close()
+    except FileNotFoundError:
+        # Finalized or cancelled by another request while the chunk was written
+        if os.path.exists(_finalizing_path(session)):
+            raise UploadInProgress("Upload is being finalized")
+        raise UploadNotFound("Upload not found")
+
+def received_chunks(session):
+    """Get the sorted indexes of the chunks received so far"""
+    try:
+        return sorted(int(name) for name in os.listdir(_chunks_dir(session)))
+    except FileNotFoundError:
+        raise UploadNotFound("Upload not found")
+
+def _claim(session):
+    """Mark a session as being finalized, raising UploadInProgress if another request did so first"""
+    try:
+        # Created atomically: exactly one request gets the file
+        os.close(os.open(_finalizing_path(session), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        raise UploadInProgress("Upload is already being finalized")
+    except FileNotFoundError:
+        # Finalized and deleted by another request
+        raise UploadNotFound("Upload not found")
+
+def finalize(session, allowed_extensions=None):
+    """Move a complete upload into content-addressed storage and delete the session.
+
+    The session is claimed first, so concurrent calls store it once and the
+    others raise UploadInProgress. Returns the StoredFile, whose reference
+    the caller owns.
+    """
+    _claim(session)
+    try:
+        missing = session["chunk_count"] - len(received_chunks(session))
+        if missing:
+            raise UploadIncomplete(f"{missing} chunks are missing")
+
+        with open(_data_path(session), "rb") as f:
+            stored = media_storage.store_stream(f, session["filename"], allowed_extensions=allowed_extensions)
+    except BaseException:
+        # Can be finalized again, e.g. once the missing chunks arrived
+        try:
+            os.remove(_finalizing_path(session))
+        except OSError:
+            pass
+        raise
+
+    if session["sha256"] and stored.digest != session["sha256"]:
+        media_storage.release(stored.url)
+        delete_session(session["id"])
+        raise UploadError("The uploaded file does not match its sha256")
+
+    delete_session(session["id"])
+    return stored
+
+def cancel(session):
+    """Abandon an upload that is not being finalized, deleting what was received"""
+    if os.path.exists(_finalizing_path(session)):
+        raise UploadInProgress("Upload is being finalized")
+    delete_session(session["id"])
+
+def delete_session(upload_id):
+    """Delete an upload session and its partial file"""
+    shutil.rmtree(_session_dir(upload_id), ignore_errors=True)
+
+def remove_expired(max_age=None):
+    """Delete upload sessions older than max_age seconds (UPLOAD_SESSION_TTL by default).
+
+    Returns the number of sessions deleted.
+    """
+    if max_age is None:
+        max_age = current_app.config.get('UPLOAD_SESSION_TTL', 86400)
+    try:
+        upload_ids = os.listdir(_sessions_dir())
+    except FileNotFoundError:
+        return 0
+
+    removed = 0
+    now = time.time()
+    for upload_id in upload_ids:
+        try:
+            modified = os.stat(os.path.join(_session_dir(upload_id), "session.json")).st_mtime
+        except OSError:
+            # A session that never got its state written
+            modified = os.stat(_session_dir(upload_id)).st_mtime
+        if now - modified > max_age:
+            delete_session(upload_id)
+            removed += 1
+    return removed
@@ -0,0 +1,261 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app, has_app_context
+from PIL import Image, ImageOps, features
+from app.api.models.media_file import MediaFile
+from app.api.models.project import Project
+from app.api.models.user import User
+from app.api.services.media_storage import digest_from_url, upload_path
+
+try:
+    from PIL import ImageCms
+except ImportError:  # pragma: no cover - Pillow built without littlecms
+    ImageCms = None
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels of each generated variant
+VARIANT_SIZES = {"thumb": 320, "medium": 800, "full": 1600}
+
+# Refuse images that would decompress to more pixels than this
+MAX_PIXELS = 40_000_000
+
+def variant_format(preferred="webp"):
+    """Get the (Pillow format, extension) to write variants in, JPEG if WebP is unavailable"""
+    if preferred == "webp" and features.check("webp"):
+        return "WEBP", "webp"
+    return "JPEG", "jpg"
+
+def _to_srgb(image, icc_profile):
+    """Convert an image from its embedded ICC profile to sRGB, the color space browsers assume without one"""
+    if ImageCms is None:
+        return image
+    if image.mode == "P":
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    try:
+        return ImageCms.profileToProfile(image, ImageCms.ImageCmsProfile(io.BytesIO(icc_profile)),
+                                         ImageCms.createProfile("sRGB"),
+                                         outputMode="RGBA" if image.mode == "RGBA" else "RGB")
+    except (ImageCms.PyCMSError, OSError, ValueError) as e:
+        # Unsupported or broken profile: keep the pixel values as they are
+        logger.warning("Could not convert image colors to sRGB: %s", e)
+        return image
+
+def render_variants(source_path, target_stem, image_format="webp", quality=80):
+    """Write the resized variants of an image next to target_stem.
+
+    The image is rotated according to its EXIF orientation and converted to
+    sRGB from its embedded ICC profile, then every variant is written without
+    EXIF, ICC or other metadata. Only the first frame of animated images is
+    kept. Returns a dictionary of variant name -> file path.
+    """
+    pil_format, extension = variant_format(image_format)
+    paths = {}
+    with Image.open(source_path) as image:
+        # Only the header was read so far
+        if image.width * image.height > MAX_PIXELS:
+            raise ValueError(f"Image is too large ({image.width}x{image.height})")
+        image.seek(0)
+        icc_profile = image.info.get("icc_profile")
+        image = ImageOps.exif_transpose(image)
+        if icc_profile:
+            image = _to_srgb(image, icc_profile)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        if pil_format == "WEBP" and has_alpha:
+            image = image.convert("RGBA")
+        elif has_alpha:
+            # JPEG has no alpha channel, flatten onto white
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image.convert("RGBA"), mask=image.convert("RGBA").split()[-1])
+            image = background
+        else:
+            image = image.convert("RGB")
+
+        for name, size in VARIANT_SIZES.items():
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.LANCZOS)
+            path = f"{target_stem}_{name}.{extension}"
+            variant.save(path, pil_format, quality=quality)
+            paths[name] = path
+    return paths
+
+class ImageProcessor:
+    """Runs image processing jobs on a small thread pool, off the request thread.
+
+    Pillow releases the GIL while decoding and resizing, so the pool size caps
+    how many cores image work takes. Jobs run in an app context.
+    """
+
+    def __init__(self, pool_size=2):
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._pending = set()
+
+    def _get_executor(self):
+        """Get the pool, recreating it in a forked worker whose threads did not survive"""
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="images")
+                self._pending = set()
+                self._pid = os.getpid()
+            return self._executor
+
+    @staticmethod
+    def _run(app, func, args):
+        with app.app_context():
+            try:
+                func(*args)
+            except Exception:
+                logger.exception("Image processing job %s failed", func.__name__)
+
+    def submit(self, func, *args):
+        """Run func(*args) in the background within the current app's context"""
+        app = current_app._get_current_object()
+        future = self._get_executor().submit(self._run, app, func, args)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def wait(self, timeout=None):
+        """Wait for the jobs submitted so far to finish"""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+    def shutdown(self):
+        """Finish queued jobs and stop the pool"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+_default_processor = None
+_default_lock = threading.Lock()
+
+def get_image_processor():
+    """Get the app's image processor, or a process-wide one outside an app"""
+    global _default_processor
+    if has_app_context() and "image_processor" in current_app.extensions:
+        return current_app.extensions["image_processor"]
+
+    with _default_lock:
+        if _default_processor is None:
+            _default_processor = ImageProcessor(pool_size=int(os.environ.get('IMAGE_WORKERS', 2)))
+        return _default_processor
+
+def init_app(app):
+    """Create the app's image processing pool from IMAGE_WORKERS"""
+    app.extensions["image_processor"] = ImageProcessor(pool_size=app.config.get('IMAGE_WORKERS', 2))
+
+def _process(url):
+    """Render the variants of an uploaded image, returning (variant URLs, file paths)"""
+    source_path = upload_path(url)
+    paths = render_variants(
+        source_path,
+        os.path.splitext(source_path)[0],
+        image_format=current_app.config.get('IMAGE_VARIANT_FORMAT', 'webp'),
+        quality=current_app.config.get('IMAGE_QUALITY', 80)
+    )
+    # Variants are written next to the original
+    directory = url.rsplit('/', 1)[0]
+    urls = {name: f"{directory}/{os.path.basename(path)}" for name, path in paths.items()}
+    return urls, paths
+
+def _remove(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _shared_variants(digest, url):
+    """Get the variants of content-addressed content, rendering them once for all its uploads"""
+    media = MediaFile.get(digest)
+    if media and media.get("variants"):
+        return media["variants"]
+
+    try:
+        variants, _ = _process(url)
+    except FileNotFoundError:
+        # Another job rendered the same content and removed the original
+        media = MediaFile.get(digest)
+        if media and media.get("variants"):
+            return media["variants"]
+        raise
+
+    MediaFile.set_variants(digest, variants)
+    # The original still carries its metadata, only the variants are kept
+    _remove([upload_path(url)])
+    return variants
+
+def process_profile_picture(user_id, url):
+    """Generate a profile picture's variants and switch the user over to them"""
+    digest = digest_from_url(url)
+    if digest:
+        # The variants are shared and released with the content
+        User.set_profile_picture_variants(user_id, url, _shared_variants(digest, url))
+        return
+
+    variants, paths = _process(url)
+    if User.set_profile_picture_variants(user_id, url, variants):
+        # The original still carries its metadata, only the variants are kept
+        _remove([upload_path(url)])
+    else:
+        # A newer picture was uploaded in the meantime
+        _remove(paths.values())
+
+def process_project_image(project_id, url):
+    """Generate a project image's variants and record them on the project"""
+    digest = digest_from_url(url)
+    if digest:
+        Project.set_image_variants(project_id, url, _shared_variants(digest, url))
+        return
+
+    variants, paths = _process(url)
+    if Project.set_image_variants(project_id, url, variants):
+        _remove([upload_path(url)])
+    else:
+        # The image was removed in the meantime
+        _remove(paths.values())
+
+def schedule_profile_picture(user_id, url):
+    """Process an uploaded profile picture in the background"""
+    return get_image_processor().submit(process_profile_picture, user_id, url)
+
+def schedule_project_image(project_id, url):
+    """Process an uploaded project image in the background"""
+    return get_image_processor().submit(process_project_image, project_id, url)
+
+def process_pending():
+    """Generate variants for uploads whose background job never completed.
+
+    Runs synchronously. Returns the number of images processed.
+    """
+    processed = 0
+    users = User.get_collection().find(
+        {"profile_picture": {"$regex": "^/(profiles|media)/"}, "profile_picture_variants": {"$in": [None, {}]}},
+        {"profile_picture": 1}
+    )
+    for data in users:
+        if os.path.exists(upload_path(data["profile_picture"])):
+            process_profile_picture(str(data["_id"]), data["profile_picture"])
+            processed += 1
+
+    projects = Project.get_collection().find({"images.0": {"$exists": True}}, {"images": 1, "image_variants": 1})
+    for data in projects:
+        processed_urls = {variants.get("full") for variants in data.get("image_variants") or []}
+        for url in data["images"]:
+            if url not in processed_urls and url.startswith(("/projects/", "/media/")) and os.path.exists(upload_path(url)):
+                process_project_image(str(data["_id"]), url)
+                processed += 1
+    return processed
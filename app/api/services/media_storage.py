@@ -0,0 +1,179 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from collections import namedtuple
+from flask import abort, current_app
+from app.api.services.static_files import StaticFiles
+from werkzeug.utils import secure_filename
+from app.api.models.media_file import MediaFile
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the upload at a time
+CHUNK_SIZE = 64 * 1024
+
+# Uploads are stored as /media/<first two hex digits>/<sha256>.<ext>, variants as <sha256>_<name>.<ext>
+MEDIA_URL_PATTERN = re.compile(r"^/media/[0-9a-f]{2}/([0-9a-f]{64})(?:_[a-z]+)?\.[a-z0-9]+$")
+
+StoredFile = namedtuple("StoredFile", ["url", "digest", "size", "variants"])
+
+class UploadError(Exception):
+    """Raised when an upload is rejected"""
+
+class UploadTooLarge(UploadError):
+    """Raised when an upload is larger than MAX_UPLOAD_SIZE"""
+
+def digest_from_url(url):
+    """Get the content hash of a stored upload or one of its variants, or None for other URLs"""
+    match = MEDIA_URL_PATTERN.match(url or "")
+    return match.group(1) if match else None
+
+def upload_path(url):
+    """Map an upload URL such as /media/<dir>/<file> to its path below UPLOAD_FOLDER"""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], url.lstrip('/'))
+
+def _write_chunks(stream, target, max_size):
+    """Copy a stream to an open file in chunks, returning (sha256 hex digest, size)"""
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise UploadTooLarge(f"File is larger than {max_size} bytes")
+        digest.update(chunk)
+        target.write(chunk)
+    return digest.hexdigest(), size
+
+def check_extension(filename, allowed_extensions=None):
+    """Get the lowercase extension of an upload's filename, raising UploadError if it is not allowed"""
+    filename = secure_filename(filename or "")
+    extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    if allowed_extensions and extension not in allowed_extensions:
+        raise UploadError(f"Invalid file type. Allowed types: {', '.join(sorted(allowed_extensions))}")
+    return extension
+
+def store_upload(file, allowed_extensions=None, max_size=None):
+    """Stream an uploaded file into content-addressed storage and take a reference to it.
+
+    Every call takes a reference that must be given back with release().
+    Returns a StoredFile; variants is set when the content was processed
+    before.
+    """
+    if not file or not file.filename:
+        raise UploadError("No file selected")
+    return store_stream(file.stream, file.filename, file.mimetype, allowed_extensions, max_size)
+
+def store_stream(stream, filename, content_type=None, allowed_extensions=None, max_size=None):
+    """Store the content of a binary stream like store_upload.
+
+    The content is hashed while it is copied to a temporary file, so it is
+    read once. Content that is already stored is not written again.
+    """
+    extension = check_extension(filename, allowed_extensions)
+    if max_size is None:
+        max_size = current_app.config.get('MAX_UPLOAD_SIZE')
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    tmp_dir = os.path.join(upload_folder, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    # Written next to the storage so the final rename stays on one filesystem
+    with tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False) as tmp:
+        try:
+            digest, size = _write_chunks(stream, tmp, max_size)
+        except BaseException:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+
+    try:
+        url = f"/media/{digest[:2]}/{digest}" + (f".{extension}" if extension else "")
+        media = MediaFile.acquire(digest, url, size, content_type)
+        # The first upload of the content decides its URL
+        url = media["url"]
+        path = upload_path(url)
+        # The only reference writes the file even if one is there: it may be
+        # left over from a deletion that had not finished
+        if not media.get("variants") and (media["refs"] == 1 or not os.path.exists(path)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp.name, path)
+    finally:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+
+    return StoredFile(url, digest, size, media.get("variants"))
+
+def release(url):
+    """Give back a reference taken by store_upload, deleting the files once unreferenced.
+
+    URLs from before content-addressed storage are not reference counted
+    and are left alone. Returns True if the files were deleted.
+    """
+    digest = digest_from_url(url)
+    if digest is None or MediaFile.release(digest) != 0:
+        return False
+
+    # Conditional, so content uploaded again in the meantime is kept. The
+    # record goes only after the files, and uploads of the same content
+    # wait for it, so they never point at a file deleted here.
+    media = MediaFile.claim_unreferenced(digest)
+    if media is None:
+        return False
+
+    try:
+        for file_url in [media["url"], *(media.get("variants") or {}).values()]:
+            try:
+                os.remove(upload_path(file_url))
+            except OSError:
+                pass
+    finally:
+        MediaFile.delete_claimed(media)
+    return True
+
+def release_all(urls):
+    """Give back the references of several stored files"""
+    for url in urls:
+        try:
+            release(url)
+        except Exception:
+            logger.exception("Could not release %s", url)
+
+def init_app(app):
+    """Serve UPLOAD_FOLDER under /media, and the profiles/ and projects/ uploads at their old URLs.
+
+    Content-addressed files never change, so they are cached for a year with
+    their hash as a strong ETag. Must run after static_files.init_app.
+    """
+    accel_prefix = app.config.get("STATIC_ACCEL_PREFIX")
+    uploads = StaticFiles(
+        app.config['UPLOAD_FOLDER'],
+        metadata_ttl=app.config.get("STATIC_METADATA_TTL", 60),
+        accel_prefix=accel_prefix and accel_prefix.rstrip("/") + "/uploads",
+        use_x_sendfile=app.config.get("USE_X_SENDFILE", False),
+        # Uploads appear at runtime
+        cache_missing=False
+    )
+    app.extensions["static_files"]["uploads"] = uploads
+    next_files = app.extensions["static_files"]["next"]
+
+    @app.route('/media/<path:path>')
+    def serve_media(path):
+        # Not other directories of UPLOAD_FOLDER, e.g. tmp/
+        if ".." in path.split("/"):
+            abort(404)
+        if digest_from_url(f"/media/{path}"):
+            return uploads.send(f"media/{path}", immutable=True, etag=os.path.splitext(os.path.basename(path))[0])
+        return uploads.send(f"media/{path}")
+
+    # Uploads stored before content addressing; anything else is left to the Next.js build
+    @app.route('/profiles/<path:filename>', defaults={'directory': 'profiles'})
+    @app.route('/projects/<path:filename>', defaults={'directory': 'projects'})
+    def serve_legacy_upload(directory, filename):
+        if uploads.metadata(f"{directory}/{filename}") is None:
+            return next_files.send(f"{directory}/{filename}")
+        return uploads.send(f"{directory}/{filename}")
@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUNDS = 12
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full and the request should be retried later"""
+
+def get_rounds(password_hash):
+    """Get the bcrypt cost factor of a hash, or None if it is not a bcrypt hash"""
+    try:
+        return int(password_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool.
+
+    bcrypt releases the GIL while hashing, so the pool caps how many CPU
+    cores password work can take. At most pool_size jobs run and max_queue
+    wait; beyond that PasswordHasherBusy is raised immediately instead of
+    tying up more request threads. Every admitted caller blocks its request
+    thread, so with server_threads given, pool_size + max_queue must stay
+    below it and leave threads for other requests.
+    """
+
+    def __init__(self, rounds=DEFAULT_ROUNDS, pool_size=2, max_queue=1, server_threads=None):
+        if pool_size < 1 or max_queue < 0:
+            raise ValueError("BCRYPT_POOL_SIZE must be at least 1 and BCRYPT_MAX_QUEUE at least 0")
+        if server_threads is not None and pool_size + max_queue >= server_threads:
+            raise ValueError(
+                f"BCRYPT_POOL_SIZE + BCRYPT_MAX_QUEUE ({pool_size + max_queue}) must be lower than "
+                f"SERVER_THREADS ({server_threads}), or password hashing can take every request thread"
+            )
+        self.rounds = rounds
+        self.pool_size = pool_size
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        """Get the pool, recreating it in a forked worker whose threads did not survive"""
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="bcrypt")
+                self._slots = threading.BoundedSemaphore(self.pool_size + self.max_queue)
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+    def _run(self, func, *args):
+        """Run func on the pool and wait for the result, or fail fast when saturated"""
+        executor, slots = self._get_executor()
+        if not slots.acquire(blocking=False):
+            raise PasswordHasherBusy("Too many password operations in progress")
+
+        try:
+            future = executor.submit(func, *args)
+        except Exception:
+            slots.release()
+            raise
+
+        future.add_done_callback(lambda _: slots.release())
+        return future.result()
+
+    def hash(self, password):
+        """Hash a password with the configured cost"""
+        return self._run(_hash, password, self.rounds)
+
+    def check(self, password, password_hash):
+        """Check a password against a stored hash"""
+        if not password_hash:
+            return False
+        return self._run(_check, password, password_hash)
+
+    def needs_rehash(self, password_hash):
+        """Check whether a hash was made with a different cost than the configured one"""
+        return get_rounds(password_hash) != self.rounds
+
+    def shutdown(self):
+        """Stop the pool, waiting for running jobs"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+def _check(password, password_hash):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        # Not a valid bcrypt hash
+        return False
+
+def _from_settings(get_setting):
+    server_threads = int(get_setting('SERVER_THREADS', 4) or 4)
+    pool_size = int(get_setting('BCRYPT_POOL_SIZE', 2))
+    max_queue = get_setting('BCRYPT_MAX_QUEUE')
+    # Always one request thread left for other requests
+    limit = max(server_threads - 1, 1)
+    if pool_size > limit:
+        logger.warning("BCRYPT_POOL_SIZE (%s) is lowered to %s to leave request threads free with SERVER_THREADS=%s",
+                       pool_size, limit, server_threads)
+        pool_size = limit
+    if max_queue in (None, ''):
+        # At most one waiting caller
+        max_queue = min(1, limit - pool_size)
+    elif int(max_queue) > limit - pool_size:
+        logger.warning("BCRYPT_MAX_QUEUE (%s) is lowered to %s to leave request threads free with SERVER_THREADS=%s",
+                       max_queue, limit - pool_size, server_threads)
+        max_queue = limit - pool_size
+    if pool_size + int(max_queue) >= server_threads:
+        logger.warning("SERVER_THREADS=%s leaves no request thread free while a password is hashed", server_threads)
+        server_threads = None
+    return PasswordHasher(
+        rounds=int(get_setting('BCRYPT_ROUNDS', DEFAULT_ROUNDS)),
+        pool_size=pool_size,
+        max_queue=int(max_queue),
+        server_threads=server_threads
+    )
+
+_default_hasher = None
+_default_lock = threading.Lock()
+
+def get_password_hasher():
+    """Get the app's password hasher, or one configured from the environment outside an app"""
+    global _default_hasher
+    if has_app_context() and "password_hasher" in current_app.extensions:
+        return current_app.extensions["password_hasher"]
+
+    with _default_lock:
+        if _default_hasher is None:
+            _default_hasher = _from_settings(os.environ.get)
+        return _default_hasher
+
+def init_app(app):
+    """Create the app's password hasher from BCRYPT_* config, lowered with a warning if it could starve SERVER_THREADS"""
+    app.extensions["password_hasher"] = _from_settings(app.config.get)
@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+import time
+from flask import current_app, has_app_context
+from app.api.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+class MemoryPresenceStore:
+    """In-process presence store, used when no shared backend is configured"""
+
+    def __init__(self, maxsize=100000, clock=time.monotonic):
+        self._cache = LRUCache(maxsize=maxsize, clock=clock)
+
+    def get_many(self, keys):
+        return [self._cache.get(key) for key in keys]
+
+    def set(self, key, value, ttl):
+        self._cache.set(key, value, ttl)
+
+    def add(self, key, value, ttl):
+        """Set a key, returning True if it was not set before"""
+        previous = self._cache.get(key)
+        self._cache.set(key, value, ttl)
+        return previous is None
+
+    def delete(self, key):
+        """Delete a key, returning True if it was set"""
+        previous = self._cache.get(key)
+        self._cache.delete(key)
+        return previous is not None
+
+class RedisPresenceStore:
+    """Presence shared by every worker process in Redis"""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PRESENCE_BACKEND_URL is set but the redis package is not installed")
+        self._redis = redis.Redis.from_url(url)
+
+    def get_many(self, keys):
+        return self._redis.mget(keys)
+
+    def set(self, key, value, ttl):
+        self._redis.set(key, value, ex=max(int(ttl), 1))
+
+    def add(self, key, value, ttl):
+        return self._redis.set(key, value, ex=max(int(ttl), 1), get=True) is None
+
+    def delete(self, key):
+        return self._redis.delete(key) > 0
+
+class Presence:
+    """Who is online and who is typing, kept only in a TTL-expiring store.
+
+    A user is online while their heartbeats keep arriving within ttl
+    seconds; nothing is written to MongoDB. Typing notices expire after
+    typing_ttl seconds unless they are repeated. Lookups are one batched
+    read of one key per user.
+    """
+
+    def __init__(self, store, ttl=60, typing_ttl=6, disconnect_grace=5):
+        self.store = store
+        self.ttl = ttl
+        self.typing_ttl = typing_ttl
+        self.disconnect_grace = disconnect_grace
+
+    @staticmethod
+    def _key(user_id):
+        return f"presence:{user_id}"
+
+    @staticmethod
+    def _typing_key(conversation_id, user_id):
+        return f"typing:{conversation_id}:{user_id}"
+
+    def _call(self, action, default, *args):
+        try:
+            return getattr(self.store, action)(*args)
+        except Exception as e:
+            # Presence is best effort, never fail the request or the socket event
+            logger.warning("Presence store %s failed: %s", action, e)
+            return default
+
+    def heartbeat(self, user_id):
+        """Mark a user online for the next ttl seconds"""
+        self._call("set", None, self._key(user_id), time.time(), self.ttl)
+
+    def disconnect(self, user_id):
+        """Let a user go offline shortly, unless another connection sends a heartbeat"""
+        self._call("set", None, self._key(user_id), time.time(), self.disconnect_grace)
+
+    def online_many(self, user_ids):
+        """Get the set of the given user IDs that are online"""
+        user_ids = [str(user_id) for user_id in user_ids if user_id]
+        if not user_ids:
+            return set()
+        values = self._call("get_many", [None] * len(user_ids), [self._key(user_id) for user_id in user_ids])
+        return {user_id for user_id, value in zip(user_ids, values) if value is not None}
+
+    def is_online(self, user_id):
+        return str(user_id) in self.online_many([user_id])
+
+    def start_typing(self, user_id, conversation_id):
+        """Record that a user is typing; returns True if they were not typing already"""
+        return self._call("add", False, self._typing_key(conversation_id, user_id), time.time(), self.typing_ttl)
+
+    def stop_typing(self, user_id, conversation_id):
+        """Record that a user stopped typing; returns True if they were typing"""
+        return self._call("delete", False, self._typing_key(conversation_id, user_id))
+
+def _create_presence(get_setting):
+    url = get_setting('PRESENCE_BACKEND_URL')
+    serves_sockets = str(get_setting('SOCKETIO_SERVE', True)).lower() in ('1', 'true', 'yes')
+    workers = int(get_setting('WEB_CONCURRENCY', 1) or 1)
+    if not url and (not serves_sockets or workers > 1):
+        # Heartbeats reach the process holding the socket, reads happen in the API processes
+        logger.warning("PRESENCE_BACKEND_URL is not set, so presence is kept per process and users whose "
+                       "socket is served by another process (realtime.py, or another worker) show as offline")
+    return Presence(
+        RedisPresenceStore(url) if url else MemoryPresenceStore(),
+        ttl=float(get_setting('PRESENCE_TTL', 60) or 60),
+        typing_ttl=float(get_setting('TYPING_TTL', 6) or 6)
+    )
+
+_default_presence = None
+_default_lock = threading.Lock()
+
+def get_presence():
+    """Get the app's presence service, or one configured from the environment outside an app"""
+    global _default_presence
+    if has_app_context():
+        presence = current_app.extensions.get("presence")
+        if presence is None:
+            presence = current_app.extensions["presence"] = _create_presence(current_app.config.get)
+        return presence
+
+    with _default_lock:
+        if _default_presence is None:
+            _default_presence = _create_presence(os.environ.get)
+        return _default_presence
+
+def init_app(app):
+    """Create the app's presence service from PRESENCE_* config"""
+    app.extensions["presence"] = _create_presence(app.config.get)
+
+def heartbeat(user_id):
+    """Mark a user online"""
+    get_presence().heartbeat(user_id)
+
+def online_many(user_ids):
+    """Get the set of the given user IDs that are online"""
+    return get_presence().online_many(user_ids)
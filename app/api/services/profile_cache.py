@@ -0,0 +1,256 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from flask import current_app, has_app_context
+from app.api.models.user import User
+from app.api.utils.cache import LRUCache, get_cache
+
+logger = logging.getLogger(__name__)
+
+def _version_key(key):
+    return f"{key}:version"
+
+class MemoryProfileStore:
+    """In-process stand-in for a shared L2 store, used when no Redis URL is configured"""
+
+    def __init__(self, maxsize=50000):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        return [self._cache.get(key) for key in keys]
+
+    def versions(self, keys):
+        return self.get_many([_version_key(key) for key in keys])
+
+    def set_many(self, mapping, versions, ttl):
+        """Set keys whose version is still the one read before loading them"""
+        with self._lock:
+            for key, value in mapping.items():
+                if self._cache.get(_version_key(key)) == versions.get(key):
+                    self._cache.set(key, value, ttl)
+
+    def bump(self, keys, ttl):
+        """Delete keys and bump their versions, so loads started earlier are not stored"""
+        with self._lock:
+            for key in keys:
+                self._cache.set(_version_key(key), (self._cache.get(_version_key(key)) or 0) + 1, ttl)
+                self._cache.delete(key)
+
+# KEYS: key, version key; ARGV: value, expected version ("" for none), ttl
+_SET_IF_VERSION = """
+if (redis.call('get', KEYS[2]) or '') == ARGV[2] then
+    redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[3])
+end
+"""
+
+class RedisProfileStore:
+    """Shared L2 store in Redis, so every worker process benefits from a load"""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("PROFILE_CACHE_L2_URL is set but the redis package is not installed")
+        self._redis = redis.Redis.from_url(url)
+        self._set_if_version = self._redis.register_script(_SET_IF_VERSION)
+
+    def get_many(self, keys):
+        return self._redis.mget(keys)
+
+    def versions(self, keys):
+        return [version.decode('utf-8') if version is not None else None
+                for version in self._redis.mget([_version_key(key) for key in keys])]
+
+    def set_many(self, mapping, versions, ttl):
+        pipeline = self._redis.pipeline(transaction=False)
+        for key, value in mapping.items():
+            self._set_if_version(keys=[key, _version_key(key)], args=[value, versions.get(key) or "", int(ttl)],
+                                 client=pipeline)
+        pipeline.execute()
+
+    def bump(self, keys, ttl):
+        pipeline = self._redis.pipeline(transaction=False)
+        for key in keys:
+            pipeline.incr(_version_key(key))
+            pipeline.expire(_version_key(key), int(ttl))
+            pipeline.delete(key)
+        pipeline.execute()
+
+def _encode(data):
+    """Serialize a profile document, keeping updated_at (a response validator) as ISO 8601"""
+    data = dict(data, _id=str(data["_id"]))
+    if isinstance(data.get("updated_at"), datetime):
+        data["updated_at"] = data["updated_at"].isoformat()
+    return json.dumps(data)
+
+def _decode(value):
+    """Deserialize a cached profile into a partial User"""
+    data = json.loads(value)
+    if data.get("updated_at"):
+        data["updated_at"] = datetime.fromisoformat(data["updated_at"])
+    return User.from_dict(data)
+
+class ProfileCache:
+    """Two-tier cache of public profile summaries.
+
+    L1 is an in-process LRU with a short TTL; L2 is shared between worker
+    processes (Redis, or an in-memory stand-in). Both hold JSON-serialized
+    summaries, so every lookup returns fresh objects. Invalidating a
+    profile bumps its L2 version, and a load only reaches L2 if the version
+    it read beforehand is still current, so a slow load in another process
+    cannot put back the profile as it was before an update.
+    """
+
+    def __init__(self, l1, l2=None, l2_ttl=300):
+        self.l1 = l1
+        self.l2 = l2
+        self.l2_ttl = l2_ttl
+
+    @staticmethod
+    def _key(user_id):
+        return f"profile:{user_id}"
+
+    def _l2_get_many(self, keys):
+        if not self.l2 or not keys:
+            return [None] * len(keys)
+        try:
+            return self.l2.get_many(keys)
+        except Exception as e:
+            # The shared store is an optimization, fall back to the database
+            logger.warning("Profile cache L2 read failed: %s", e)
+            return [None] * len(keys)
+
+    def _l2_versions(self, keys):
+        """Get the L2 versions of keys, or None when they cannot be read"""
+        if not self.l2 or not keys:
+            return None
+        try:
+            return dict(zip(keys, self.l2.versions(keys)))
+        except Exception as e:
+            logger.warning("Profile cache L2 read failed: %s", e)
+            return None
+
+    def _l2_set_many(self, mapping, versions):
+        if not self.l2 or not mapping or versions is None:
+            return
+        try:
+            self.l2.set_many(mapping, versions, self.l2_ttl)
+        except Exception as e:
+            logger.warning("Profile cache L2 write failed: %s", e)
+
+    def _l2_bump(self, keys):
+        if not self.l2:
+            return
+        try:
+            # Versions outlive the entries they guard
+            self.l2.bump(keys, self.l2_ttl * 2)
+        except Exception as e:
+            logger.warning("Profile cache L2 invalidation failed: %s", e)
+
+    def _get_raw(self, keys):
+        """Look keys up in L1 then L2, promoting L2 hits into L1"""
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.l1.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+
+        for key, value in zip(missing, self._l2_get_many(missing)):
+            if value is not None:
+                if isinstance(value, bytes):
+                    value = value.decode('utf-8')
+                self.l1.set(key, value)
+                found[key] = value
+        return found
+
+    def _store(self, documents, generation, versions):
+        """Cache serialized profiles loaded from the database.
+
+        generation and versions are read before loading; entries
+        invalidated since then are skipped.
+        """
+        mapping = {}
+        for data in documents:
+            mapping[self._key(data["_id"])] = _encode(data)
+
+        for key, value in mapping.items():
+            self.l1.set(key, value, generation=generation)
+        self._l2_set_many(mapping, versions)
+        return mapping
+
+    def get_many(self, user_ids):
+        """Get public profiles as a dictionary of user ID -> partial User"""
+        object_ids = User.to_object_ids(user_ids)
+        keys = [self._key(object_id) for object_id in object_ids]
+        found = self._get_raw(keys)
+
+        missing_ids = [object_id for object_id, key in zip(object_ids, keys) if key not in found]
+        if missing_ids:
+            generation = self.l1.generation
+            versions = self._l2_versions([self._key(object_id) for object_id in missing_ids])
+            documents = User.get_collection().find({"_id": {"$in": missing_ids}}, User.PUBLIC_PROFILE_FIELDS)
+            found.update(self._store(list(documents), generation, versions))
+
+        profiles = {}
+        for value in found.values():
+            user = _decode(value)
+            profiles[user._id] = user
+        return profiles
+
+    def get(self, user_id):
+        """Get a public profile by user ID, or None"""
+        return self.get_many([user_id]).get(str(user_id))
+
+    def invalidate(self, user_id):
+        """Drop a profile from both tiers after it was updated"""
+        key = self._key(user_id)
+        self.l1.delete(key)
+        self._l2_bump([key])
+
+def _create_profile_cache(get_setting):
+    l2_url = get_setting('PROFILE_CACHE_L2_URL')
+    workers = int(get_setting('WEB_CONCURRENCY', 1) or 1)
+    if not l2_url and workers > 1:
+        logger.warning("PROFILE_CACHE_L2_URL is not set, so each of the %d worker processes keeps its own "
+                       "profile cache and updates are only invalidated in the worker that made them", workers)
+    l2 = RedisProfileStore(l2_url) if l2_url else MemoryProfileStore()
+    return ProfileCache(
+        l1=get_cache("profile"),
+        l2=l2,
+        l2_ttl=float(get_setting('PROFILE_CACHE_L2_TTL', 300) or 300)
+    )
+
+_default_profile_cache = None
+_default_lock = threading.Lock()
+
+def get_profile_cache():
+    """Get the app's profile cache, or one configured from the environment outside an app"""
+    global _default_profile_cache
+    if has_app_context():
+        profile_cache = current_app.extensions.get("profile_cache")
+        if profile_cache is None:
+            profile_cache = current_app.extensions["profile_cache"] = _create_profile_cache(current_app.config.get)
+        return profile_cache
+
+    with _default_lock:
+        if _default_profile_cache is None:
+            _default_profile_cache = _create_profile_cache(os.environ.get)
+        return _default_profile_cache
+
+def get_profile(user_id):
+    """Get a public profile by user ID"""
+    return get_profile_cache().get(user_id)
+
+def get_profiles(user_ids):
+    """Get public profiles as a dictionary of user ID -> partial User"""
+    return get_profile_cache().get_many(user_ids)
+
+def invalidate(user_id):
+    """Drop a user's profile from the cache"""
+    get_profile_cache().invalidate(user_id)
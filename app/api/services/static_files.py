@@ -0,0 +1,199 @@
+import gzip
+import mimetypes
+import os
+from flask import abort, current_app, request
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+from app.api.utils.cache import LRUCache
+from app.api.utils.compression import brotli
+
+# Precompressed siblings, in order of preference, and the extension they are stored with
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+# Build output worth precompressing; images and fonts are already compressed
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".html", ".json", ".map", ".svg", ".txt", ".xml", ".ico", ".webmanifest"}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+_MISSING = object()
+
+class StaticFiles:
+    """Serves a directory of build output.
+
+    Precompressed .br/.gz siblings are served to clients that accept them,
+    file metadata is cached so a hit does not stat the disk, and the body can
+    be handed to a front proxy with X-Accel-Redirect (accel_prefix) or
+    X-Sendfile (use_x_sendfile) instead of being read by Python. Set
+    cache_missing to False for directories where files appear at runtime.
+    """
+
+    def __init__(self, root, metadata_ttl=60, accel_prefix=None, use_x_sendfile=False, cache_missing=True):
+        self.root = os.path.abspath(root)
+        self.accel_prefix = accel_prefix.rstrip("/") + "/" if accel_prefix else None
+        self.use_x_sendfile = use_x_sendfile
+        self.cache_missing = cache_missing
+        self._metadata = LRUCache(maxsize=4096, ttl=metadata_ttl)
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        return {"path": path, "size": stat.st_size, "mtime": stat.st_mtime,
+                "etag": f"{stat.st_mtime_ns:x}-{stat.st_size:x}"}
+
+    def _load_metadata(self, path):
+        full_path = safe_join(self.root, path)
+        original = self._stat(full_path) if full_path else None
+        if original is None:
+            return _MISSING
+
+        variants = {}
+        for encoding, extension in ENCODINGS:
+            variant = self._stat(full_path + extension)
+            # Ignore siblings left over from an older build
+            if variant and variant["mtime"] >= original["mtime"]:
+                variant["etag"] = f"{variant['etag']}-{encoding}"
+                variants[encoding] = variant
+
+        mimetype = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        return {"original": original, "variants": variants, "mimetype": mimetype}
+
+    def metadata(self, path):
+        """Get the cached metadata of a file and its precompressed siblings, or None"""
+        metadata = self._metadata.get_or_load(path, lambda: self._load_metadata(path))
+        if metadata is _MISSING:
+            if not self.cache_missing:
+                self._metadata.delete(path)
+            return None
+        return metadata
+
+    def _choose(self, metadata):
+        """Pick the variant to send for the request's Accept-Encoding"""
+        best, best_quality = None, 0
+        for encoding, _ in ENCODINGS:
+            variant = metadata["variants"].get(encoding)
+            quality = request.accept_encodings[encoding] if variant else 0
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        if best is None:
+            return metadata["original"], None
+        return metadata["variants"][best], best
+
+    def send(self, path, immutable=False, etag=None):
+        """Build the response for a file below the root, or abort with 404.
+
+        etag replaces the ETag derived from the file's mtime and size, e.g.
+        with a content hash.
+        """
+        metadata = self.metadata(path)
+        if metadata is None:
+            abort(404)
+
+        variant, encoding = self._choose(metadata)
+        headers = {}
+        data = None
+        if self.accel_prefix:
+            headers["X-Accel-Redirect"] = self.accel_prefix + os.path.relpath(variant["path"], self.root).replace(os.sep, "/")
+        elif self.use_x_sendfile:
+            headers["X-Sendfile"] = variant["path"]
+        else:
+            try:
+                data = wrap_file(request.environ, open(variant["path"], "rb"))
+            except OSError:
+                # Deleted since its metadata was cached
+                self._metadata.delete(path)
+                abort(404)
+
+        response = current_app.response_class(data, mimetype=metadata["mimetype"], headers=headers,
+                                              direct_passthrough=True)
+        response.content_length = variant["size"]
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if metadata["variants"]:
+            response.vary.add("Accept-Encoding")
+
+        response.last_modified = variant["mtime"]
+        if etag:
+            response.set_etag(f"{etag}-{encoding}" if encoding else etag)
+        else:
+            response.set_etag(variant["etag"])
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        # A front proxy answers ranges of the files it sends itself
+        return response.make_conditional(request.environ, accept_ranges=data is not None,
+                                         complete_length=variant["size"])
+
+def precompress(root, min_size=1024, gzip_level=9, brotli_quality=11):
+    """Write .gz (and .br, when brotli is installed) siblings next to compressible files.
+
+    Siblings that are up to date are kept, and ones that would not be
+    smaller than the original are not written. Returns the number of files
+    written.
+    """
+    written = 0
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            if stat.st_size < min_size:
+                continue
+
+            data = None
+            for encoding, extension in ENCODINGS:
+                if encoding == "br" and brotli is None:
+                    continue
+
+                target = path + extension
+                if os.path.exists(target) and os.stat(target).st_mtime >= stat.st_mtime:
+                    continue
+
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                if encoding == "br":
+                    compressed = brotli.compress(data, quality=brotli_quality)
+                else:
+                    compressed = gzip.compress(data, compresslevel=gzip_level, mtime=0)
+                if len(compressed) >= len(data):
+                    continue
+
+                # Write then rename, so a request never sees a partial file
+                with open(target + ".tmp", "wb") as f:
+                    f.write(compressed)
+                os.replace(target + ".tmp", target)
+                written += 1
+    return written
+
+def init_app(app, next_folder, public_folder):
+    """Serve the Next.js build and public images"""
+    settings = {
+        "metadata_ttl": app.config.get("STATIC_METADATA_TTL", 60),
+        "use_x_sendfile": app.config.get("USE_X_SENDFILE", False),
+    }
+    accel_prefix = app.config.get("STATIC_ACCEL_PREFIX")
+    next_files = StaticFiles(next_folder, accel_prefix=accel_prefix and accel_prefix.rstrip("/") + "/next", **settings)
+    public_files = StaticFiles(public_folder, accel_prefix=accel_prefix and accel_prefix.rstrip("/") + "/images", **settings)
+    app.extensions["static_files"] = {"next": next_files, "images": public_files}
+
+    # Serve static files from the root route
+    @app.route('/', defaults={'path': 'server/pages/index.html'})
+    @app.route('/<path:path>')
+    def serve_static(path):
+        return next_files.send(path)
+
+    # Serve public images or other public assets
+    @app.route('/images/<path:filename>')
+    def serve_public_images(filename):
+        return public_files.send(filename)
+
+    # Add route specifically for Next.js static files; static/ holds content-hashed chunks
+    @app.route('/_next/<path:path>')
+    def serve_next_static(path):
+        return next_files.send(path, immutable=path.startswith("static/"))
@@ -0,0 +1,148 @@
+import logging
+import threading
+from flask import current_app, has_app_context, request
+from app.api import events
+from app.api.models.user import User
+from app.api.services import presence
+from app.api.services.auth_service import AuthService
+
+try:
+    from flask_socketio import Namespace, SocketIO, join_room
+except ImportError:  # pragma: no cover - real-time delivery is optional
+    SocketIO = None
+    Namespace = object
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "/realtime"
+
+def user_room(user_id):
+    """Room every connection of a user joins"""
+    return f"user:{user_id}"
+
+def _token_from_handshake(auth):
+    """Get the JWT from the Socket.IO auth payload, the Authorization header or a token query parameter"""
+    if isinstance(auth, dict) and auth.get("token"):
+        return auth["token"]
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header.split(" ")[1]
+    return request.args.get("token")
+
+class RealtimeNamespace(Namespace):
+    """Authenticated namespace that pushes a user's events to all their connections.
+
+    Clients only send heartbeats (every PRESENCE_TTL / 2 seconds) and typing
+    notices; every other change goes through the REST API.
+    """
+
+    def __init__(self, namespace):
+        super().__init__(namespace)
+        self._lock = threading.Lock()
+        # Socket ID -> user ID of this process's connections
+        self._users = {}
+
+    def _user_id(self):
+        with self._lock:
+            return self._users.get(request.sid)
+
+    def on_connect(self, auth=None):
+        token = _token_from_handshake(auth)
+        result = AuthService.verify_token(token) if token else {"status": False}
+        user = User.find_by_id_cached(result["user_id"]) if result["status"] else None
+        if user is None:
+            # Refuses the connection
+            return False
+
+        with self._lock:
+            self._users[request.sid] = user._id
+        join_room(user_room(user._id))
+        presence.heartbeat(user._id)
+        return True
+
+    def on_disconnect(self, reason=None):
+        with self._lock:
+            user_id = self._users.pop(request.sid, None)
+            last_connection = user_id is not None and user_id not in self._users.values()
+        if last_connection:
+            presence.get_presence().disconnect(user_id)
+
+    def on_heartbeat(self, data=None):
+        user_id = self._user_id()
+        if user_id:
+            presence.heartbeat(user_id)
+
+    def on_typing(self, data=None):
+        """Relay {"conversation_id", "typing"} to the other participant, once per change"""
+        user_id = self._user_id()
+        conversation_id = data.get("conversation_id") if isinstance(data, dict) else None
+        if not user_id or not isinstance(conversation_id, str):
+            return
+
+        # Conversation IDs start with the two participants' IDs
+        participants = conversation_id.split("_")[:2]
+        if user_id not in participants:
+            return
+
+        typing = bool(data.get("typing", True))
+        if typing:
+            changed = presence.get_presence().start_typing(user_id, conversation_id)
+        else:
+            changed = presence.get_presence().stop_typing(user_id, conversation_id)
+        if changed:
+            events.publish(events.TYPING, {
+                "conversation_id": conversation_id,
+                "user_id": user_id,
+                "typing": typing
+            }, [participant for participant in participants if participant != user_id])
+
+def _deliver(event, payload, user_ids):
+    """Emit a published event to its users' rooms, on every worker when a message queue is set"""
+    if not has_app_context():
+        return
+    socketio = current_app.extensions.get("socketio")
+    if socketio is None:
+        return
+    # Encoded like API responses (ISO datetimes), once for every recipient
+    payload = current_app.json.loads(current_app.json.dumps(payload))
+    for user_id in user_ids:
+        socketio.emit(event, payload, to=user_room(user_id), namespace=NAMESPACE)
+
+def init_app(app):
+    """Serve the real-time namespace and forward model events to it.
+
+    SOCKETIO_MESSAGE_QUEUE (redis://, amqp://, ...) relays events between
+    workers; without it they are delivered in-process, which only reaches
+    clients connected to the same process.
+
+    With SOCKETIO_SERVE off (the threaded production server in run.py) the
+    namespace is not served, since every long-polling client would hold a
+    request thread; events are only published to the queue, for the
+    process started by realtime.py.
+    """
+    if SocketIO is None:
+        logger.info("flask-socketio is not installed, real-time events are disabled")
+        return None
+
+    message_queue = app.config.get("SOCKETIO_MESSAGE_QUEUE") or None
+    if not app.config.get("SOCKETIO_SERVE", True):
+        if message_queue is None:
+            # Nothing would reach the clients connected to realtime.py
+            logger.warning("SOCKETIO_SERVE is off and SOCKETIO_MESSAGE_QUEUE is not set, so events cannot reach "
+                           "realtime.py and real-time events are disabled")
+            return None
+        # Write-only: emits go to the queue, and no routes are added to the app
+        socketio = app.extensions["socketio"] = SocketIO(message_queue=message_queue)
+        events.subscribe(_deliver)
+        return socketio
+
+    cors_origins = app.config.get("SOCKETIO_CORS_ORIGINS") or "*"
+    socketio = SocketIO(
+        app,
+        message_queue=message_queue,
+        cors_allowed_origins=cors_origins if cors_origins == "*" else cors_origins.split(","),
+        async_mode=app.config.get("SOCKETIO_ASYNC_MODE") or "threading"
+    )
+    socketio.on_namespace(RealtimeNamespace(NAMESPACE))
+    events.subscribe(_deliver)
+    return socketio
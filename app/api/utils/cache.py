@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+
+# Default (size, ttl seconds) of the named caches, overridable with <NAME>_CACHE_SIZE / <NAME>_CACHE_TTL
+CACHE_DEFAULTS = {
+    "user": (10000, 30),
+    "profile": (5000, 10),
+}
+
+class LRUCache:
+    """Thread-safe least-recently-used cache whose entries also expire after a TTL.
+
+    A maxsize of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so loads that raced with one are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Get a cached value, or default if it is missing or expired"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def _store(self, key, value, ttl):
+        self._data[key] = (self._clock() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def generation(self):
+        """Invalidation counter, see set()"""
+        with self._lock:
+            return self._generation
+
+    def set(self, key, value, ttl=None, generation=None):
+        """Cache a value, evicting the least recently used entries beyond maxsize.
+
+        If generation (read before loading the value) is given, the value is
+        only stored when nothing was invalidated since.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is None or generation == self._generation:
+                self._store(key, value, ttl)
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Get a cached value, calling loader() on a miss.
+
+        None results are not cached. If the key is invalidated while loader()
+        runs, the possibly stale result is returned but not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        generation = self.generation
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl, generation=generation)
+        return value
+
+    def delete(self, key):
+        """Invalidate a key"""
+        with self._lock:
+            self._generation += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Invalidate every key"""
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self):
+        """Get hit/miss counters and the current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl
+            }
+
+_default_caches = {}
+_default_lock = threading.Lock()
+
+def _create_cache(name, get_setting):
+    default_size, default_ttl = CACHE_DEFAULTS.get(name, (1024, 30))
+    prefix = name.upper()
+    return LRUCache(
+        maxsize=int(get_setting(f"{prefix}_CACHE_SIZE", default_size)),
+        ttl=float(get_setting(f"{prefix}_CACHE_TTL", default_ttl))
+    )
+
+def get_cache(name):
+    """Get a named in-process cache.
+
+    Caches belong to the current app (configured from <NAME>_CACHE_SIZE and
+    <NAME>_CACHE_TTL); outside an app they are configured from the environment.
+    """
+    if has_app_context():
+        caches = current_app.extensions.setdefault("caches", {})
+        get_setting = current_app.config.get
+    else:
+        caches = _default_caches
+        get_setting = os.environ.get
+
+    cache = caches.get(name)
+    if cache is None:
+        with _default_lock:
+            cache = caches.get(name)
+            if cache is None:
+                cache = caches[name] = _create_cache(name, get_setting)
+    return cache
@@ -0,0 +1,58 @@
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json"}
+
+def choose_encoding(accept_encodings):
+    """Pick the best encoding the client accepts, or None"""
+    candidates = ["br", "gzip"] if brotli else ["gzip"]
+    best, best_quality = None, 0
+    for encoding in candidates:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    """Compress a response body"""
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+def compress_response(response, min_size, gzip_level=6, brotli_quality=4):
+    """Compress a JSON response body in place when it is large enough and the client accepts it"""
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or "Content-Encoding" in response.headers):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding, gzip_level, brotli_quality))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+def init_app(app):
+    """Compress JSON responses above COMPRESS_MIN_SIZE bytes (0 disables compression)"""
+    min_size = app.config.get("COMPRESS_MIN_SIZE", 1024)
+    if min_size <= 0:
+        return
+
+    gzip_level = app.config.get("COMPRESS_GZIP_LEVEL", 6)
+    brotli_quality = app.config.get("COMPRESS_BROTLI_QUALITY", 4)
+
+    @app.after_request
+    def compress_json_response(response):
+        return compress_response(response, min_size, gzip_level, brotli_quality)
@@ -0,0 +1,39 @@
+import hashlib
+from flask import current_app, request
+from werkzeug.http import is_resource_modified
+
+# Responses depend on the authenticated user, so only the browser may keep
+# them, and it has to revalidate before every reuse
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts):
+    """Build an ETag value from the values a response is derived from (e.g. updated_at)"""
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+def _set_validators(response, etag, last_modified=None):
+    # Weak, so the tag still matches when the body is compressed
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
+
+def not_modified(etag, last_modified=None):
+    """Get a 304 response if the client's copy is still current, otherwise None.
+
+    Call this before building the response body so nothing is serialized
+    for a repeat read.
+    """
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return _set_validators(current_app.response_class(status=304), etag, last_modified)
+
+def cacheable(response, etag, last_modified=None):
+    """Add ETag, Last-Modified and Cache-Control headers to a response (no-op without an ETag)"""
+    if etag is None:
+        return response
+    return _set_validators(response, etag, last_modified)
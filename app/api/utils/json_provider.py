@@ -0,0 +1,92 @@
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime, timezone
+from bson import ObjectId
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+def _to_iso(value):
+    """Format a date as ISO 8601, treating naive datetimes (as returned by pymongo) as UTC"""
+    if isinstance(value, datetime) and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.isoformat()
+
+def _default(o):
+    """Serialize the types the fast path does not handle natively"""
+    if isinstance(o, ObjectId):
+        return str(o)
+
+    if isinstance(o, date):
+        return _to_iso(o)
+
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+class FastJSONProvider(JSONProvider):
+    """JSON provider backed by orjson.
+
+    Datetimes are written as ISO 8601 (naive ones as UTC) and ObjectIds as
+    strings. Without orjson it falls back to the standard library with the
+    same output format.
+    """
+
+    mimetype = "application/json"
+    compact = None
+
+    _OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def _pretty(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def _dumps_bytes(self, obj, indent=False):
+        if orjson is None:
+            return self._dumps_stdlib(obj, indent).encode("utf-8")
+        option = self._OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+
+    @staticmethod
+    def _dumps_stdlib(obj, indent=False):
+        if indent:
+            return json.dumps(obj, default=_default, indent=2)
+        return json.dumps(obj, default=_default, separators=(",", ":"))
+
+    def dumps(self, obj, **kwargs):
+        """Serialize data as JSON; extra stdlib arguments force the stdlib encoder"""
+        if orjson is None or kwargs:
+            kwargs.setdefault("default", _default)
+            return json.dumps(obj, **kwargs)
+        return self._dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        """Deserialize data as JSON"""
+        if orjson is None or kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Serialize the arguments straight to a JSON response body"""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self._dumps_bytes(obj, indent=self._pretty()) + b"\n", mimetype=self.mimetype
+        )
+
+def init_app(app):
+    """Use the fast JSON provider for jsonify and request.get_json"""
+    app.json = FastJSONProvider(app)
@@ -0,0 +1,45 @@
+import base64
+import calendar
+from datetime import datetime, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+
+def _to_millis(value):
+    """Convert a datetime (naive values are UTC, as stored by MongoDB) to epoch milliseconds"""
+    if value.tzinfo is None:
+        return calendar.timegm(value.utctimetuple()) * 1000 + value.microsecond // 1000
+    return int(value.timestamp() * 1000)
+
+def encode_cursor(created_at, object_id):
+    """Build an opaque cursor token pointing after a (created_at, _id) position"""
+    raw = f"{_to_millis(created_at)}:{object_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip("=")
+
+def decode_cursor(token):
+    """Decode a cursor token into (created_at, ObjectId).
+
+    Raises ValueError if the token is malformed.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        millis, object_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split(":", 1)
+        created_at = datetime.fromtimestamp(int(millis) / 1000, tz=timezone.utc)
+        return created_at, ObjectId(object_id)
+    except (ValueError, TypeError, UnicodeError, InvalidId):
+        raise ValueError("Invalid cursor")
+
+def keyset_filter(cursor, descending=True):
+    """Build a filter selecting documents after a cursor in (created_at, _id) order"""
+    created_at, object_id = decode_cursor(cursor)
+    operator = "$lt" if descending else "$gt"
+    return {"$or": [
+        {"created_at": {operator: created_at}},
+        {"created_at": created_at, "_id": {operator: object_id}}
+    ]}
+
+def next_cursor(items, limit):
+    """Get the cursor for the page after items, or None if this was the last page"""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(last.created_at, last._id)
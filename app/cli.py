@@ -0,0 +1,155 @@
+import time
+import click
+from flask.cli import AppGroup
+from app.config.indexes import sync_indexes, explain_model_queries
+
+db_cli = AppGroup('db', help='Database maintenance commands')
+
+def _report_query_plans():
+    """Print the winning plan of every model query and return the number of queries without a usable index"""
+    reports = explain_model_queries()
+    
+    for report in reports:
+        if report["collscan"]:
+            status = "COLLSCAN"
+        elif report["blocking_sort"]:
+            status = "SORT"
+        else:
+            status = "ok"
+        stages = " <- ".join(report["stages"])
+        click.echo(f"[{status}] {report['model']}.{report['query']} ({report['collection']}): {stages}")
+    
+    return sum(1 for report in reports if report["collscan"] or report["blocking_sort"])
+
+@db_cli.command('sync-indexes')
+@click.option('--prune', is_flag=True, help='Drop indexes that no model declares')
+@click.option('--explain/--no-explain', default=True, help='Check model queries with explain() after syncing')
+def sync_indexes_command(prune, explain):
+    """Create or update the indexes declared by the models"""
+    try:
+        results = sync_indexes(prune=prune)
+    except Exception as e:
+        raise click.ClickException(f"Could not create indexes: {e}")
+    
+    for collection_name, result in results.items():
+        click.echo(f"{collection_name}: {len(result['created'])} indexes synced")
+        for name in result["dropped"]:
+            click.echo(f"{collection_name}: dropped {name}")
+    
+    if explain:
+        unindexed = _report_query_plans()
+        if unindexed:
+            raise click.ClickException(f"{unindexed} model queries still scan the collection or sort in memory")
+    
+    click.echo("Indexes synced successfully")
+
+@db_cli.command('check-queries')
+def check_queries_command():
+    """Explain every model query and flag collection scans and in-memory sorts"""
+    unindexed = _report_query_plans()
+    
+    if unindexed:
+        raise click.ClickException(f"{unindexed} model queries still scan the collection or sort in memory")
+    
+    click.echo("All model queries use an index")
+
+@db_cli.command('rebuild-conversations')
+def rebuild_conversations_command():
+    """Rebuild the conversation summaries from the messages collection"""
+    from app.api.models.message import Message
+    
+    try:
+        count = Message.rebuild_conversations()
+    except Exception as e:
+        raise click.ClickException(f"Could not rebuild conversations: {e}")
+    
+    click.echo(f"{count} conversations rebuilt")
+
+@db_cli.command('reconcile-unread')
+@click.option('--interval', type=int, default=0, help='Keep running and reconcile every INTERVAL seconds')
+def reconcile_unread_command(interval):
+    """Recount unread messages and correct drifted counters"""
+    from app.api.models.message import Message
+    
+    while True:
+        try:
+            users, conversations = Message.reconcile_unread_counts()
+        except Exception as e:
+            raise click.ClickException(f"Could not reconcile unread counters: {e}")
+        
+        click.echo(f"Corrected {users} user counters and {conversations} conversations")
+        
+        if interval <= 0:
+            break
+        time.sleep(interval)
+
+@db_cli.command('migrate-ratings')
+def migrate_ratings_command():
+    """Move ratings embedded in projects into the project_ratings collection"""
+    from app.api.models.project import Project
+    
+    try:
+        count = Project.migrate_embedded_ratings()
+    except Exception as e:
+        raise click.ClickException(f"Could not migrate ratings: {e}")
+    
+    click.echo(f"{count} projects migrated")
+
+@db_cli.command('migrate-collaboration-requests')
+def migrate_collaboration_requests_command():
+    """Move collaboration requests embedded in projects into their own collection"""
+    from app.api.models.project import Project
+    
+    try:
+        count = Project.migrate_embedded_collaboration_requests()
+    except Exception as e:
+        raise click.ClickException(f"Could not migrate collaboration requests: {e}")
+    
+    click.echo(f"{count} projects migrated")
+
+static_cli = AppGroup('static', help='Static asset commands')
+
+@static_cli.command('precompress')
+@click.option('--min-size', type=int, default=1024, help='Skip files smaller than this many bytes')
+def precompress_command(min_size):
+    """Write .br/.gz siblings for the Next.js build and public assets"""
+    from flask import current_app
+    from app.api.services.static_files import brotli, precompress
+    
+    if brotli is None:
+        click.echo("brotli is not installed, writing .gz files only")
+    
+    for static_files in current_app.extensions["static_files"].values():
+        try:
+            count = precompress(static_files.root, min_size=min_size)
+        except OSError as e:
+            raise click.ClickException(f"Could not precompress {static_files.root}: {e}")
+        
+        click.echo(f"{static_files.root}: {count} files written")
+
+media_cli = AppGroup('media', help='Uploaded media commands')
+
+@media_cli.command('process-images')
+def process_images_command():
+    """Generate variants for uploaded images that were not processed yet"""
+    from app.api.services.image_service import process_pending
+    
+    try:
+        count = process_pending()
+    except Exception as e:
+        raise click.ClickException(f"Could not process images: {e}")
+    
+    click.echo(f"{count} images processed")
+
+@media_cli.command('clean-uploads')
+@click.option('--max-age', type=float, default=None, help='Delete sessions older than this many seconds (default UPLOAD_SESSION_TTL)')
+def clean_uploads_command(max_age):
+    """Delete resumable uploads that were never finalized"""
+    from app.api.services.chunked_upload import remove_expired
+    
+    try:
+        count = remove_expired(max_age)
+    except OSError as e:
+        raise click.ClickException(f"Could not clean uploads: {e}")
+    
+    click.echo(f"{count} upload sessions deleted")
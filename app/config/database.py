@@ -1,12 +1,192 @@
 import os
 import sys
-from pymongo import MongoClient
+import threading
+import time
+from pymongo import MongoClient, monitoring
 from dotenv import load_dotenv
 from flask import current_app, g
 
 # Load environment variables
 load_dotenv()
 
+DEFAULT_MONGO_URI = 'mongodb://localhost:27017/linkedin_clone'
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Collect connection pool statistics for a shared MongoClient"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+    
+    def reset(self):
+        """Reset all counters"""
+        with self._lock:
+            self.connections_open = 0
+            self.checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.total_wait_time = 0.0
+            self.max_wait_time = 0.0
+            self.pool_clears = 0
+    
+    def connection_check_out_started(self, event):
+        # Checkout happens synchronously on the calling thread
+        self._local.started = time.perf_counter()
+    
+    def _record_wait(self):
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return time.perf_counter() - started if started is not None else 0.0
+    
+    def connection_checked_out(self, event):
+        wait = self._record_wait()
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.total_wait_time += wait
+            self.max_wait_time = max(self.max_wait_time, wait)
+    
+    def connection_check_out_failed(self, event):
+        wait = self._record_wait()
+        with self._lock:
+            self.checkout_failures += 1
+            self.total_wait_time += wait
+            self.max_wait_time = max(self.max_wait_time, wait)
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+    
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+    
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open = max(0, self.connections_open - 1)
+    
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+    
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def snapshot(self):
+        """Return the current counters as a dictionary"""
+        with self._lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                "connections_open": self.connections_open,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "pool_clears": self.pool_clears,
+                "avg_wait_ms": (self.total_wait_time / attempts * 1000) if attempts else 0.0,
+                "max_wait_ms": self.max_wait_time * 1000
+            }
+
+# Process-wide registry of MongoClient instances keyed by URI and pool options
+_clients = {}
+_clients_lock = threading.Lock()
+_clients_pid = os.getpid()
+
+def _reset_client_registry():
+    """Forget clients inherited from a parent process.
+
+    MongoClient is not fork-safe, so a forked worker must build its own pool.
+    The inherited clients are dropped without closing them, since their sockets
+    are still owned by the parent.
+    """
+    global _clients, _clients_lock, _clients_pid
+    _clients = {}
+    _clients_lock = threading.Lock()
+    _clients_pid = os.getpid()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_client_registry)
+
+def _get_setting(name, default=None):
+    """Read a database setting from the app config, falling back to the environment"""
+    try:
+        if current_app and name in current_app.config:
+            return current_app.config[name]
+    except RuntimeError:
+        # Not in application context
+        pass
+    return os.environ.get(name, default)
+
+def get_mongo_uri():
+    """Get the MongoDB connection URI from app config or environment variables"""
+    return _get_setting('MONGO_URI') or DEFAULT_MONGO_URI
+
+def get_pool_options():
+    """Build MongoClient pool options from app config or environment variables"""
+    options = {
+        "maxPoolSize": int(_get_setting('MONGO_MAX_POOL_SIZE', 100)),
+        "minPoolSize": int(_get_setting('MONGO_MIN_POOL_SIZE', 0)),
+    }
+    
+    wait_queue_timeout_ms = _get_setting('MONGO_WAIT_QUEUE_TIMEOUT_MS')
+    if wait_queue_timeout_ms:
+        options["waitQueueTimeoutMS"] = int(wait_queue_timeout_ms)
+    
+    compressors = _get_setting('MONGO_COMPRESSORS')
+    if compressors:
+        if isinstance(compressors, (list, tuple)):
+            compressors = ",".join(compressors)
+        options["compressors"] = compressors
+    
+    return options
+
+def get_client(mongo_uri=None):
+    """Get the shared MongoClient for this process, creating it on first use"""
+    if _clients_pid != os.getpid():
+        # Fork happened without register_at_fork support
+        _reset_client_registry()
+    
+    mongo_uri = mongo_uri or get_mongo_uri()
+    options = get_pool_options()
+    key = (mongo_uri, tuple(sorted(options.items())))
+    
+    client_entry = _clients.get(key)
+    if client_entry is None:
+        with _clients_lock:
+            client_entry = _clients.get(key)
+            if client_entry is None:
+                listener = PoolStatsListener()
+                client = MongoClient(mongo_uri, event_listeners=[listener], **options)
+                client_entry = (client, listener)
+                _clients[key] = client_entry
+    
+    return client_entry[0]
+
+def get_pool_stats():
+    """Get connection pool statistics for every shared client in this process"""
+    stats = []
+    for (mongo_uri, options), (client, listener) in list(_clients.items()):
+        pool_stats = listener.snapshot()
+        pool_stats["options"] = dict(options)
+        stats.append(pool_stats)
+    return stats
+
+def close_clients():
+    """Close every shared client in this process"""
+    with _clients_lock:
+        for client, listener in _clients.values():
+            client.close()
+        _clients.clear()
+
 def get_db():
     """Get the MongoDB database instance based on app config or environment"""
     # If in application context and already connected, return the existing connection
@@ -17,21 +197,8 @@ def get_db():
         # Not in application context, don't use flask.g
         pass
     
-    # Get MongoDB connection URI from app config or environment variables
-    mongo_uri = None
-    try:
-        if current_app and 'MONGO_URI' in current_app.config:
-            mongo_uri = current_app.config['MONGO_URI']
-    except RuntimeError:
-        # Not in application context
-        pass
-    
-    # Default if not in application context or not in config
-    if not mongo_uri:
-        mongo_uri = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/linkedin_clone')
-    
-    # Create MongoDB client
-    client = MongoClient(mongo_uri)
+    # Reuse the process-wide pooled client for this URI
+    client = get_client()
     
     # Get database
     db_instance = client.get_database()
@@ -46,8 +213,25 @@ def get_db():
     
     return db_instance
 
-# Global database instance for usage outside of request context
-db = get_db()
+class LazyDatabase:
+    """Module-level database handle that connects on first use.
+
+    Attribute and item access are forwarded to get_db(), so importing a model
+    never opens a connection and requests still resolve the database from the
+    current app config.
+    """
+    
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+    
+    def __getitem__(self, name):
+        return get_db()[name]
+    
+    def __repr__(self):
+        return "<LazyDatabase>"
+
+# Global database handle, resolved lazily on first use
+db = LazyDatabase()
 
 # Clear all test data (only for test database)
 def clear_test_data():
@@ -71,32 +255,20 @@ def clear_test_data():
 
 # Create indexes for faster queries
 def create_indexes():
-    """Create necessary database indexes"""
-    db = get_db()
+    """Create the indexes declared by every model (see app/config/indexes.py)"""
+    from app.config.indexes import sync_indexes
+    return sync_indexes()
+
+def sync_indexes_on_startup(app):
+    """Create indexes when the app starts, if enabled in the app config"""
+    if not app.config.get('SYNC_INDEXES_ON_STARTUP'):
+        return False
     
-    try:
-        # Users collection indexes
-        db.users.create_index("email", unique=True)
-        db.users.create_index("phone", unique=True)
-        db.users.create_index("username", unique=True)
-        
-        # Projects collection indexes
-        db.projects.create_index("user_id")
-        db.projects.create_index("categories")
-        
-        # Messages collection indexes
-        db.messages.create_index([("sender_id", 1), ("receiver_id", 1)])
-        db.messages.create_index("conversation_id")
-        
-        # Verification codes collection with TTL index
-        db.verification_codes.create_index("created_at", expireAfterSeconds=3600)  # Expire after 1 hour
-    except Exception as e:
-        # Log the error but don't crash - indexes will be created when app starts
-        print(f"Warning: Could not create indexes: {e}")
-
-# Run the indexing function
-try:
-    create_indexes()
-except Exception as e:
-    # Log the error but don't crash - indexes will be created when app starts
-    print(f"Warning: Could not create indexes: {e}") 
\ No newline at end of file
+    with app.app_context():
+        try:
+            create_indexes()
+        except Exception as e:
+            # Log the error but don't crash - indexes can be synced with `flask db sync-indexes`
+            print(f"Warning: Could not create indexes: {e}")
+            return False
+    return True
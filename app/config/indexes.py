@@ -0,0 +1,85 @@
+from pymongo.errors import OperationFailure
+
+def _iter_plan_stages(plan):
+    """Yield every stage name in an explain() plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan", "winningPlan"):
+        if key in plan:
+            yield from _iter_plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _iter_plan_stages(child)
+
+def get_winning_plan_stages(explain_output):
+    """Get the stage names of the winning plan from explain() output"""
+    query_planner = explain_output.get("queryPlanner", {})
+    return list(_iter_plan_stages(query_planner.get("winningPlan", {})))
+
+def sync_model_indexes(model, prune=False):
+    """Create the indexes declared by a model, optionally dropping undeclared ones.
+
+    Returns a dictionary with the created and dropped index names.
+    """
+    collection = model.get_collection()
+    result = {"created": [], "dropped": []}
+
+    if model.indexes:
+        result["created"] = collection.create_indexes(model.indexes)
+
+    if prune:
+        declared = {index.document["name"] for index in model.indexes}
+        for name in collection.index_information():
+            if name != "_id_" and name not in declared:
+                collection.drop_index(name)
+                result["dropped"].append(name)
+
+    return result
+
+def sync_indexes(models=None, prune=False):
+    """Create the indexes declared by every registered model.
+
+    Returns a dictionary of collection name -> sync result.
+    """
+    if models is None:
+        from app.api.models.base import load_models
+        models = load_models()
+
+    return {model.collection_name: sync_model_indexes(model, prune=prune) for model in models}
+
+def explain_model_queries(models=None):
+    """Explain every query shape declared by the registered models.
+
+    Returns a list of dictionaries describing each query and its winning plan,
+    with "collscan" set when the query still scans the whole collection and
+    "blocking_sort" when its results are sorted in memory instead of read in
+    index order (SORT_MERGE, which merges index scans in order, is fine).
+    """
+    if models is None:
+        from app.api.models.base import load_models
+        models = load_models()
+
+    reports = []
+    for model in models:
+        collection = model.get_collection()
+        for query_name, (query_filter, sort) in model.query_shapes.items():
+            cursor = collection.find(query_filter)
+            if sort:
+                cursor = cursor.sort(sort)
+
+            try:
+                stages = get_winning_plan_stages(cursor.explain())
+            except OperationFailure as e:
+                stages = [f"ERROR: {e}"]
+
+            reports.append({
+                "model": model.__name__,
+                "collection": model.collection_name,
+                "query": query_name,
+                "stages": stages,
+                "collscan": "COLLSCAN" in stages,
+                "blocking_sort": "SORT" in stages
+            })
+
+    return reports
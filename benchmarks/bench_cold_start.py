@@ -0,0 +1,55 @@
+"""
+Benchmark cold start time of the Flask app.
+
+Each measurement runs in a fresh interpreter so module import side effects
+(database connections, index builds) are included, the same way a new
+waitress/gunicorn worker would pay for them.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SCENARIOS = {
+    "import models": "import app.api.models.user, app.api.models.project, app.api.models.message",
+    "create_app": "from app import create_app; create_app()",
+    "create_app + index sync": "from app import create_app; create_app()",
+}
+
+def run_once(code, env):
+    """Run a snippet in a fresh interpreter and return its wall time in ms"""
+    timer = (
+        "import time; _start = time.perf_counter()\n"
+        f"{code}\n"
+        "print((time.perf_counter() - _start) * 1000)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", timer],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<28}{'median ms':>12}{'min ms':>12}")
+    for name, code in SCENARIOS.items():
+        env = dict(os.environ)
+        env["SYNC_INDEXES_ON_STARTUP"] = "true" if "index sync" in name else "false"
+        timings = [run_once(code, env) for _ in range(args.runs)]
+        print(f"{name:<28}{statistics.median(timings):>12.1f}{min(timings):>12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark for JSON response serialization.
+
+Serializes listing-sized payloads (50 projects, 50 messages, 50
+conversations, shaped like the API responses) with Flask's default JSON
+provider and with the orjson-backed FastJSONProvider, and reports the time
+per response and the body size.
+
+Usage:
+    python benchmarks/bench_json.py [--items 50] [--iterations 2000]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timezone
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.api.utils.json_provider import FastJSONProvider, orjson
+
+def project_listing(count, now):
+    return {
+        "status": True,
+        "projects": [{
+            "id": str(ObjectId()),
+            "title": f"Project {i}",
+            "description": "A project used for benchmarking " * 4,
+            "images": [f"/uploads/projects/{i}_1.png", f"/uploads/projects/{i}_2.png"],
+            "categories": ["Technology", "Design"],
+            "budget": "1000-5000",
+            "owner": {"id": str(ObjectId()), "username": f"owner_{i}"},
+            "favorites_count": i,
+            "avg_rating": 4.5,
+            "created_at": now,
+            "updated_at": now
+        } for i in range(count)],
+        "page": 1,
+        "limit": count,
+        "next_cursor": "NjZmMDAwMDAwMDAwMDAwMDAwMDAwMDAw"
+    }
+
+def message_listing(count, now):
+    return {
+        "status": True,
+        "conversation_id": f"{'a' * 24}_{'b' * 24}",
+        "messages": [{
+            "id": str(ObjectId()),
+            "sender_id": "a" * 24,
+            "content": f"Message number {i}, with a little more text in it",
+            "is_read": bool(i % 2),
+            "message_type": "personal",
+            "created_at": now
+        } for i in range(count)],
+        "other_user": {"id": "b" * 24, "username": "other", "profile_picture": None, "user_type": "Public Figure"},
+        "page": 1,
+        "limit": count,
+        "next_cursor": None
+    }
+
+def conversation_listing(count, now):
+    return {
+        "status": True,
+        "conversations": [{
+            "conversation_id": f"{'a' * 24}_{i:024d}",
+            "other_user": {"id": f"{i:024d}", "username": f"user_{i}", "profile_picture": None},
+            "latest_message": {
+                "content": "See you tomorrow",
+                "sender_id": "a" * 24,
+                "is_read": False,
+                "created_at": now
+            },
+            "unread_count": i % 3
+        } for i in range(count)],
+        "page": 1,
+        "limit": count
+    }
+
+def bench(provider, payload, iterations):
+    with provider._app.app_context():
+        provider.response(payload)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            body = provider.response(payload).get_data()
+        elapsed = time.perf_counter() - start
+    return elapsed / iterations * 1e6, len(body)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    providers = [("default", DefaultJSONProvider(app)), ("fast", FastJSONProvider(app))]
+    # pymongo returns naive UTC datetimes
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    print(f"{args.items} items per response, orjson {'available' if orjson else 'missing (stdlib fallback)'}")
+    print(f"{'payload':<15} {'provider':<10} {'time':>12} {'size':>10}")
+    for name, make_payload in [("projects", project_listing), ("messages", message_listing),
+                               ("conversations", conversation_listing)]:
+        payload = make_payload(args.items, now)
+        baseline = None
+        for provider_name, provider in providers:
+            micros, size = bench(provider, payload, args.iterations)
+            baseline = baseline or micros
+            print(f"{name:<15} {provider_name:<10} {micros:>9.1f} us {size:>8} B  x{baseline / micros:.1f}")
+
+if __name__ == '__main__':
+    main()
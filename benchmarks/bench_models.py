@@ -0,0 +1,142 @@
+"""
+Benchmark for model hydration, serialization and memory use.
+
+Hydrates a listing of documents for each model with from_dict(), serializes
+them back with to_dict() and reports the time per object and the memory
+held per object. The shallow size of the slotted instance is compared with
+the same attributes stored in a per-instance __dict__.
+
+Usage:
+    python benchmarks/bench_models.py [--count 10000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bson import ObjectId
+from app.api.models.message import Message
+from app.api.models.project import Project
+from app.api.models.user import User, default_settings
+
+def make_user(i, now):
+    return {
+        "_id": str(ObjectId()),
+        "username": f"user_{i}",
+        "email": f"user_{i}@example.com",
+        "phone": f"+1{i:010d}",
+        "password_hash": "$2b$12$abcdefghijklmnopqrstuuJ1Q0dxtEJXbi0hcRm2BYHQnQ0zZ8v8e",
+        "user_type": "Public Figure",
+        "profile_picture": None,
+        "bio": "",
+        "social_links": {},
+        "onboarding_responses": {},
+        "favorites": {"users": [], "projects": []},
+        "settings": default_settings(),
+        "created_at": now,
+        "updated_at": now,
+        "email_verified": True,
+        "phone_verified": False,
+        "is_open_to_more": True
+    }
+
+def make_project(i, now):
+    return {
+        "_id": str(ObjectId()),
+        "user_id": str(ObjectId()),
+        "title": f"Project {i}",
+        "description": "A project used for benchmarking",
+        "images": [f"/projects/{i}.png"],
+        "categories": ["Technology", "Design"],
+        "budget": "1000-5000",
+        "is_private": False,
+        "collaborators": [],
+        "favorites_count": 3,
+        "rating_sum": 9,
+        "rating_count": 2,
+        "created_at": now,
+        "updated_at": now
+    }
+
+def make_message(i, now):
+    return {
+        "_id": str(ObjectId()),
+        "sender_id": "a" * 24,
+        "receiver_id": "b" * 24,
+        "conversation_id": f"{'a' * 24}_{'b' * 24}",
+        "content": f"Message number {i}",
+        "message_type": "personal",
+        "is_read": False,
+        "created_at": now,
+        "updated_at": now
+    }
+
+def slot_names(cls):
+    """Every slot declared along the class hierarchy"""
+    names = []
+    for klass in cls.__mro__:
+        names.extend(getattr(klass, "__slots__", ()))
+    return names
+
+def dict_instance_size(obj):
+    """Shallow size of an equivalent object keeping its attributes in __dict__"""
+    class DictInstance:
+        pass
+
+    instance = DictInstance()
+    for name in slot_names(type(obj)):
+        if hasattr(obj, name):
+            setattr(instance, name, getattr(obj, name))
+    return sys.getsizeof(instance) + sys.getsizeof(instance.__dict__)
+
+def bench_model(model, make_document, count):
+    now = datetime.now(timezone.utc)
+    documents = [make_document(i, now) for i in range(count)]
+
+    start = time.perf_counter()
+    objects = [model.from_dict(doc) for doc in documents]
+    hydrate_seconds = time.perf_counter() - start
+
+    # Measure memory in a separate pass, tracing slows allocation down
+    del objects
+    gc.collect()
+    tracemalloc.start()
+    objects = [model.from_dict(doc) for doc in documents]
+    held_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for obj in objects:
+        obj.to_dict()
+    serialize_seconds = time.perf_counter() - start
+
+    return {
+        "hydrate_us": hydrate_seconds / count * 1e6,
+        "serialize_us": serialize_seconds / count * 1e6,
+        "held_bytes": held_bytes / count,
+        "slots_bytes": sys.getsizeof(objects[0]),
+        "dict_bytes": dict_instance_size(objects[0])
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{args.count} objects per model")
+    print(f"{'model':<10} {'from_dict':>12} {'to_dict':>12} {'held/obj':>10} {'slots':>8} {'__dict__':>10}")
+    for model, make_document in [(User, make_user), (Project, make_project), (Message, make_message)]:
+        result = bench_model(model, make_document, args.count)
+        print(f"{model.__name__:<10} "
+              f"{result['hydrate_us']:>9.2f} us "
+              f"{result['serialize_us']:>9.2f} us "
+              f"{result['held_bytes']:>8.0f} B "
+              f"{result['slots_bytes']:>6} B "
+              f"{result['dict_bytes']:>8} B")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark for hydrating User objects from database documents.
+
+Compares User.from_dict() with the previous approach of running the
+constructor (and therefore bcrypt) before overwriting the fields.
+
+Usage:
+    python benchmarks/bench_user_hydration.py [--count 10000]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bson import ObjectId
+from app.api.models.user import User, default_settings
+
+def make_document():
+    """Build a user document shaped like the ones stored in MongoDB"""
+    now = datetime.now(timezone.utc)
+    return {
+        "_id": str(ObjectId()),
+        "username": "benchmark_user",
+        "email": "benchmark@example.com",
+        "phone": "+10000000000",
+        "password_hash": "$2b$12$abcdefghijklmnopqrstuuJ1Q0dxtEJXbi0hcRm2BYHQnQ0zZ8v8e",
+        "user_type": "Public Figure",
+        "profile_picture": None,
+        "bio": "",
+        "social_links": {},
+        "onboarding_responses": {},
+        "favorites": {"users": [], "projects": []},
+        "settings": default_settings(),
+        "created_at": now,
+        "updated_at": now,
+        "email_verified": True,
+        "phone_verified": False,
+        "is_open_to_more": True
+    }
+
+def hydrate_with_constructor(data):
+    """The previous hydration path: constructor (bcrypt) then overwrite"""
+    user = User(
+        username=data["username"],
+        email=data["email"],
+        phone=data["phone"],
+        password="",
+        user_type=data["user_type"]
+    )
+    user.password_hash = data["password_hash"]
+    return user
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=10000)
+    args = parser.parse_args()
+
+    document = make_document()
+
+    from_dict_total = timeit.timeit(lambda: User.from_dict(document), number=args.count)
+    # bcrypt is far too slow to run thousands of times
+    constructor_count = max(1, args.count // 1000)
+    constructor_total = timeit.timeit(lambda: hydrate_with_constructor(document), number=constructor_count)
+
+    from_dict_us = from_dict_total / args.count * 1e6
+    constructor_us = constructor_total / constructor_count * 1e6
+
+    print(f"User.from_dict():         {from_dict_us:>12.2f} us/user ({args.count} runs)")
+    print(f"constructor + overwrite:  {constructor_us:>12.2f} us/user ({constructor_count} runs)")
+    print(f"speedup:                  {constructor_us / from_dict_us:>12.0f}x")
+
+if __name__ == '__main__':
+    main()
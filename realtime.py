@@ -0,0 +1,37 @@
+import os
+import sys
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Socket.IO connections stay open, so they are served by green threads
+# (gevent or eventlet) in their own process instead of by the request
+# threads of run.py, which publishes events to this process through
+# SOCKETIO_MESSAGE_QUEUE. Patching must happen before anything else is imported.
+async_mode = os.environ.get('SOCKETIO_ASYNC_MODE') or 'gevent'
+if async_mode == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+elif async_mode == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+else:
+    sys.exit("realtime.py needs SOCKETIO_ASYNC_MODE=gevent or eventlet")
+
+os.environ['SOCKETIO_ASYNC_MODE'] = async_mode
+os.environ['SOCKETIO_SERVE'] = 'true'
+
+from app import create_app
+
+# Create app instance
+app = create_app()
+
+if __name__ == '__main__':
+    socketio = app.extensions.get('socketio')
+    if socketio is None:
+        sys.exit("flask-socketio is not installed")
+
+    port = int(os.environ.get('REALTIME_PORT', 5001))
+    print(f"Serving Socket.IO ({async_mode}) on http://0.0.0.0:{port}")
+    socketio.run(app, host='0.0.0.0', port=port)
@@ -5,23 +5,33 @@ from app import create_app
 # Load environment variables
 load_dotenv()
 
+# Determine if we're in development or production
+env = os.environ.get('FLASK_ENV', 'development')
+debug = env == 'development'
+
+if not debug:
+    # Long-polling Socket.IO clients would each hold one of Waitress's few
+    # threads, so realtime.py serves them and this process only publishes
+    os.environ.setdefault('SOCKETIO_SERVE', 'false')
+
 # Create app instance
 app = create_app()
 
 if __name__ == '__main__':
     # Get port from environment variable or use default
     port = int(os.environ.get('PORT', 5000))
-    
-    # Determine if we're in development or production
-    env = os.environ.get('FLASK_ENV', 'development')
     print(f"Environment: {env}")
-    debug = env == 'development'
+    
+    socketio = app.extensions.get('socketio')
     
     if debug:
-        # Use Flask's built-in server for development
-        app.run(host='0.0.0.0', port=port, debug=True)
+        # Use Flask's built-in server for development (with WebSocket support when Socket.IO is enabled)
+        if socketio:
+            socketio.run(app, host='0.0.0.0', port=port, debug=True)
+        else:
+            app.run(host='0.0.0.0', port=port, debug=True)
     else:
-        # Use Waitress for production on Windows
+        # Use Waitress for production on Windows; run realtime.py for Socket.IO
         from waitress import serve
         print(f"Serving on http://0.0.0.0:{port}")
-        serve(app, host='0.0.0.0', port=port, threads=4) 
\ No newline at end of file
+        serve(app, host='0.0.0.0', port=port, threads=app.config['SERVER_THREADS'])
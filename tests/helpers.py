@@ -0,0 +1,9 @@
+import io
+from PIL import Image
+
+def make_upload(size=(1000, 500), name="photo.png", color=(10, 200, 10)):
+    """Build an in-memory PNG upload"""
+    data = io.BytesIO()
+    Image.new("RGB", size, color).save(data, "PNG")
+    data.seek(0)
+    return data, name
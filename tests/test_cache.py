@@ -0,0 +1,132 @@
+import unittest
+import os
+import sys
+from datetime import datetime
+from unittest import mock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bson import ObjectId
+from app import create_app
+from app.api.models.user import User
+from app.api.utils.cache import LRUCache, get_cache
+
+class FakeClock:
+    """Clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class LRUCacheTestCase(unittest.TestCase):
+    """Test case for the in-process LRU + TTL cache"""
+
+    def setUp(self):
+        """Set up a small cache"""
+        self.clock = FakeClock()
+        self.cache = LRUCache(maxsize=2, ttl=10, clock=self.clock)
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest unused entry goes first"""
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_entries_expire(self):
+        """Test entries are dropped after the TTL"""
+        self.cache.set("a", 1)
+        self.clock.now = 9.9
+        self.assertEqual(self.cache.get("a"), 1)
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_stats(self):
+        """Test hits and misses are counted"""
+        self.cache.set("a", 1)
+        self.cache.get("a")
+        self.cache.get("missing")
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_get_or_load(self):
+        """Test the loader only runs on a miss"""
+        loader = mock.Mock(return_value="value")
+        self.assertEqual(self.cache.get_or_load("a", loader), "value")
+        self.assertEqual(self.cache.get_or_load("a", loader), "value")
+        loader.assert_called_once()
+
+    def test_load_racing_invalidation_is_not_cached(self):
+        """Test a value loaded while the key was invalidated is not stored"""
+        def loader():
+            self.cache.delete("a")
+            return "stale"
+
+        self.assertEqual(self.cache.get_or_load("a", loader), "stale")
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_disabled(self):
+        """Test a cache of size 0 stores nothing"""
+        cache = LRUCache(maxsize=0)
+        cache.set("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+class UserCacheTestCase(unittest.TestCase):
+    """Test case for the user cache behind token_required"""
+
+    def setUp(self):
+        """Set up an app and a stored user document"""
+        self.app = create_app(test_config={"testing": True})
+        self.user_id = ObjectId()
+        self.document = {
+            "_id": self.user_id,
+            "username": "cached",
+            "email": "cached@example.com",
+            "email_verified": True,
+            "favorites": {"users": [], "projects": []},
+            "created_at": datetime(2025, 1, 1),
+            "updated_at": datetime(2025, 1, 1)
+        }
+        self.collection = mock.Mock()
+        self.collection.find_one.side_effect = lambda *args, **kwargs: dict(self.document)
+
+    def _load(self):
+        with self.app.test_request_context():
+            return User.find_by_id_cached(str(self.user_id))
+
+    def test_repeated_lookups_hit_cache(self):
+        """Test only the first request reads the user"""
+        with self.app.app_context(), mock.patch.object(User, "get_collection", return_value=self.collection):
+            first = self._load()
+            second = self._load()
+
+            self.assertEqual(self.collection.find_one.call_count, 1)
+            self.assertEqual(second.username, "cached")
+            self.assertIsNot(first, second)
+            self.assertEqual(get_cache("user").stats()["hits"], 1)
+
+    def test_cached_user_is_a_copy(self):
+        """Test changes to one request's user do not leak into the cache"""
+        with self.app.app_context(), mock.patch.object(User, "get_collection", return_value=self.collection):
+            self._load().favorites["users"].append("someone")
+            self.assertEqual(self._load().favorites["users"], [])
+
+    def test_save_invalidates(self):
+        """Test saving a user drops it from the cache"""
+        with self.app.app_context(), mock.patch.object(User, "get_collection", return_value=self.collection):
+            user = self._load()
+            user.bio = "Updated"
+            user.save()
+            self._load()
+
+            self.assertEqual(self.collection.find_one.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import database
+
+class DatabaseClientTestCase(unittest.TestCase):
+    """Test case for the shared MongoClient registry"""
+
+    def test_client_is_shared(self):
+        """Test the same client is returned for the same URI"""
+        uri = 'mongodb://localhost:27017/linkedin_clone_test'
+        client1 = database.get_client(uri)
+        client2 = database.get_client(uri)
+        self.assertIs(client1, client2)
+
+    def test_client_per_uri(self):
+        """Test different URIs get different clients"""
+        client1 = database.get_client('mongodb://localhost:27017/linkedin_clone_test')
+        client2 = database.get_client('mongodb://localhost:27017/linkedin_clone_other')
+        self.assertIsNot(client1, client2)
+
+    def test_registry_reset_after_fork(self):
+        """Test a forked process does not reuse the parent's client"""
+        uri = 'mongodb://localhost:27017/linkedin_clone_test'
+        client1 = database.get_client(uri)
+
+        # Simulate running in a child process, then restore the parent's registry
+        saved_clients = database._clients
+        database._reset_client_registry()
+        try:
+            client2 = database.get_client(uri)
+            self.assertIsNot(client1, client2)
+            client2.close()
+        finally:
+            database._clients = saved_clients
+
+    def test_pool_options_from_environment(self):
+        """Test pool options are read from the environment"""
+        os.environ['MONGO_MAX_POOL_SIZE'] = '25'
+        os.environ['MONGO_WAIT_QUEUE_TIMEOUT_MS'] = '500'
+        try:
+            options = database.get_pool_options()
+        finally:
+            del os.environ['MONGO_MAX_POOL_SIZE']
+            del os.environ['MONGO_WAIT_QUEUE_TIMEOUT_MS']
+
+        self.assertEqual(options['maxPoolSize'], 25)
+        self.assertEqual(options['waitQueueTimeoutMS'], 500)
+
+    def test_pool_stats(self):
+        """Test pool statistics are exposed for shared clients"""
+        database.get_client('mongodb://localhost:27017/linkedin_clone_test')
+        stats = database.get_pool_stats()
+        self.assertTrue(stats)
+        for pool_stats in stats:
+            self.assertIn('checked_out', pool_stats)
+            self.assertIn('avg_wait_ms', pool_stats)
+
+    def test_lazy_database_handle(self):
+        """Test the module-level handle resolves collections on first use"""
+        collection = database.db.projects
+        self.assertEqual(collection.name, 'projects')
+        self.assertEqual(database.db['messages'].name, 'messages')
+
+if __name__ == '__main__':
+    unittest.main()
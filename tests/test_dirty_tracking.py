@@ -0,0 +1,103 @@
+import unittest
+import os
+import sys
+from datetime import datetime
+from unittest import mock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.api.models.user import User
+from app.api.models.project import Project
+
+class DirtyTrackingTestCase(unittest.TestCase):
+    """Test case for building targeted updates from tracked changes"""
+
+    def setUp(self):
+        """Set up loaded documents"""
+        self.user = User.from_dict({
+            "_id": "5f1d7f3e9d1e8a0b2c3d4e5f",
+            "username": "tracked",
+            "email": "tracked@example.com",
+            "password_hash": "hash",
+            "favorites": {"users": ["a"], "projects": []}
+        })
+        self.project = Project.from_dict({
+            "_id": "5f1d7f3e9d1e8a0b2c3d4e60",
+            "user_id": "5f1d7f3e9d1e8a0b2c3d4e5f",
+            "title": "Tracked",
+            "description": "Tracked project",
+            "images": ["/projects/a.png"],
+            "favorites_count": 1,
+            "created_at": datetime(2025, 1, 1),
+            "updated_at": datetime(2025, 1, 1)
+        })
+
+    def test_loaded_document_is_clean(self):
+        """Test hydration does not mark fields dirty"""
+        self.assertEqual(self.user.get_changes(), {})
+        self.assertEqual(self.project.get_changes(), {})
+
+    def test_assignment_sets_only_that_field(self):
+        """Test assigning an attribute produces a single $set"""
+        self.user.email_verified = True
+        self.assertEqual(self.user.get_changes(), {"$set": {"email_verified": True}})
+
+    def test_toggle_favorite(self):
+        """Test favorites are toggled with updates conditioned on the stored list, not queued"""
+        collection = mock.Mock()
+        collection.update_one.side_effect = [mock.Mock(modified_count=1)]
+        with mock.patch.object(User, "get_collection", return_value=collection):
+            self.assertTrue(self.user.toggle_favorite("projects", "p1"))
+        query, update = collection.update_one.call_args[0]
+        self.assertEqual(query["favorites.projects"], {"$ne": "p1"})
+        self.assertEqual(update["$addToSet"], {"favorites.projects": "p1"})
+        self.assertEqual(self.user.get_changes(), {})
+        self.assertEqual(self.user.favorites["projects"], ["p1"])
+
+        # Already favorited in the database, whatever this copy says
+        collection.update_one.side_effect = [mock.Mock(modified_count=0), mock.Mock(modified_count=1)]
+        with mock.patch.object(User, "get_collection", return_value=collection):
+            self.assertFalse(self.user.toggle_favorite("projects", "p2"))
+        query, update = collection.update_one.call_args[0]
+        self.assertEqual(query["favorites.projects"], "p2")
+        self.assertEqual(update["$pull"], {"favorites.projects": "p2"})
+        self.assertEqual(self.user.favorites["projects"], ["p1"])
+
+    def test_update_settings(self):
+        """Test settings updates only touch the changed keys"""
+        self.user.update_settings("privacy", {"show_email": True})
+        self.assertEqual(self.user.get_changes(), {"$set": {"settings.privacy.show_email": True}})
+        self.assertTrue(self.user.settings["privacy"]["show_email"])
+
+    def test_increment(self):
+        """Test counters use $inc and accumulate"""
+        self.project.inc("favorites_count", 1)
+        self.project.inc("favorites_count", 1)
+        self.assertEqual(self.project.get_changes(), {"$inc": {"favorites_count": 2}})
+        self.assertEqual(self.project.favorites_count, 3)
+
+    def test_conflicting_operators_fall_back_to_set(self):
+        """Test operators on the same path collapse into one $set of local state"""
+        self.project.add_image("/projects/b.png")
+        self.project.remove_image(0)
+        self.assertEqual(self.project.get_changes(), {"$set": {"images": ["/projects/b.png"]}})
+
+        self.user.add_to_set("favorites.projects", "p1")
+        self.user.pull("favorites.projects", "p1")
+        changes = self.user.get_changes()
+        self.assertEqual(changes["$set"]["favorites"], {"users": ["a"], "projects": []})
+
+    def test_set_replaces_nested_changes(self):
+        """Test assigning a whole field replaces pending nested updates"""
+        self.user.update_settings("theme", {"mode": "dark"})
+        self.user.settings = {"theme": {"mode": "light"}}
+        self.assertEqual(self.user.get_changes(), {"$set": {"settings": {"theme": {"mode": "light"}}}})
+
+    def test_new_document_is_not_tracked(self):
+        """Test objects that were never saved are inserted whole"""
+        project = Project(user_id="u", title="New", description="New project")
+        project.add_image("/projects/new.png")
+        self.assertFalse(project._is_tracking())
+        self.assertEqual(project.images, ["/projects/new.png"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import gzip
+import os
+import sys
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import jsonify
+from app import create_app
+from app.api.utils import http_cache
+
+class HTTPCacheTestCase(unittest.TestCase):
+    """Test case for conditional GET helpers and response compression"""
+
+    def setUp(self):
+        """Set up an app with a cacheable and a large route"""
+        self.app = create_app(test_config={"testing": True})
+        self.updated_at = datetime(2025, 1, 2, 3, 4, 5)
+        self.calls = []
+
+        @self.app.route('/cached')
+        def cached():
+            etag = http_cache.make_etag("doc", self.updated_at)
+            not_modified = http_cache.not_modified(etag, self.updated_at)
+            if not_modified:
+                return not_modified
+            self.calls.append(1)
+            return http_cache.cacheable(jsonify({"status": True}), etag, self.updated_at), 200
+
+        @self.app.route('/large')
+        def large():
+            return jsonify({"items": ["item"] * 1000}), 200
+
+        self.client = self.app.test_client()
+
+    def test_make_etag(self):
+        """Test ETags are stable and change with any part"""
+        self.assertEqual(http_cache.make_etag("a", 1), http_cache.make_etag("a", 1))
+        self.assertNotEqual(http_cache.make_etag("a", 1), http_cache.make_etag("a", 2))
+        self.assertNotEqual(http_cache.make_etag("ab", "c"), http_cache.make_etag("a", "bc"))
+
+    def test_if_none_match(self):
+        """Test a matching ETag returns 304 without building the body"""
+        res = self.client.get('/cached')
+        self.assertTrue(res.headers['ETag'].startswith('W/"'))
+        self.assertEqual(res.headers['Cache-Control'], http_cache.CACHE_CONTROL)
+
+        res = self.client.get('/cached', headers={"If-None-Match": res.headers['ETag']})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(self.calls, [1])
+
+        self.updated_at = datetime(2025, 1, 3)
+        res = self.client.get('/cached', headers={"If-None-Match": res.headers['ETag']})
+        self.assertEqual(res.status_code, 200)
+
+    def test_if_modified_since(self):
+        """Test Last-Modified is honoured when no ETag is sent"""
+        res = self.client.get('/cached')
+        res = self.client.get('/cached', headers={"If-Modified-Since": res.headers['Last-Modified']})
+        self.assertEqual(res.status_code, 304)
+
+    def test_large_json_is_gzipped(self):
+        """Test large JSON is compressed for clients accepting gzip"""
+        res = self.client.get('/large', headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res.headers['Vary'])
+        self.assertEqual(len(gzip.decompress(res.data)), len(self.client.get('/large').data))
+
+    def test_small_or_unaccepted_json_is_not_compressed(self):
+        """Test small responses and clients without gzip get plain JSON"""
+        self.assertNotIn('Content-Encoding', self.client.get('/cached', headers={"Accept-Encoding": "gzip"}).headers)
+        self.assertNotIn('Content-Encoding', self.client.get('/large').headers)
+        self.assertNotIn('Content-Encoding', self.client.get('/large', headers={"Accept-Encoding": "gzip;q=0"}).headers)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.api.models import identity_map
+from app.api.models.user import User
+
+class IdentityMapTestCase(unittest.TestCase):
+    """Test case for the request-scoped identity map"""
+
+    def setUp(self):
+        """Set up an app and a loaded user"""
+        self.app = create_app(test_config={"testing": True})
+        self.user = User.from_dict({
+            "_id": "5f1d7f3e9d1e8a0b2c3d4e5f",
+            "username": "mapped",
+            "email": "mapped@example.com"
+        })
+
+    def test_find_by_id_uses_identity_map(self):
+        """Test a user loaded earlier in the request is returned without a query"""
+        with self.app.test_request_context():
+            User._track(self.user)
+            self.assertIs(User.find_by_id(self.user._id), self.user)
+
+    def test_same_instance_per_identity(self):
+        """Test the first loaded instance wins"""
+        with self.app.test_request_context():
+            first = identity_map.add(User.collection_name, self.user._id, self.user)
+            other = User.from_dict({"_id": self.user._id, "username": "mapped"})
+            second = identity_map.add(User.collection_name, self.user._id, other)
+            self.assertIs(first, self.user)
+            self.assertIs(second, self.user)
+
+    def test_discard(self):
+        """Test forgetting an object removes it from the map"""
+        with self.app.test_request_context():
+            User._track(self.user)
+            self.user._forget()
+            self.assertIsNone(identity_map.get(User.collection_name, self.user._id))
+
+    def test_map_is_request_scoped(self):
+        """Test objects do not leak between requests or outside them"""
+        with self.app.test_request_context():
+            User._track(self.user)
+
+        with self.app.test_request_context():
+            self.assertIsNone(identity_map.get(User.collection_name, self.user._id))
+
+        self.assertIsNone(identity_map.get(User.collection_name, self.user._id))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest import mock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image, ImageCms
+from app.api.services.image_service import VARIANT_SIZES, render_variants, variant_format
+
+class RenderVariantsTestCase(unittest.TestCase):
+    """Test case for generating image variants"""
+
+    def setUp(self):
+        """Set up a large photo with EXIF orientation and GPS metadata"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.source = os.path.join(self.tmp.name, "photo.jpg")
+
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        exif[0x8825] = {1: "N"}  # GPS info
+        Image.new("RGB", (2400, 1200), (200, 10, 10)).save(self.source, "JPEG", exif=exif)
+
+    def _render(self, image_format="webp"):
+        return render_variants(self.source, os.path.join(self.tmp.name, "photo"), image_format=image_format)
+
+    def test_sizes_and_orientation(self):
+        """Test every variant fits its box and the EXIF rotation is applied"""
+        paths = self._render()
+        self.assertEqual(set(paths), set(VARIANT_SIZES))
+        for name, path in paths.items():
+            with Image.open(path) as image:
+                self.assertEqual(max(image.size), VARIANT_SIZES[name])
+                # Portrait after applying the orientation
+                self.assertGreater(image.height, image.width)
+
+    def test_metadata_is_stripped(self):
+        """Test the variants carry no EXIF data"""
+        for path in self._render().values():
+            with Image.open(path) as image:
+                self.assertEqual(len(image.getexif()), 0)
+                self.assertNotIn("exif", image.info)
+
+    def test_jpeg_variants(self):
+        """Test JPEG variants flatten transparent images"""
+        Image.new("RGBA", (100, 100), (0, 0, 0, 0)).save(self.source, "PNG")
+        paths = self._render(image_format="jpeg")
+        self.assertEqual(variant_format("jpeg"), ("JPEG", "jpg"))
+        with Image.open(paths["thumb"]) as image:
+            self.assertEqual(image.mode, "RGB")
+            self.assertEqual(image.getpixel((0, 0)), (255, 255, 255))
+            # Small images are not upscaled
+            self.assertEqual(image.size, (100, 100))
+
+    def test_icc_profile_converted_to_srgb(self):
+        """Test colors are converted from the embedded ICC profile before it is dropped"""
+        profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+        Image.new("RGB", (100, 100), (200, 10, 10)).save(self.source, "PNG", icc_profile=profile)
+        with mock.patch.object(ImageCms, "profileToProfile", wraps=ImageCms.profileToProfile) as convert:
+            paths = self._render(image_format="jpeg")
+        convert.assert_called_once()
+        with Image.open(paths["thumb"]) as image:
+            self.assertNotIn("icc_profile", image.info)
+            for channel, expected in zip(image.getpixel((50, 50)), (200, 10, 10)):
+                self.assertAlmostEqual(channel, expected, delta=3)
+
+    def test_unsupported_icc_profile(self):
+        """Test an ICC profile that cannot be converted leaves the pixels unchanged"""
+        profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("LAB")).tobytes()
+        Image.new("RGB", (100, 100), (200, 10, 10)).save(self.source, "PNG", icc_profile=profile)
+        with self.assertLogs("app.api.services.image_service", level="WARNING"):
+            paths = self._render(image_format="jpeg")
+        with Image.open(paths["thumb"]) as image:
+            for channel, expected in zip(image.getpixel((50, 50)), (200, 10, 10)):
+                self.assertAlmostEqual(channel, expected, delta=3)
+
+if __name__ == '__main__':
+    unittest.main()
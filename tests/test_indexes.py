@@ -0,0 +1,87 @@
+import unittest
+import os
+import sys
+from unittest import mock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.api.models.base import load_models
+from app.config.indexes import explain_model_queries, get_winning_plan_stages
+
+class IndexRegistryTestCase(unittest.TestCase):
+    """Test case for the model index registry"""
+
+    def test_models_declare_collections(self):
+        """Test every model declares its collection and indexes"""
+        models = {model.__name__: model for model in load_models()}
+        for name in ["User", "Project", "Message", "VerificationCode"]:
+            self.assertIn(name, models)
+            self.assertTrue(models[name].collection_name)
+            self.assertTrue(models[name].indexes)
+
+    def test_user_indexes_target_queried_collection(self):
+        """Test user lookup indexes are built on the collection the model queries"""
+        models = {model.__name__: model for model in load_models()}
+        user = models["User"]
+        index_keys = [list(index.document["key"]) for index in user.indexes]
+        self.assertEqual(user.collection_name, "sports_figures_data_combined")
+        for field in ["email", "username", "phone"]:
+            self.assertIn([field], index_keys)
+
+    def test_winning_plan_collscan(self):
+        """Test a collection scan is found in a classic explain plan"""
+        explain_output = {
+            "queryPlanner": {
+                "winningPlan": {
+                    "stage": "SORT",
+                    "inputStage": {"stage": "COLLSCAN"}
+                }
+            }
+        }
+        self.assertEqual(get_winning_plan_stages(explain_output), ["SORT", "COLLSCAN"])
+
+    def test_winning_plan_index_scan(self):
+        """Test index scans are found in slot based and $or plans"""
+        explain_output = {
+            "queryPlanner": {
+                "winningPlan": {
+                    "queryPlan": {
+                        "stage": "FETCH",
+                        "inputStage": {
+                            "stage": "OR",
+                            "inputStages": [
+                                {"stage": "IXSCAN"},
+                                {"stage": "IXSCAN"}
+                            ]
+                        }
+                    }
+                }
+            }
+        }
+        stages = get_winning_plan_stages(explain_output)
+        self.assertNotIn("COLLSCAN", stages)
+        self.assertEqual(stages.count("IXSCAN"), 2)
+
+    def test_explain_flags_blocking_sort(self):
+        """Test queries sorted in memory are flagged, and merged index scans are not"""
+        plans = {
+            "blocking": {"stage": "FETCH", "inputStage": {"stage": "SORT", "inputStage": {"stage": "IXSCAN"}}},
+            "merged": {"stage": "FETCH", "inputStage": {"stage": "SORT_MERGE", "inputStages": [
+                {"stage": "IXSCAN"}, {"stage": "IXSCAN"}
+            ]}},
+        }
+        collection = mock.Mock()
+        collection.find.side_effect = lambda query_filter: mock.Mock(**{
+            "sort.return_value.explain.return_value": {"queryPlanner": {"winningPlan": plans[query_filter["plan"]]}}
+        })
+        model = mock.Mock(__name__="Fake", collection_name="fakes", query_shapes={
+            name: ({"plan": name}, [("created_at", -1)]) for name in plans
+        })
+        model.get_collection.return_value = collection
+
+        reports = {report["query"]: report for report in explain_model_queries([model])}
+        self.assertTrue(reports["blocking"]["blocking_sort"])
+        self.assertFalse(reports["merged"]["blocking_sort"])
+        self.assertFalse(reports["merged"]["collscan"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import os
+import sys
+from datetime import date, datetime, timezone
+from unittest import mock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bson import ObjectId
+from flask import jsonify, request
+from app import create_app
+from app.api.utils import json_provider
+
+class JSONProviderTestCase(unittest.TestCase):
+    """Test case for the orjson-backed JSON provider"""
+
+    def setUp(self):
+        """Set up an app using the provider"""
+        self.app = create_app(test_config={"testing": True})
+        self.object_id = ObjectId()
+        self.payload = {
+            "id": self.object_id,
+            "created_at": datetime(2025, 1, 2, 3, 4, 5),
+            "updated_at": datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            "day": date(2025, 1, 2),
+            "tags": {"a"},
+            "histogram": {1: 2}
+        }
+        self.expected = {
+            "id": str(self.object_id),
+            "created_at": "2025-01-02T03:04:05+00:00",
+            "updated_at": "2025-01-02T03:04:05+00:00",
+            "day": "2025-01-02",
+            "tags": ["a"],
+            "histogram": {"1": 2}
+        }
+
+    def _jsonify(self):
+        with self.app.test_request_context():
+            response = jsonify(self.payload)
+            return response.mimetype, self.app.json.loads(response.get_data())
+
+    def test_native_types(self):
+        """Test datetimes, ObjectIds and sets are serialized"""
+        self.assertIsInstance(self.app.json, json_provider.FastJSONProvider)
+        self.assertEqual(self._jsonify(), ("application/json", self.expected))
+
+    def test_stdlib_fallback_matches(self):
+        """Test the output without orjson is the same"""
+        with mock.patch.object(json_provider, "orjson", None):
+            self.assertEqual(self._jsonify(), ("application/json", self.expected))
+
+    def test_request_body_is_parsed(self):
+        """Test request.get_json goes through the provider"""
+        @self.app.route('/echo', methods=['POST'])
+        def echo():
+            return jsonify(request.get_json())
+
+        res = self.app.test_client().post('/echo', json={"a": [1, 2]})
+        self.assertEqual(res.get_json(), {"a": [1, 2]})
+
+if __name__ == '__main__':
+    unittest.main()
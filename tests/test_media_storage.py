@@ -0,0 +1,189 @@
+import unittest
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from werkzeug.datastructures import FileStorage
+from app.api.models.media_file import MediaFile
+from app.api.services import media_storage, static_files
+from app.config.database import db
+from tests import BaseTestCase
+
+class MediaStorageTestCase(BaseTestCase):
+    """Test case for content-addressed upload storage"""
+
+    def setUp(self):
+        """Set up a temporary upload folder"""
+        super().setUp()
+        upload_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(upload_folder.cleanup)
+        self.upload_folder = upload_folder.name
+        original_folder = self.app.config['UPLOAD_FOLDER']
+        self.app.config['UPLOAD_FOLDER'] = self.upload_folder
+        self.addCleanup(self.app.config.__setitem__, 'UPLOAD_FOLDER', original_folder)
+        # The media route was set up with the app's upload folder
+        uploads = self.app.extensions["static_files"]["uploads"]
+        self.addCleanup(setattr, uploads, "root", uploads.root)
+        uploads.root = self.upload_folder
+        db.media_files.delete_many({})
+
+    def _upload(self, data, filename="photo.png"):
+        return FileStorage(stream=io.BytesIO(data), filename=filename, content_type="image/png")
+
+    def _path(self, url):
+        return os.path.join(self.upload_folder, url.lstrip('/'))
+
+    def test_identical_uploads_are_stored_once(self):
+        """Test the same content is kept once and deleted with its last reference"""
+        data = b"image data " * 10000
+        first = media_storage.store_upload(self._upload(data))
+        second = media_storage.store_upload(self._upload(data, filename="copy.png"))
+
+        self.assertEqual(first.url, second.url)
+        self.assertEqual(first.size, len(data))
+        self.assertTrue(first.url.startswith(f"/media/{first.digest[:2]}/{first.digest}"))
+        self.assertEqual(MediaFile.get(first.digest)["refs"], 2)
+        with open(self._path(first.url), "rb") as f:
+            self.assertEqual(f.read(), data)
+        # Nothing is left behind in the temporary directory
+        self.assertEqual(os.listdir(os.path.join(self.upload_folder, "tmp")), [])
+
+        self.assertFalse(media_storage.release(first.url))
+        self.assertTrue(os.path.exists(self._path(first.url)))
+        self.assertTrue(media_storage.release(second.url))
+        self.assertFalse(os.path.exists(self._path(first.url)))
+        self.assertIsNone(MediaFile.get(first.digest))
+
+    def test_upload_during_release(self):
+        """Test content uploaded again while its files are being deleted waits and is stored again"""
+        data = b"released and uploaded again"
+        stored = media_storage.store_upload(self._upload(data))
+        claim = MediaFile.claim_unreferenced
+        uploads = []
+        threads = []
+
+        def upload():
+            with self.app.app_context():
+                uploads.append(media_storage.store_upload(self._upload(data)))
+
+        def claim_then_upload(digest):
+            media = claim(digest)
+            # Another request uploads the same bytes between the claim and the unlink
+            thread = threading.Thread(target=upload)
+            thread.start()
+            time.sleep(0.2)
+            self.assertTrue(thread.is_alive())
+            threads.append(thread)
+            return media
+
+        with mock.patch.object(MediaFile, "claim_unreferenced", side_effect=claim_then_upload):
+            self.assertTrue(media_storage.release(stored.url))
+        threads[0].join(5)
+
+        self.assertEqual(uploads[0].url, stored.url)
+        self.assertEqual(MediaFile.get(stored.digest)["refs"], 1)
+        with open(self._path(stored.url), "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_release_then_upload(self):
+        """Test uploads racing the last release keep a complete file"""
+        data = b"uploaded around a release"
+        stored = media_storage.store_upload(self._upload(data))
+        path = self._path(stored.url)
+
+        # Uploaded after the reference count reached 0, before the record was claimed
+        release = MediaFile.release
+        def release_then_upload(digest):
+            refs = release(digest)
+            media_storage.store_upload(self._upload(data))
+            return refs
+
+        with mock.patch.object(MediaFile, "release", side_effect=release_then_upload):
+            self.assertFalse(media_storage.release(stored.url))
+        self.assertEqual(MediaFile.get(stored.digest)["refs"], 1)
+        self.assertTrue(os.path.exists(path))
+
+        # A new record does not trust a file left over from a deletion
+        self.assertTrue(media_storage.release(stored.url))
+        with open(path, "wb") as f:
+            f.write(b"left over")
+        media_storage.store_upload(self._upload(data))
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_size_limit(self):
+        """Test uploads larger than the limit are rejected without keeping any data"""
+        with self.assertRaises(media_storage.UploadTooLarge):
+            media_storage.store_upload(self._upload(b"x" * 2048), max_size=1024)
+        self.assertEqual(os.listdir(os.path.join(self.upload_folder, "tmp")), [])
+        self.assertEqual(db.media_files.count_documents({}), 0)
+
+    def test_invalid_extension(self):
+        """Test uploads with a disallowed extension are rejected"""
+        with self.assertRaises(media_storage.UploadError):
+            media_storage.store_upload(self._upload(b"data", filename="script.exe"), {"png", "jpg"})
+
+    def test_variants_are_shared(self):
+        """Test content processed before comes back with its variants, which are deleted with it"""
+        stored = media_storage.store_upload(self._upload(b"processed"))
+        variant_url = stored.url.replace(".png", "_thumb.webp")
+        with open(self._path(variant_url), "wb") as f:
+            f.write(b"thumb")
+        MediaFile.set_variants(stored.digest, {"thumb": variant_url})
+
+        again = media_storage.store_upload(self._upload(b"processed"))
+        self.assertEqual(again.variants, {"thumb": variant_url})
+        self.assertEqual(media_storage.digest_from_url(variant_url), stored.digest)
+
+        media_storage.release_all([stored.url, variant_url])
+        self.assertFalse(os.path.exists(self._path(variant_url)))
+
+    def test_legacy_urls_are_kept(self):
+        """Test files stored before content addressing are not deleted"""
+        self.assertIsNone(media_storage.digest_from_url("/profiles/abc_photo.png"))
+        self.assertFalse(media_storage.release("/profiles/abc_photo.png"))
+
+    def test_serve_media(self):
+        """Test stored files are served as immutable with a strong ETag, ranges and revalidation"""
+        data = bytes(range(256)) * 100
+        stored = media_storage.store_upload(self._upload(data))
+
+        res = self.client().get(stored.url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data, data)
+        self.assertEqual(res.mimetype, "image/png")
+        self.assertEqual(res.headers['Cache-Control'], static_files.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(res.headers['ETag'], f'"{stored.digest}"')
+        self.assertEqual(res.headers['Accept-Ranges'], 'bytes')
+
+        res = self.client().get(stored.url, headers={"If-None-Match": f'"{stored.digest}"'})
+        self.assertEqual(res.status_code, 304)
+
+        res = self.client().get(stored.url, headers={"Range": "bytes=100-199", "If-Range": f'"{stored.digest}"'})
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(res.data, data[100:200])
+        self.assertEqual(res.headers['Content-Range'], f"bytes 100-199/{len(data)}")
+
+        # Deleted files are gone even though their metadata was cached
+        media_storage.release(stored.url)
+        self.assertEqual(self.client().get(stored.url).status_code, 404)
+
+    def test_serve_legacy_upload(self):
+        """Test uploads stored before content addressing are served at their old URLs"""
+        os.makedirs(os.path.join(self.upload_folder, "profiles"))
+        with open(os.path.join(self.upload_folder, "profiles", "abc_photo.png"), "wb") as f:
+            f.write(b"legacy")
+
+        res = self.client().get('/profiles/abc_photo.png')
+        self.assertEqual(res.data, b"legacy")
+        self.assertEqual(res.headers['Cache-Control'], static_files.REVALIDATE_CACHE_CONTROL)
+        self.assertEqual(self.client().get('/projects/missing.png').status_code, 404)
+        self.assertEqual(self.client().get('/media/..%2Fprofiles/abc_photo.png').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,8 +5,13 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import random
 import string
+from datetime import timedelta
+from unittest import mock
 from app import create_app
 from app.config.database import db
+from app.api.models.conversation import Conversation
+from app.api.models.message import Message
+from app.api.models.unread_counter import UnreadCounter
 from tests import BaseTestCase
 
 class MessageTestCase(BaseTestCase):
@@ -197,6 +202,43 @@ class MessageTestCase(BaseTestCase):
         
         self.assertTrue(found_conversation, "Conversation not found in recipient's list")
     
+    def test_conversation_shows_latest_message(self):
+        """Test the conversation list shows the most recent message"""
+        for content in [self.message_content, "Latest reply"]:
+            self.client().post(
+                f'/api/message/send/{self.user2_id}',
+                headers={"Authorization": f"Bearer {self.user1_token}"},
+                json={"content": content}
+            )
+        
+        res = self.client().get(
+            '/api/message/conversations',
+            headers={"Authorization": f"Bearer {self.user2_token}"}
+        )
+        self.assertEqual(res.status_code, 200)
+        result = json.loads(res.data)
+        
+        conversation = next(conv for conv in result['conversations']
+                            if conv['other_user']['id'] == self.user1_id)
+        self.assertEqual(conversation['latest_message']['content'], "Latest reply")
+        self.assertEqual(conversation['other_user']['username'], self.user1['username'])
+        self.assertEqual(conversation['unread_count'], 2)
+
+        # Reading the conversation resets its unread count
+        self.client().get(
+            f"/api/message/conversations/{conversation['conversation_id']}",
+            headers={"Authorization": f"Bearer {self.user2_token}"}
+        )
+        res = self.client().get(
+            '/api/message/conversations',
+            headers={"Authorization": f"Bearer {self.user2_token}"}
+        )
+        result = json.loads(res.data)
+        conversation = next(conv for conv in result['conversations']
+                            if conv['other_user']['id'] == self.user1_id)
+        self.assertEqual(conversation['unread_count'], 0)
+        self.assertTrue(conversation['latest_message']['is_read'])
+
     def test_get_conversation_messages(self):
         """Test getting messages for a specific conversation"""
         # First send some messages to create a conversation with multiple messages
@@ -241,6 +283,35 @@ class MessageTestCase(BaseTestCase):
         self.assertEqual(result['other_user']['id'], self.user2_id)
         self.assertEqual(result['other_user']['username'], self.user2['username'])
     
+    def test_conversation_messages_not_modified(self):
+        """Test a repeat read returns 304 until a new message arrives"""
+        send_res = self.client().post(
+            f'/api/message/send/{self.user2_id}',
+            headers={"Authorization": f"Bearer {self.user1_token}"},
+            json={"content": self.message_content}
+        )
+        conversation_id = json.loads(send_res.data)['conversation_id']
+        url = f'/api/message/conversations/{conversation_id}'
+        headers = {"Authorization": f"Bearer {self.user2_token}"}
+        
+        # The first read marks the message as read, so the second one changes
+        first = self.client().get(url, headers=headers)
+        second = self.client().get(url, headers=dict(headers, **{"If-None-Match": first.headers['ETag']}))
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(json.loads(second.data)['messages'][0]['is_read'])
+        
+        third = self.client().get(url, headers=dict(headers, **{"If-None-Match": second.headers['ETag']}))
+        self.assertEqual(third.status_code, 304)
+        
+        self.client().post(
+            f'/api/message/send/{self.user2_id}',
+            headers={"Authorization": f"Bearer {self.user1_token}"},
+            json={"content": "Another message"}
+        )
+        fourth = self.client().get(url, headers=dict(headers, **{"If-None-Match": second.headers['ETag']}))
+        self.assertEqual(fourth.status_code, 200)
+        self.assertEqual(len(json.loads(fourth.data)['messages']), 2)
+    
     def test_mark_message_as_read(self):
         """Test marking a message as read"""
         # First send a message
@@ -343,7 +414,91 @@ class MessageTestCase(BaseTestCase):
         result = json.loads(res.data)
         self.assertTrue(result['status'])
         self.assertGreaterEqual(result['unread_count'], 1)
-    
+
+    def test_unread_count_after_marking_read_twice(self):
+        """Test marking the same message read twice only decrements the counter once"""
+        message_ids = []
+        for content in [self.message_content, "Second test message"]:
+            send_res = self.client().post(
+                f'/api/message/send/{self.user2_id}',
+                headers={"Authorization": f"Bearer {self.user1_token}"},
+                json={"content": content}
+            )
+            message_ids.append(json.loads(send_res.data)['message_id'])
+
+        for _ in range(2):
+            self.client().post(
+                f'/api/message/mark-read/{message_ids[0]}',
+                headers={"Authorization": f"Bearer {self.user2_token}"}
+            )
+
+        res = self.client().get(
+            '/api/message/unread/count',
+            headers={"Authorization": f"Bearer {self.user2_token}"}
+        )
+        self.assertEqual(json.loads(res.data)['unread_count'], 1)
+
+    def test_messages_recorded_out_of_order(self):
+        """Test an older message saved last does not replace the latest message"""
+        conversation_id = Message.generate_conversation_id(self.user1_id, self.user2_id)
+        older = Message(self.user1_id, self.user2_id, conversation_id, self.message_content)
+        newer = Message(self.user1_id, self.user2_id, conversation_id, "Second test message")
+        older._id, newer._id = "older", "newer"
+        older.created_at = newer.created_at - timedelta(seconds=1)
+
+        with self.app.app_context():
+            Conversation.record_message(newer)
+            Conversation.record_message(older)
+            conversation = Conversation.find_by_id(conversation_id)
+        self.assertEqual(conversation.last_message["id"], "newer")
+        self.assertEqual(conversation.unread_count_for(self.user2_id), 2)
+
+    def test_reconcile_unread_counts(self):
+        """Test the reconciler corrects a drifted counter"""
+        self.client().post(
+            f'/api/message/send/{self.user2_id}',
+            headers={"Authorization": f"Bearer {self.user1_token}"},
+            json={"content": self.message_content}
+        )
+        db.unread_counters.update_one({"_id": self.user2_id}, {"$set": {"count": 42}})
+
+        with self.app.app_context():
+            users, _ = Message.reconcile_unread_counts()
+        self.assertGreaterEqual(users, 1)
+
+        res = self.client().get(
+            '/api/message/unread/count',
+            headers={"Authorization": f"Bearer {self.user2_token}"}
+        )
+        self.assertEqual(json.loads(res.data)['unread_count'], 1)
+
+    def test_reconcile_keeps_concurrent_messages(self):
+        """Test a message sent while the reconciler counts is not overwritten by the stale count"""
+        headers = {"Authorization": f"Bearer {self.user1_token}"}
+        self.client().post(f'/api/message/send/{self.user2_id}', headers=headers, json={"content": self.message_content})
+        conversation_id = Message.generate_conversation_id(self.user1_id, self.user2_id)
+        db.unread_counters.update_one({"_id": self.user2_id}, {"$set": {"count": 42}})
+        db.conversations.update_one({"_id": conversation_id}, {"$set": {f"unread_counts.{self.user2_id}": 5}})
+        
+        count_unread_by_conversation = Message.count_unread_by_conversation
+        def count_then_send():
+            counts = count_unread_by_conversation()
+            self.client().post(f'/api/message/send/{self.user2_id}', headers=headers,
+                               json={"content": "Second test message"})
+            return counts
+        
+        with self.app.app_context(), mock.patch.object(Message, "count_unread_by_conversation", side_effect=count_then_send):
+            Message.reconcile_unread_counts()
+        
+        # Drifted, but moved during the count: left for the next run
+        with self.app.app_context():
+            self.assertEqual(Conversation.find_by_id(conversation_id).unread_count_for(self.user2_id), 6)
+            self.assertEqual(UnreadCounter.get_count(self.user2_id), 43)
+            
+            Message.reconcile_unread_counts()
+            self.assertEqual(Conversation.find_by_id(conversation_id).unread_count_for(self.user2_id), 2)
+            self.assertEqual(UnreadCounter.get_count(self.user2_id), 2)
+
     def tearDown(self):
         """Clean up after each test"""
         with self.app.app_context():
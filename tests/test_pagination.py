@@ -0,0 +1,42 @@
+import unittest
+import os
+import sys
+from datetime import datetime, timezone
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bson import ObjectId
+from app.api.utils.pagination import encode_cursor, decode_cursor, keyset_filter
+
+class PaginationTestCase(unittest.TestCase):
+    """Test case for keyset pagination cursors"""
+
+    def test_cursor_round_trip(self):
+        """Test a cursor decodes to the position it was built from"""
+        object_id = ObjectId()
+        created_at = datetime(2025, 5, 1, 12, 30, 15, 123000)
+        created_at_decoded, object_id_decoded = decode_cursor(encode_cursor(created_at, str(object_id)))
+
+        self.assertEqual(created_at_decoded, created_at.replace(tzinfo=timezone.utc))
+        self.assertEqual(object_id_decoded, object_id)
+
+    def test_aware_and_naive_datetimes_match(self):
+        """Test naive datetimes from MongoDB are treated as UTC"""
+        object_id = str(ObjectId())
+        naive = datetime(2025, 5, 1, 12, 0, 0)
+        aware = naive.replace(tzinfo=timezone.utc)
+        self.assertEqual(encode_cursor(naive, object_id), encode_cursor(aware, object_id))
+
+    def test_invalid_cursor(self):
+        """Test malformed cursors raise ValueError"""
+        for token in ["not-a-cursor", "", encode_cursor(datetime(2025, 1, 1), "abc")]:
+            with self.assertRaises(ValueError):
+                decode_cursor(token)
+
+    def test_keyset_filter_direction(self):
+        """Test the filter continues after the cursor in both directions"""
+        cursor = encode_cursor(datetime(2025, 1, 1), str(ObjectId()))
+        self.assertIn("$lt", keyset_filter(cursor, descending=True)["$or"][0]["created_at"])
+        self.assertIn("$gt", keyset_filter(cursor, descending=False)["$or"][0]["created_at"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+import unittest
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from unittest import mock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.api.services import password_hasher
+from app.api.services.password_hasher import PasswordHasher, PasswordHasherBusy, get_rounds
+from app.config.database import db
+from tests import BaseTestCase
+
+try:
+    from waitress.server import create_server
+except ImportError:
+    create_server = None
+
+class PasswordHasherTestCase(unittest.TestCase):
+    """Test case for the bounded bcrypt pool"""
+
+    def setUp(self):
+        """Set up a cheap hasher"""
+        self.hasher = PasswordHasher(rounds=4, pool_size=1, max_queue=0)
+
+    def tearDown(self):
+        self.hasher.shutdown()
+
+    def test_hash_and_check(self):
+        """Test a hashed password checks and a wrong one does not"""
+        password_hash = self.hasher.hash("Password123")
+        self.assertEqual(get_rounds(password_hash), 4)
+        self.assertTrue(self.hasher.check("Password123", password_hash))
+        self.assertFalse(self.hasher.check("wrong", password_hash))
+        self.assertFalse(self.hasher.check("Password123", None))
+        self.assertFalse(self.hasher.check("Password123", "not-a-hash"))
+
+    def test_needs_rehash(self):
+        """Test hashes made with another cost are flagged"""
+        old_hash = PasswordHasher(rounds=5).hash("Password123")
+        self.assertTrue(self.hasher.needs_rehash(old_hash))
+        self.assertFalse(self.hasher.needs_rehash(self.hasher.hash("Password123")))
+
+    def test_rejects_when_saturated(self):
+        """Test a full pool fails fast instead of queueing"""
+        started = threading.Event()
+        release = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=self.hasher._run, args=(block,))
+        worker.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(PasswordHasherBusy):
+                self.hasher.hash("Password123")
+        finally:
+            release.set()
+            worker.join()
+
+        # Capacity is released once the job finishes
+        self.assertTrue(self.hasher.hash("Password123"))
+
+    def test_admission_below_server_threads(self):
+        """Test the pool and queue must leave request threads free"""
+        with self.assertRaises(ValueError):
+            PasswordHasher(pool_size=2, max_queue=2, server_threads=4)
+        self.assertEqual(PasswordHasher(pool_size=2, max_queue=1, server_threads=4).max_queue, 1)
+
+        # The queue is derived from the thread count when not configured
+        settings = {"SERVER_THREADS": "3", "BCRYPT_POOL_SIZE": "2"}
+        self.assertEqual(password_hasher._from_settings(settings.get).max_queue, 0)
+
+        # Settings that would take every thread are lowered with a warning
+        settings["BCRYPT_MAX_QUEUE"] = "1"
+        with self.assertLogs("app.api.services.password_hasher", level="WARNING"):
+            hasher = password_hasher._from_settings(settings.get)
+        self.assertEqual((hasher.pool_size, hasher.max_queue), (2, 0))
+        with self.assertLogs("app.api.services.password_hasher", level="WARNING"):
+            hasher = password_hasher._from_settings({"SERVER_THREADS": "2"}.get)
+        self.assertEqual((hasher.pool_size, hasher.max_queue), (1, 0))
+
+    def test_small_thread_count_starts(self):
+        """Test the app starts with the default pool and only two server threads"""
+        with mock.patch.dict(os.environ, {"SERVER_THREADS": "2"}), \
+                self.assertLogs("app.api.services.password_hasher", level="WARNING"):
+            app = create_app(test_config={"testing": True})
+        self.assertEqual(app.extensions["password_hasher"].pool_size, 1)
+
+    def test_busy_returns_503(self):
+        """Test a saturated pool is reported as 503 with Retry-After"""
+        app = create_app(test_config={"testing": True})
+
+        def busy():
+            raise PasswordHasherBusy()
+        app.add_url_rule('/busy', 'busy', busy)
+
+        res = app.test_client().get('/busy')
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.headers["Retry-After"], "1")
+        self.assertFalse(res.get_json()["status"])
+
+@unittest.skipIf(create_server is None, "waitress is not installed")
+class PasswordHasherSaturationTestCase(BaseTestCase):
+    """Test case for a login burst against Waitress with SERVER_THREADS threads"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.threads = cls.app.config['SERVER_THREADS']
+        cls.server = create_server(cls.app, host='127.0.0.1', port=0, threads=cls.threads)
+        threading.Thread(target=cls.server.run, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+        super().tearDownClass()
+
+    def _request(self, method, path, body=None, headers=None):
+        conn = http.client.HTTPConnection('127.0.0.1', self.server.effective_port, timeout=5)
+        try:
+            conn.request(method, path, body=json.dumps(body) if body else None,
+                         headers={"Content-Type": "application/json", **(headers or {})})
+            res = conn.getresponse()
+            return res.status, res.read()
+        finally:
+            conn.close()
+
+    def test_login_burst_leaves_threads_free(self):
+        """Test logins beyond the pool and queue get 503 at once and other requests are still served"""
+        user = {
+            "username": f"burst_{self.unique_id}",
+            "email": f"burst_{self.unique_id}@example.com",
+            "phone": f"+1555400{self.unique_id[:8]}",
+            "password": "Password123",
+            "user_type": "Public Figure"
+        }
+        db.users.delete_many({"email": user["email"]})
+        _, token = self._register_and_verify_user(user)
+        login = {"email": user["email"], "password": user["password"]}
+
+        hasher = self.app.extensions["password_hasher"]
+        release = threading.Event()
+        running = threading.Semaphore(0)
+
+        def blocked_check(*args):
+            running.release()
+            release.wait(10)
+            return True
+
+        with mock.patch.object(password_hasher, "_check", blocked_check):
+            # Fill the pool and its queue with logins, each holding a request thread
+            admitted = [threading.Thread(target=self._request, args=("POST", "/api/auth/login", login))
+                        for _ in range(hasher.pool_size + hasher.max_queue)]
+            for thread in admitted:
+                thread.start()
+            for _ in range(hasher.pool_size):
+                self.assertTrue(running.acquire(timeout=5))
+            time.sleep(0.2)
+
+            try:
+                statuses = []
+                def rejected_login():
+                    started = time.monotonic()
+                    status, _ = self._request("POST", "/api/auth/login", login)
+                    statuses.append((status, time.monotonic() - started))
+
+                burst = [threading.Thread(target=rejected_login) for _ in range(self.threads + 1)]
+                for thread in burst:
+                    thread.start()
+                for thread in burst:
+                    thread.join(10)
+                self.assertEqual([status for status, _ in statuses], [503] * (self.threads + 1))
+                self.assertLess(max(elapsed for _, elapsed in statuses), 2)
+
+                status, body = self._request("GET", "/api/profile/", headers={"Authorization": f"Bearer {token}"})
+                self.assertEqual(status, 200)
+                self.assertEqual(json.loads(body)["profile"]["username"], user["username"])
+            finally:
+                release.set()
+                for thread in admitted:
+                    thread.join(10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.api.services.presence import MemoryPresenceStore, Presence
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class FailingStore:
+    def __getattr__(self, name):
+        def fail(*args):
+            raise ConnectionError("store is down")
+        return fail
+
+class PresenceTestCase(unittest.TestCase):
+    """Test case for the presence service"""
+
+    def setUp(self):
+        """Set up presence over an in-memory store with a fake clock"""
+        self.clock = FakeClock()
+        self.presence = Presence(MemoryPresenceStore(clock=self.clock), ttl=60, typing_ttl=6, disconnect_grace=5)
+
+    def test_heartbeats_expire(self):
+        """Test users are online until their last heartbeat is older than the TTL"""
+        self.presence.heartbeat("a")
+        self.presence.heartbeat("b")
+        self.assertEqual(self.presence.online_many(["a", "b", "c", None]), {"a", "b"})
+
+        self.clock.now += 45
+        self.presence.heartbeat("a")
+        self.clock.now += 30
+        self.assertEqual(self.presence.online_many(["a", "b"]), {"a"})
+        self.assertFalse(self.presence.is_online("b"))
+
+    def test_disconnect_grace(self):
+        """Test a disconnected user goes offline after the grace period unless they reconnect"""
+        self.presence.heartbeat("a")
+        self.presence.disconnect("a")
+        self.assertTrue(self.presence.is_online("a"))
+        self.clock.now += 6
+        self.assertFalse(self.presence.is_online("a"))
+
+        self.presence.disconnect("b")
+        self.presence.heartbeat("b")
+        self.clock.now += 6
+        self.assertTrue(self.presence.is_online("b"))
+
+    def test_typing_changes(self):
+        """Test only typing changes are reported, and typing expires without repeats"""
+        self.assertTrue(self.presence.start_typing("a", "a_b"))
+        self.assertFalse(self.presence.start_typing("a", "a_b"))
+        self.assertTrue(self.presence.stop_typing("a", "a_b"))
+        self.assertFalse(self.presence.stop_typing("a", "a_b"))
+
+        self.presence.start_typing("a", "a_b")
+        self.clock.now += 7
+        self.assertTrue(self.presence.start_typing("a", "a_b"))
+
+    def test_store_failure(self):
+        """Test a failing shared store reports everyone offline instead of raising"""
+        presence = Presence(FailingStore())
+        presence.heartbeat("a")
+        self.assertEqual(presence.online_many(["a"]), set())
+        self.assertFalse(presence.start_typing("a", "a_b"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -94,6 +94,22 @@ class ProfileTestCase(BaseTestCase):
         self.assertNotIn('email', result['profile'])
         self.assertNotIn('phone', result['profile'])
     
+    def test_get_user_profile_not_modified(self):
+        """Test a repeat read with the ETag returns 304 until the profile changes"""
+        headers = {"Authorization": f"Bearer {self.user1_token}"}
+        res = self.client().get(f'/api/profile/{self.user2_id}', headers=headers)
+        etag = res.headers['ETag']
+        
+        res = self.client().get(f'/api/profile/{self.user2_id}', headers=dict(headers, **{"If-None-Match": etag}))
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b"")
+        
+        # Favoriting changes the viewer's copy
+        self.client().post(f'/api/profile/favorite/{self.user2_id}', headers=headers)
+        res = self.client().get(f'/api/profile/{self.user2_id}', headers=dict(headers, **{"If-None-Match": etag}))
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(json.loads(res.data)['profile']['is_favorited'])
+    
     def test_update_profile(self):
         """Test updating profile"""
         update_data = {
@@ -0,0 +1,126 @@
+import unittest
+import os
+import sys
+from unittest import mock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bson import ObjectId
+from app.api.models.user import User
+from app.api.services import profile_cache
+from app.api.services.profile_cache import MemoryProfileStore, ProfileCache
+from app.api.utils.cache import LRUCache
+
+class FailingStore:
+    """Shared store that is down"""
+
+    def get_many(self, keys):
+        raise ConnectionError("down")
+
+    def set_many(self, mapping, versions, ttl):
+        raise ConnectionError("down")
+
+    def versions(self, keys):
+        raise ConnectionError("down")
+
+    def bump(self, keys, ttl):
+        raise ConnectionError("down")
+
+class ProfileCacheTestCase(unittest.TestCase):
+    """Test case for the two-tier public profile cache"""
+
+    def setUp(self):
+        """Set up a cache over a mocked users collection"""
+        self.user_id = ObjectId()
+        self.document = {"_id": self.user_id, "username": "alice", "user_type": "athlete", "bio": "Hi"}
+        self.collection = mock.Mock()
+        self.collection.find.side_effect = lambda query, projection: [
+            dict(self.document) for object_id in query["_id"]["$in"] if object_id == self.document["_id"]
+        ]
+        patcher = mock.patch.object(User, "get_collection", return_value=self.collection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.l2 = MemoryProfileStore()
+        self.cache = ProfileCache(LRUCache(maxsize=10, ttl=10), self.l2)
+
+    def test_repeated_reads_hit_l1(self):
+        """Test only the first read queries the database"""
+        first = self.cache.get(str(self.user_id))
+        second = self.cache.get(str(self.user_id))
+
+        self.assertEqual(self.collection.find.call_count, 1)
+        self.assertEqual(second.username, "alice")
+        self.assertIsNot(first, second)
+
+    def test_l2_is_shared(self):
+        """Test another process's L1 is filled from L2 without a query"""
+        self.cache.get(str(self.user_id))
+        other = ProfileCache(LRUCache(maxsize=10, ttl=10), self.l2)
+
+        self.assertEqual(other.get(str(self.user_id)).username, "alice")
+        self.assertEqual(self.collection.find.call_count, 1)
+
+    def test_batch_only_queries_misses(self):
+        """Test a batch read skips unknown and cached profiles"""
+        self.cache.get(str(self.user_id))
+        profiles = self.cache.get_many([str(self.user_id), str(ObjectId()), "invalid"])
+
+        self.assertEqual(list(profiles), [str(self.user_id)])
+        self.assertEqual(self.collection.find.call_count, 2)
+        self.assertEqual(len(self.collection.find.call_args[0][0]["_id"]["$in"]), 1)
+
+    def test_invalidate(self):
+        """Test an invalidated profile is reloaded from the database"""
+        self.cache.get(str(self.user_id))
+        self.document["bio"] = "Updated"
+        self.cache.invalidate(str(self.user_id))
+
+        self.assertEqual(self.cache.get(str(self.user_id)).bio, "Updated")
+
+    def test_stale_load_is_not_shared(self):
+        """Test a load that started before another process's update is not written to L2"""
+        other = ProfileCache(LRUCache(maxsize=10, ttl=10), self.l2)
+        find = self.collection.find.side_effect
+
+        def find_during_update(query, projection):
+            documents = find(query, projection)
+            # Another process updates the profile while this one is loading it
+            self.document["bio"] = "Updated"
+            other.invalidate(str(self.user_id))
+            return documents
+
+        self.collection.find.side_effect = find_during_update
+        self.assertEqual(self.cache.get(str(self.user_id)).bio, "Hi")
+        self.collection.find.side_effect = find
+
+        third = ProfileCache(LRUCache(maxsize=10, ttl=10), self.l2)
+        self.assertEqual(third.get(str(self.user_id)).bio, "Updated")
+        # Loads after the update are shared again
+        self.assertEqual(ProfileCache(LRUCache(maxsize=10, ttl=10), self.l2).get(str(self.user_id)).bio, "Updated")
+        self.assertEqual(self.collection.find.call_count, 2)
+
+    def test_warns_without_shared_l2(self):
+        """Test several workers without a Redis L2 are reported"""
+        with self.assertLogs("app.api.services.profile_cache", level="WARNING"):
+            profile_cache._create_profile_cache({"WEB_CONCURRENCY": "4"}.get)
+
+    def test_l2_errors_fall_back_to_database(self):
+        """Test a failing shared store does not fail reads"""
+        cache = ProfileCache(LRUCache(maxsize=10, ttl=10), FailingStore())
+
+        self.assertEqual(cache.get(str(self.user_id)).username, "alice")
+        cache.invalidate(str(self.user_id))
+
+    def test_saving_user_invalidates(self):
+        """Test saving a user drops its cached profile"""
+        with mock.patch("app.api.services.profile_cache.get_profile_cache", return_value=self.cache):
+            self.cache.get(str(self.user_id))
+            user = User.from_dict(dict(self.document, _id=str(self.user_id)))
+            user._start_tracking()
+            user.bio = "Updated"
+            user.save()
+
+        self.assertIsNone(self.cache.l1.get(f"profile:{self.user_id}"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,12 +3,24 @@ import json
 import os
 import sys
 import uuid
+import tempfile
+import threading
+from unittest import mock
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import random
 import string
+import bson
+from bson import ObjectId
 from app import create_app
 from app.config.database import db
+from app.api.services.image_service import get_image_processor
+from app.api.utils.cache import get_cache
+from app.api.models.user import User
+from app.api.models.project import Project
+from app.api.models.media_file import MediaFile
+from app.api.services import chunked_upload, media_storage, profile_cache
 from tests import BaseTestCase
+from tests.helpers import make_upload
 
 class ProjectTestCase(BaseTestCase):
     """Test case for the project routes"""
@@ -111,6 +123,228 @@ class ProjectTestCase(BaseTestCase):
         self.assertEqual(result['project']['description'], self.project['description'])
         self.assertTrue(result['project']['is_owner'])
     
+    def test_project_etag_ignores_profile_order(self):
+        """Test the ETag does not change with the order profiles come back in"""
+        headers = {"Authorization": f"Bearer {self.user1_token}"}
+        project_id = json.loads(self.client().post('/api/project/', headers=headers, json=self.project).data)['project_id']
+        db.projects.update_one({"_id": ObjectId(project_id)}, {"$set": {"collaborators": [self.user2_id]}})
+        etag = self.client().get(f'/api/project/{project_id}', headers=headers).headers['ETag']
+        
+        get_profiles = profile_cache.get_profiles
+        def reversed_profiles(user_ids):
+            return dict(reversed(list(get_profiles(user_ids).items())))
+        with mock.patch.object(profile_cache, "get_profiles", side_effect=reversed_profiles):
+            res = self.client().get(f'/api/project/{project_id}', headers={**headers, "If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+    
+    def test_upload_project_images_generates_variants(self):
+        """Test uploaded images are processed in the background and listings use thumbnails"""
+        upload_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(upload_folder.cleanup)
+        original_folder = self.app.config['UPLOAD_FOLDER']
+        self.app.config['UPLOAD_FOLDER'] = upload_folder.name
+        self.addCleanup(self.app.config.__setitem__, 'UPLOAD_FOLDER', original_folder)
+        
+        headers = {"Authorization": f"Bearer {self.user1_token}"}
+        project_id = json.loads(self.client().post('/api/project/', headers=headers, json=self.project).data)['project_id']
+        
+        res = self.client().post(
+            f'/api/project/{project_id}/images',
+            headers=headers,
+            data={"files": [make_upload(), make_upload(name="second.png", color=(200, 10, 10))]},
+            content_type='multipart/form-data'
+        )
+        self.assertEqual(res.status_code, 200)
+        uploaded = json.loads(res.data)['images']
+        self.assertEqual(len(uploaded), 2)
+        self.assertNotEqual(uploaded[0], uploaded[1])
+        
+        get_image_processor().wait()
+        
+        project = json.loads(self.client().get(f'/api/project/{project_id}', headers=headers).data)['project']
+        self.assertTrue(all(image.endswith("_full.webp") for image in project['images']))
+        for image in project['images']:
+            self.assertTrue(os.path.exists(os.path.join(upload_folder.name, image.lstrip('/'))))
+        # The originals (with their metadata) are gone
+        self.assertFalse(os.path.exists(os.path.join(upload_folder.name, uploaded[0].lstrip('/'))))
+        
+        listing = json.loads(self.client().get(f'/api/project/user/{self.user1_id}', headers=headers).data)
+        listed = next(p for p in listing['projects'] if p['id'] == project_id)
+        self.assertEqual(listed['images'], [project['images'][0].replace("_full.", "_thumb.")])
+        
+        # Removing an image also drops its variants and deletes the files
+        self.client().delete(f'/api/project/{project_id}/images/0', headers=headers)
+        stored = db.projects.find_one({"_id": ObjectId(project_id)})
+        self.assertEqual(len(stored['images']), 1)
+        self.assertEqual([v['full'] for v in stored['image_variants']], stored['images'])
+        self.assertFalse(os.path.exists(os.path.join(upload_folder.name, project['images'][0].lstrip('/'))))
+        
+        # Uploading an image the project already has is a no-op, other projects reuse the stored variants
+        res = self.client().post(f'/api/project/{project_id}/images', headers=headers,
+                                 data={"files": [make_upload(name="again.png", color=(200, 10, 10))]},
+                                 content_type='multipart/form-data')
+        self.assertEqual(res.status_code, 400)
+        other_id = json.loads(self.client().post('/api/project/', headers=headers, json=self.project).data)['project_id']
+        res = self.client().post(f'/api/project/{other_id}/images', headers=headers,
+                                 data={"files": [make_upload(name="again.png", color=(200, 10, 10))]},
+                                 content_type='multipart/form-data')
+        result = json.loads(res.data)
+        self.assertFalse(result['processing'])
+        self.assertEqual(result['images'], stored['images'])
+    
+    def test_set_image_variants_replaces_duplicates(self):
+        """Test every occurrence of a processed image is replaced by its full variant"""
+        project_id = str(Project.get_collection().insert_one({
+            "user_id": self.user1_id, "title": "Duplicated images", "description": "Same image twice",
+            "images": ["/projects/a.png", "/projects/b.png", "/projects/a.png"], "image_variants": []
+        }).inserted_id)
+        variants = {"thumb": "/projects/a_thumb.webp", "medium": "/projects/a_medium.webp", "full": "/projects/a_full.webp"}
+        
+        self.assertTrue(Project.set_image_variants(project_id, "/projects/a.png", variants))
+        stored = Project.get_collection().find_one({"_id": ObjectId(project_id)})
+        self.assertEqual(stored['images'], ["/projects/a_full.webp", "/projects/b.png", "/projects/a_full.webp"])
+        self.assertEqual(stored['image_variants'], [variants])
+        # Applied once
+        self.assertFalse(Project.set_image_variants(project_id, "/projects/a.png", variants))
+    
+    def test_resumable_image_upload(self):
+        """Test an image sent in chunks, out of order and resumed, is attached on finalize"""
+        upload_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(upload_folder.cleanup)
+        original_folder = self.app.config['UPLOAD_FOLDER']
+        self.app.config['UPLOAD_FOLDER'] = upload_folder.name
+        self.addCleanup(self.app.config.__setitem__, 'UPLOAD_FOLDER', original_folder)
+        self.app.config['UPLOAD_CHUNK_SIZE'] = 4096
+        self.addCleanup(self.app.config.__setitem__, 'UPLOAD_CHUNK_SIZE', 1024 * 1024)
+        
+        headers = {"Authorization": f"Bearer {self.user1_token}"}
+        project_id = json.loads(self.client().post('/api/project/', headers=headers, json=self.project).data)['project_id']
+        data = make_upload(size=(300, 200), color=(10, 10, 200))[0].getvalue()
+        
+        res = self.client().post(f'/api/project/{project_id}/uploads', headers=headers,
+                                 json={"filename": "big.png", "size": len(data)})
+        self.assertEqual(res.status_code, 201)
+        session = json.loads(res.data)
+        upload_url = f"/api/project/{project_id}/uploads/{session['upload_id']}"
+        chunks = [data[i:i + 4096] for i in range(0, len(data), 4096)]
+        self.assertEqual(session['chunk_count'], len(chunks))
+        
+        # Other users cannot see the upload
+        other_headers = {"Authorization": f"Bearer {self.user2_token}"}
+        self.assertEqual(self.client().get(upload_url, headers=other_headers).status_code, 404)
+        
+        # Send every chunk but the first, last one first
+        for index in reversed(range(1, len(chunks))):
+            res = self.client().put(f"{upload_url}/chunks/{index}", headers=headers, data=chunks[index])
+            self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.client().put(f"{upload_url}/chunks/0", headers=headers, data=b"short").status_code, 400)
+        self.assertEqual(self.client().post(f"{upload_url}/finalize", headers=headers).status_code, 409)
+        
+        # Resume with the missing chunk
+        status = json.loads(self.client().get(upload_url, headers=headers).data)
+        self.assertEqual(status['received'], list(range(1, len(chunks))))
+        self.client().put(f"{upload_url}/chunks/0", headers=headers, data=chunks[0])
+        
+        res = self.client().post(f"{upload_url}/finalize", headers=headers)
+        self.assertEqual(res.status_code, 200)
+        image_url = json.loads(res.data)['images'][0]
+        self.assertTrue(image_url.startswith("/media/"))
+        self.assertEqual(os.listdir(os.path.join(upload_folder.name, "partial")), [])
+        
+        get_image_processor().wait()
+        project = json.loads(self.client().get(f'/api/project/{project_id}', headers=headers).data)['project']
+        self.assertEqual(project['images'], [image_url.rsplit('.', 1)[0] + "_full.webp"])
+        # The session is gone
+        self.assertEqual(self.client().post(f"{upload_url}/finalize", headers=headers).status_code, 404)
+    
+    def test_resumable_upload_limits(self):
+        """Test unfinished uploads are limited per user, verified users only, and finalized once"""
+        upload_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(upload_folder.cleanup)
+        data = make_upload(size=(40, 40), color=(200, 10, 10))[0].getvalue()
+        for key, value in {'UPLOAD_FOLDER': upload_folder.name, 'UPLOAD_MAX_SESSIONS': 2,
+                           'UPLOAD_MAX_PENDING_BYTES': len(data) + 100}.items():
+            self.addCleanup(self.app.config.__setitem__, key, self.app.config[key])
+            self.app.config[key] = value
+        
+        headers = {"Authorization": f"Bearer {self.user1_token}"}
+        project_id = json.loads(self.client().post('/api/project/', headers=headers, json=self.project).data)['project_id']
+        def start(size):
+            return self.client().post(f'/api/project/{project_id}/uploads', headers=headers,
+                                      json={"filename": "photo.png", "size": size})
+        
+        first = json.loads(start(len(data)).data)['upload_id']
+        self.assertEqual(start(200).status_code, 429)
+        second = json.loads(start(10).data)['upload_id']
+        self.assertEqual(start(10).status_code, 429)
+        # Rejected sessions leave nothing behind
+        self.assertEqual(sorted(os.listdir(os.path.join(upload_folder.name, "partial"))), sorted([first, second]))
+        self.client().delete(f'/api/project/{project_id}/uploads/{second}', headers=headers)
+        self.assertEqual(start(10).status_code, 201)
+        
+        # Unverified users cannot send chunks or cancel
+        upload_url = f'/api/project/{project_id}/uploads/{first}'
+        User.get_collection().update_one({"email": self.user1["email"]}, {"$set": {"email_verified": False}})
+        User.invalidate_cached(self.user1_id)
+        self.assertEqual(self.client().put(f"{upload_url}/chunks/0", headers=headers, data=data).status_code, 403)
+        self.assertEqual(self.client().delete(upload_url, headers=headers).status_code, 403)
+        User.get_collection().update_one({"email": self.user1["email"]}, {"$set": {"email_verified": True}})
+        User.invalidate_cached(self.user1_id)
+        
+        # Concurrent finalize calls store the upload once
+        self.client().put(f"{upload_url}/chunks/0", headers=headers, data=data)
+        store_stream = media_storage.store_stream
+        storing = threading.Event()
+        release = threading.Event()
+        def slow_store_stream(*args, **kwargs):
+            storing.set()
+            release.wait(5)
+            return store_stream(*args, **kwargs)
+        
+        responses = []
+        def finalize():
+            responses.append(self.client().post(f"{upload_url}/finalize", headers=headers))
+        with mock.patch.object(media_storage, "store_stream", side_effect=slow_store_stream):
+            thread = threading.Thread(target=finalize)
+            thread.start()
+            self.assertTrue(storing.wait(5))
+            self.assertEqual(self.client().post(f"{upload_url}/finalize", headers=headers).status_code, 409)
+            self.assertEqual(self.client().put(f"{upload_url}/chunks/0", headers=headers, data=data).status_code, 409)
+            self.assertEqual(self.client().delete(upload_url, headers=headers).status_code, 409)
+            release.set()
+            thread.join(5)
+        
+        self.assertEqual(responses[0].status_code, 200)
+        digest = media_storage.digest_from_url(json.loads(responses[0].data)['images'][0])
+        self.assertEqual(MediaFile.get(digest)["refs"], 1)
+        self.assertEqual(self.client().post(f"{upload_url}/finalize", headers=headers).status_code, 404)
+    
+    def test_chunk_during_cancel(self):
+        """Test a chunk whose upload is cancelled while it is written is reported as not found"""
+        upload_folder = tempfile.TemporaryDirectory()
+        self.addCleanup(upload_folder.cleanup)
+        self.addCleanup(self.app.config.__setitem__, 'UPLOAD_FOLDER', self.app.config['UPLOAD_FOLDER'])
+        self.app.config['UPLOAD_FOLDER'] = upload_folder.name
+        
+        headers = {"Authorization": f"Bearer {self.user1_token}"}
+        project_id = json.loads(self.client().post('/api/project/', headers=headers, json=self.project).data)['project_id']
+        def start(size):
+            return self.client().post(f'/api/project/{project_id}/uploads', headers=headers,
+                                      json={"filename": "photo.png", "size": size})
+        self.assertEqual(start(True).status_code, 400)
+        upload_id = json.loads(start(10).data)['upload_id']
+        upload_url = f'/api/project/{project_id}/uploads/{upload_id}'
+        
+        class CancellingStream:
+            def read(stream, size):
+                self.assertEqual(self.client().delete(upload_url, headers=headers).status_code, 200)
+                return b"x" * size
+        
+        session = chunked_upload.load_session(upload_id, self.user1_id, project_id)
+        with self.assertRaises(chunked_upload.UploadNotFound):
+            chunked_upload.write_chunk(session, 0, CancellingStream(), 10)
+        self.assertEqual(os.listdir(os.path.join(upload_folder.name, "partial")), [])
+    
     def test_update_project(self):
         """Test updating a project"""
         # First create a project
@@ -185,6 +419,63 @@ class ProjectTestCase(BaseTestCase):
         unfav_result = json.loads(unfav_res.data)
         self.assertFalse(unfav_result['is_favorited'])
     
+    def test_favorite_project_with_stale_cached_user(self):
+        """Test a toggle from another worker's outdated cached user follows the stored favorites"""
+        project_id = json.loads(self.client().post(
+            '/api/project/',
+            headers={"Authorization": f"Bearer {self.user1_token}"},
+            json=self.project
+        ).data)['project_id']
+        headers = {"Authorization": f"Bearer {self.user2_token}"}
+        stale_user = bson.encode(User.get_collection().find_one({"email": self.user2["email"]}))
+        
+        res = self.client().post(f'/api/project/{project_id}/favorite', headers=headers)
+        self.assertEqual(json.loads(res.data)['favorites_count'], 1)
+        
+        # Another worker still caches the user without the favorite
+        get_cache("user").set(self.user2_id, stale_user)
+        res = self.client().post(f'/api/project/{project_id}/favorite', headers=headers)
+        result = json.loads(res.data)
+        self.assertFalse(result['is_favorited'])
+        self.assertEqual(result['favorites_count'], 0)
+        self.assertEqual(User.find_by_email(self.user2["email"]).favorites['projects'], [])
+        self.assertEqual(db.projects.find_one({"_id": ObjectId(project_id)})['favorites_count'], 0)
+    
+    def test_user_projects_cursor_pagination(self):
+        """Test paging through a user's projects with cursors"""
+        project_ids = []
+        for i in range(3):
+            create_res = self.client().post(
+                '/api/project/',
+                headers={"Authorization": f"Bearer {self.user1_token}"},
+                json=dict(self.project, title=f"Paged Project {i}")
+            )
+            project_ids.append(json.loads(create_res.data)['project_id'])
+        
+        seen = []
+        cursor = None
+        while True:
+            url = f'/api/project/user/{self.user1_id}?limit=2'
+            if cursor:
+                url += f'&cursor={cursor}'
+            res = self.client().get(url, headers={"Authorization": f"Bearer {self.user1_token}"})
+            self.assertEqual(res.status_code, 200)
+            result = json.loads(res.data)
+            seen.extend(project['id'] for project in result['projects'])
+            cursor = result['next_cursor']
+            if not cursor:
+                break
+        
+        # Newest first, no duplicates and nothing skipped
+        self.assertEqual(seen, list(reversed(project_ids)))
+        
+        # Malformed cursors are rejected
+        res = self.client().get(
+            f'/api/project/user/{self.user1_id}?cursor=bogus',
+            headers={"Authorization": f"Bearer {self.user1_token}"}
+        )
+        self.assertEqual(res.status_code, 400)
+    
     def test_rate_project(self):
         """Test rating a project"""
         # First create a project with user1
@@ -211,7 +502,31 @@ class ProjectTestCase(BaseTestCase):
         result = json.loads(res.data)
         self.assertTrue(result['status'])
         self.assertEqual(result['avg_rating'], 5.0)  # First rating should be exactly 5.0
-    
+
+    def test_rerate_project_replaces_rating(self):
+        """Test rating a project again replaces the user's previous rating"""
+        create_res = self.client().post(
+            '/api/project/',
+            headers={"Authorization": f"Bearer {self.user1_token}"},
+            json=self.project
+        )
+        project_id = json.loads(create_res.data)['project_id']
+
+        for rating in [5, 3]:
+            res = self.client().post(
+                f'/api/project/{project_id}/rate',
+                headers={"Authorization": f"Bearer {self.user2_token}"},
+                json={"rating": rating}
+            )
+            self.assertEqual(res.status_code, 200)
+
+        self.assertEqual(json.loads(res.data)['avg_rating'], 3.0)
+        project = db.projects.find_one({"_id": ObjectId(project_id)})
+        self.assertEqual(project['rating_count'], 1)
+        self.assertEqual(project['rating_histogram'], {"1": 0, "2": 0, "3": 1, "4": 0, "5": 0})
+        self.assertNotIn('ratings', project)
+        self.assertEqual(db.project_ratings.count_documents({"project_id": project_id}), 1)
+
     def test_collaboration_request(self):
         """Test sending and accepting a collaboration request"""
         # First create a project with user1
@@ -260,6 +575,61 @@ class ProjectTestCase(BaseTestCase):
         collaborators = [collab['id'] for collab in get_result['project']['collaborators']]
         self.assertIn(self.user2_id, collaborators)
     
+    def test_collaboration_request_inbox(self):
+        """Test listing sent and received collaboration requests"""
+        create_res = self.client().post(
+            '/api/project/',
+            headers={"Authorization": f"Bearer {self.user1_token}"},
+            json=self.project
+        )
+        project_id = json.loads(create_res.data)['project_id']
+
+        self.client().post(
+            f'/api/project/{project_id}/collaboration-request',
+            headers={"Authorization": f"Bearer {self.user2_token}"},
+            json={"message": "Let's work together"}
+        )
+
+        # A second request for the same project is rejected
+        dup_res = self.client().post(
+            f'/api/project/{project_id}/collaboration-request',
+            headers={"Authorization": f"Bearer {self.user2_token}"},
+            json={}
+        )
+        self.assertEqual(dup_res.status_code, 400)
+
+        sent_res = self.client().get(
+            '/api/project/collaboration-requests?status=pending',
+            headers={"Authorization": f"Bearer {self.user2_token}"}
+        )
+        self.assertEqual(sent_res.status_code, 200)
+        sent = json.loads(sent_res.data)['requests']
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(sent[0]['project']['title'], self.project['title'])
+
+        received_res = self.client().get(
+            '/api/project/collaboration-requests/received',
+            headers={"Authorization": f"Bearer {self.user1_token}"}
+        )
+        received = json.loads(received_res.data)['requests']
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]['user']['id'], self.user2_id)
+
+        # Only a pending request can change status
+        for expected_code in [200, 400]:
+            res = self.client().put(
+                f'/api/project/{project_id}/collaboration-request/{self.user2_id}',
+                headers={"Authorization": f"Bearer {self.user1_token}"},
+                json={"status": "rejected"}
+            )
+            self.assertEqual(res.status_code, expected_code)
+
+        pending_res = self.client().get(
+            '/api/project/collaboration-requests/received?status=pending',
+            headers={"Authorization": f"Bearer {self.user1_token}"}
+        )
+        self.assertEqual(json.loads(pending_res.data)['requests'], [])
+
     def test_delete_project(self):
         """Test project deletion"""
         # First create a project
@@ -0,0 +1,297 @@
+import unittest
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from unittest import mock
+from flask import Flask
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.api import events, sockets
+from app.api.services import presence
+from app.config.database import db
+from tests import BaseTestCase
+
+try:
+    from waitress.server import create_server
+except ImportError:
+    create_server = None
+
+class EventsTestCase(unittest.TestCase):
+    """Test case for the in-process event bus"""
+
+    def test_publish(self):
+        """Test subscribers get every event once, and a failing one does not stop the others"""
+        received = []
+        failing = events.subscribe(lambda *args: 1 / 0)
+        handler = events.subscribe(lambda *args: received.append(args))
+        events.subscribe(handler)
+        self.addCleanup(events.unsubscribe, failing)
+        self.addCleanup(events.unsubscribe, handler)
+
+        events.publish(events.MESSAGE_NEW, {"id": "1"}, ["b", "a", "b", None])
+        self.assertEqual(received, [(events.MESSAGE_NEW, {"id": "1"}, ["a", "b"])])
+
+@unittest.skipIf(sockets.SocketIO is None, "flask-socketio is not installed")
+class InitAppTestCase(unittest.TestCase):
+    """Test case for configuring Socket.IO at startup"""
+
+    def test_warns_without_message_queue(self):
+        """Test a process that does not serve sockets and has no queue to publish to is reported"""
+        app = Flask(__name__)
+        app.config.update(SOCKETIO_SERVE=False, SOCKETIO_MESSAGE_QUEUE=None)
+        with self.assertLogs("app.api.sockets", level="WARNING"):
+            self.assertIsNone(sockets.init_app(app))
+        self.assertNotIn("socketio", app.extensions)
+
+@unittest.skipIf(sockets.SocketIO is None, "flask-socketio is not installed")
+class RealtimeTestCase(BaseTestCase):
+    """Test case for pushing events to Socket.IO clients"""
+
+    def setUp(self):
+        """Register two users and connect the second one"""
+        super().setUp()
+        self.sender = {
+            "username": f"rtsender_{self.unique_id}",
+            "email": f"rtsender_{self.unique_id}@example.com",
+            "phone": f"+1555100{self.unique_id[:8]}",
+            "password": "Password123",
+            "user_type": "Public Figure"
+        }
+        self.receiver = {
+            "username": f"rtreceiver_{self.unique_id}",
+            "email": f"rtreceiver_{self.unique_id}@example.com",
+            "phone": f"+1555200{self.unique_id[:8]}",
+            "password": "Password123",
+            "user_type": "Industry Expert"
+        }
+        db.users.delete_many({"email": {"$in": [self.sender["email"], self.receiver["email"]]}})
+        self.sender_id, self.sender_token = self._register_and_verify_user(self.sender)
+        self.receiver_id, self.receiver_token = self._register_and_verify_user(self.receiver)
+
+        self.socketio = self.app.extensions["socketio"]
+
+    def _connect(self, token):
+        client = self.socketio.test_client(self.app, namespace=sockets.NAMESPACE, auth={"token": token})
+        self.addCleanup(lambda: client.is_connected(sockets.NAMESPACE) and client.disconnect(sockets.NAMESPACE))
+        return client
+
+    def _events(self, client, name):
+        return [event["args"][0] for event in client.get_received(sockets.NAMESPACE) if event["name"] == name]
+
+    def test_rejects_unauthenticated(self):
+        """Test connections without a valid token are refused"""
+        self.assertFalse(self._connect("not-a-token").is_connected(sockets.NAMESPACE))
+        client = self.socketio.test_client(self.app, namespace=sockets.NAMESPACE)
+        self.assertFalse(client.is_connected(sockets.NAMESPACE))
+
+    def test_message_and_read_receipt(self):
+        """Test a sent message reaches the receiver and the read receipt reaches the sender"""
+        receiver = self._connect(self.receiver_token)
+        sender = self._connect(self.sender_token)
+        self.assertTrue(receiver.is_connected(sockets.NAMESPACE))
+
+        res = self.client().post(f'/api/message/send/{self.receiver_id}',
+                                 headers={"Authorization": f"Bearer {self.sender_token}"},
+                                 json={"content": "Hello in real time"})
+        result = json.loads(res.data)
+
+        received = self._events(receiver, events.MESSAGE_NEW)
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]["id"], result["message_id"])
+        self.assertEqual(received[0]["content"], "Hello in real time")
+        self.assertEqual(received[0]["sender_id"], self.sender_id)
+        # ISO 8601, like API responses
+        self.assertIn("T", received[0]["created_at"])
+        # The sender's other connections see it too
+        self.assertEqual(len(self._events(sender, events.MESSAGE_NEW)), 1)
+
+        self.client().post(f'/api/message/mark-conversation-read/{result["conversation_id"]}',
+                           headers={"Authorization": f"Bearer {self.receiver_token}"})
+        receipts = self._events(sender, events.CONVERSATION_READ)
+        self.assertEqual(len(receipts), 1)
+        self.assertEqual(receipts[0]["reader_id"], self.receiver_id)
+        self.assertEqual(receipts[0]["count"], 1)
+
+    def test_presence_and_typing(self):
+        """Test connected users show as online in conversations and typing is relayed once"""
+        sender_headers = {"Authorization": f"Bearer {self.sender_token}"}
+        conversation_id = json.loads(self.client().post(f'/api/message/send/{self.receiver_id}',
+                                                        headers=sender_headers,
+                                                        json={"content": "Are you there?"}).data)['conversation_id']
+
+        def receiver_online():
+            res = self.client().get('/api/message/conversations', headers=sender_headers)
+            conversation = next(c for c in json.loads(res.data)['conversations'] if c['conversation_id'] == conversation_id)
+            return conversation['other_user']['is_online']
+
+        self.assertFalse(receiver_online())
+        offline_etag = self.client().get('/api/message/conversations', headers=sender_headers).headers['ETag']
+        
+        receiver = self._connect(self.receiver_token)
+        sender = self._connect(self.sender_token)
+        self.assertTrue(receiver_online())
+        # The cached listing is not reused once presence changes
+        res = self.client().get('/api/message/conversations',
+                                headers={**sender_headers, "If-None-Match": offline_etag})
+        self.assertEqual(res.status_code, 200)
+        receiver.emit("heartbeat", namespace=sockets.NAMESPACE)
+
+        for _ in range(3):
+            receiver.emit("typing", {"conversation_id": conversation_id, "typing": True}, namespace=sockets.NAMESPACE)
+        receiver.emit("typing", {"conversation_id": conversation_id, "typing": False}, namespace=sockets.NAMESPACE)
+        # Not a participant
+        receiver.emit("typing", {"conversation_id": "someone_else", "typing": True}, namespace=sockets.NAMESPACE)
+
+        typing = self._events(sender, events.TYPING)
+        self.assertEqual([t["typing"] for t in typing], [True, False])
+        self.assertEqual(typing[0]["user_id"], self.receiver_id)
+        self.assertEqual(self._events(receiver, events.TYPING), [])
+
+    def test_collaboration_request_updates(self):
+        """Test the owner hears about new requests and the requester about decisions"""
+        owner = self._connect(self.sender_token)
+        requester = self._connect(self.receiver_token)
+        owner_headers = {"Authorization": f"Bearer {self.sender_token}"}
+
+        project_id = json.loads(self.client().post('/api/project/', headers=owner_headers, json={
+            "title": "Realtime project", "description": "Pushed updates", "categories": ["Technology"]
+        }).data)['project_id']
+
+        self.client().post(f'/api/project/{project_id}/collaboration-request',
+                           headers={"Authorization": f"Bearer {self.receiver_token}"}, json={"message": "Hi"})
+        new_requests = self._events(owner, events.COLLABORATION_REQUEST_NEW)
+        self.assertEqual([r["project_id"] for r in new_requests], [project_id])
+        self.assertEqual(self._events(requester, events.COLLABORATION_REQUEST_NEW), [])
+
+        self.client().put(f'/api/project/{project_id}/collaboration-request/{self.receiver_id}',
+                          headers=owner_headers, json={"status": "accepted"})
+        updates = self._events(requester, events.COLLABORATION_REQUEST_UPDATED)
+        self.assertEqual([u["status"] for u in updates], ["accepted"])
+
+@unittest.skipIf(create_server is None, "waitress is not installed")
+class ThreadedServerTestCase(BaseTestCase):
+    """Test case for the REST API behind Waitress, configured like run.py in production"""
+
+    @classmethod
+    def setUpClass(cls):
+        with mock.patch.dict(os.environ, {"SOCKETIO_SERVE": "false"}):
+            super().setUpClass()
+        cls.threads = cls.app.config['SERVER_THREADS']
+        cls.server = create_server(cls.app, host='127.0.0.1', port=0, threads=cls.threads)
+        threading.Thread(target=cls.server.run, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+        super().tearDownClass()
+
+    def _connection(self, timeout):
+        return http.client.HTTPConnection('127.0.0.1', self.server.effective_port, timeout=timeout)
+
+    def _long_poll(self):
+        """Open an Engine.IO long-polling session and wait on it, like a browser without WebSockets"""
+        conn = self._connection(timeout=60)
+        try:
+            conn.request("GET", "/socket.io/?EIO=4&transport=polling")
+            res = conn.getresponse()
+            body = res.read()
+            if res.status != 200:
+                return
+            sid = json.loads(body[1:])["sid"]
+            conn.request("GET", f"/socket.io/?EIO=4&transport=polling&sid={sid}")
+            conn.getresponse().read()
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def test_rest_with_polling_clients(self):
+        """Test the API still answers while more polling clients than server threads are connected"""
+        user = {
+            "username": f"poller_{self.unique_id}",
+            "email": f"poller_{self.unique_id}@example.com",
+            "phone": f"+1555300{self.unique_id[:8]}",
+            "password": "Password123",
+            "user_type": "Public Figure"
+        }
+        db.users.delete_many({"email": user["email"]})
+        _, token = self._register_and_verify_user(user)
+
+        for _ in range(self.threads + 1):
+            threading.Thread(target=self._long_poll, daemon=True).start()
+        time.sleep(0.5)
+
+        conn = self._connection(timeout=5)
+        self.addCleanup(conn.close)
+        conn.request("GET", "/api/profile/", headers={"Authorization": f"Bearer {token}"})
+        res = conn.getresponse()
+        self.assertEqual(res.status, 200)
+        self.assertEqual(json.loads(res.read())["profile"]["username"], user["username"])
+        # Socket.IO is left to realtime.py
+        self.assertNotIn("socketio", self.app.extensions)
+
+if __name__ == '__main__':
+    unittest.main()
+
+@unittest.skipIf(sockets.SocketIO is None, "flask-socketio is not installed")
+class SplitProcessPresenceTestCase(BaseTestCase):
+    """Test case for presence with sockets served by realtime.py and the REST API by run.py"""
+
+    def _create_app(self, **env):
+        with mock.patch.dict(os.environ, env):
+            return create_app(test_config={"testing": True})
+
+    def _stores_by_url(self):
+        """Stand-in for Redis: every store created for the same URL shares one memory store"""
+        stores = {}
+        return mock.patch.object(presence, "RedisPresenceStore",
+                                 side_effect=lambda url: stores.setdefault(url, presence.MemoryPresenceStore()))
+
+    def test_warns_without_shared_backend(self):
+        """Test an API process that does not serve sockets reports presence kept in memory"""
+        with self.assertLogs("app.api.services.presence", level="WARNING"):
+            self._create_app(SOCKETIO_SERVE="false", SOCKETIO_MESSAGE_QUEUE="redis://events")
+
+    def test_heartbeat_in_socket_process(self):
+        """Test a user connected to the realtime process shows as online in the API process"""
+        sender = {
+            "username": f"splitsender_{self.unique_id}",
+            "email": f"splitsender_{self.unique_id}@example.com",
+            "phone": f"+1555300{self.unique_id[:8]}",
+            "password": "Password123",
+            "user_type": "Public Figure"
+        }
+        receiver = {
+            "username": f"splitreceiver_{self.unique_id}",
+            "email": f"splitreceiver_{self.unique_id}@example.com",
+            "phone": f"+1555400{self.unique_id[:8]}",
+            "password": "Password123",
+            "user_type": "Industry Expert"
+        }
+        db.users.delete_many({"email": {"$in": [sender["email"], receiver["email"]]}})
+        _, sender_token = self._register_and_verify_user(sender)
+        receiver_id, receiver_token = self._register_and_verify_user(receiver)
+        sender_headers = {"Authorization": f"Bearer {sender_token}"}
+
+        with self._stores_by_url():
+            realtime_app = self._create_app(SOCKETIO_SERVE="true", PRESENCE_BACKEND_URL="redis://presence")
+            api_app = self._create_app(SOCKETIO_SERVE="false", PRESENCE_BACKEND_URL="redis://presence")
+        api = api_app.test_client()
+        conversation_id = json.loads(api.post(f'/api/message/send/{receiver_id}', headers=sender_headers,
+                                              json={"content": "Are you there?"}).data)['conversation_id']
+
+        def receiver_online():
+            res = api.get('/api/message/conversations', headers=sender_headers)
+            conversation = next(c for c in json.loads(res.data)['conversations'] if c['conversation_id'] == conversation_id)
+            return conversation['other_user']['is_online']
+
+        self.assertFalse(receiver_online())
+        with realtime_app.app_context():
+            client = realtime_app.extensions["socketio"].test_client(realtime_app, namespace=sockets.NAMESPACE,
+                                                                     auth={"token": receiver_token})
+            self.assertTrue(client.is_connected(sockets.NAMESPACE))
+        self.assertTrue(receiver_online())
@@ -0,0 +1,84 @@
+import unittest
+import gzip
+import os
+import sys
+import tempfile
+from unittest import mock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.api.services import static_files
+from app.api.services.static_files import StaticFiles, precompress
+
+class StaticFilesTestCase(unittest.TestCase):
+    """Test case for serving the Next.js build"""
+
+    def setUp(self):
+        """Set up a build directory with a hashed chunk and a page"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "static", "chunks"))
+        self.chunk = b"console.log('chunk');" * 100
+        with open(os.path.join(self.root, "static", "chunks", "app-1a2b.js"), "wb") as f:
+            f.write(self.chunk)
+        with open(os.path.join(self.root, "index.html"), "wb") as f:
+            f.write(b"<html></html>")
+
+        self.app = create_app(test_config={"testing": True})
+        self.files = StaticFiles(self.root)
+        self.app.add_url_rule('/build/<path:path>', 'build', lambda path: self.files.send(path, immutable=path.startswith("static/")))
+        self.client = self.app.test_client()
+
+    def test_serves_file(self):
+        """Test a file is served with validators and can be revalidated"""
+        res = self.client.get('/build/index.html')
+        self.assertEqual(res.data, b"<html></html>")
+        self.assertEqual(res.mimetype, "text/html")
+        self.assertEqual(res.headers['Cache-Control'], static_files.REVALIDATE_CACHE_CONTROL)
+
+        res = self.client.get('/build/index.html', headers={"If-None-Match": res.headers['ETag']})
+        self.assertEqual(res.status_code, 304)
+
+    def test_hashed_assets_are_immutable(self):
+        """Test _next/static chunks are cached for a year"""
+        res = self.client.get('/build/static/chunks/app-1a2b.js')
+        self.assertEqual(res.headers['Cache-Control'], static_files.IMMUTABLE_CACHE_CONTROL)
+
+    def test_precompressed_sibling(self):
+        """Test the .gz sibling written by precompress is served to clients that accept it"""
+        self.assertEqual(precompress(self.root), 1 + (static_files.brotli is not None))
+
+        res = self.client.get('/build/static/chunks/app-1a2b.js', headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.data), self.chunk)
+        self.assertEqual(res.mimetype, "text/javascript")
+        self.assertIn('Accept-Encoding', res.headers['Vary'])
+
+        res = self.client.get('/build/static/chunks/app-1a2b.js')
+        self.assertNotIn('Content-Encoding', res.headers)
+        self.assertEqual(res.data, self.chunk)
+
+        # Up-to-date siblings are not rewritten
+        self.assertEqual(precompress(self.root), 0)
+
+    def test_metadata_is_cached(self):
+        """Test repeat requests do not stat the file again"""
+        self.client.get('/build/index.html')
+        with mock.patch.object(static_files.os, "stat", side_effect=AssertionError("stat")):
+            self.assertEqual(self.client.get('/build/index.html').status_code, 200)
+
+    def test_missing_and_outside_paths(self):
+        """Test missing files and paths escaping the root are 404"""
+        self.assertEqual(self.client.get('/build/missing.js').status_code, 404)
+        self.assertEqual(self.client.get('/build/../secret').status_code, 404)
+
+    def test_accel_redirect(self):
+        """Test the body is handed to the front proxy when configured"""
+        self.files = StaticFiles(self.root, accel_prefix="/internal/next")
+        res = self.client.get('/build/static/chunks/app-1a2b.js')
+        self.assertEqual(res.headers['X-Accel-Redirect'], "/internal/next/static/chunks/app-1a2b.js")
+        self.assertEqual(res.data, b"")
+
+if __name__ == '__main__':
+    unittest.main()
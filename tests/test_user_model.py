@@ -0,0 +1,61 @@
+import unittest
+import os
+import sys
+from unittest import mock
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import bcrypt
+from app.api.models.user import User, DEFAULT_SETTINGS
+
+class UserModelTestCase(unittest.TestCase):
+    """Test case for hydrating User objects"""
+
+    def setUp(self):
+        """Set up a stored user document"""
+        self.password_hash = bcrypt.hashpw(b"Password123", bcrypt.gensalt(4)).decode('utf-8')
+        self.data = {
+            "_id": "5f1d7f3e9d1e8a0b2c3d4e5f",
+            "username": "hydrated",
+            "email": "hydrated@example.com",
+            "phone": "+10000000000",
+            "password_hash": self.password_hash,
+            "user_type": "Public Figure"
+        }
+
+    def test_from_dict_does_not_hash(self):
+        """Test loading a user never runs bcrypt"""
+        with mock.patch('app.api.services.password_hasher.bcrypt.hashpw') as hashpw, \
+                mock.patch('app.api.services.password_hasher.bcrypt.gensalt') as gensalt:
+            user = User.from_dict(self.data)
+
+        hashpw.assert_not_called()
+        gensalt.assert_not_called()
+        self.assertEqual(user._id, self.data["_id"])
+        self.assertEqual(user.password_hash, self.password_hash)
+
+    def test_from_dict_defaults(self):
+        """Test missing fields get their defaults"""
+        user = User.from_dict(self.data)
+
+        self.assertEqual(user.settings, DEFAULT_SETTINGS)
+        self.assertIsNot(user.settings, DEFAULT_SETTINGS)
+        self.assertEqual(user.favorites, {"users": [], "projects": []})
+        self.assertTrue(user.is_open_to_more)
+        self.assertFalse(user.email_verified)
+
+    def test_hydrated_user_checks_password(self):
+        """Test a hydrated user can still verify its password"""
+        user = User.from_dict(self.data)
+
+        self.assertTrue(user.check_password("Password123"))
+        self.assertFalse(user.check_password("wrong"))
+
+    def test_user_without_password_hash(self):
+        """Test imported users without a password cannot log in"""
+        del self.data["password_hash"]
+        user = User.from_dict(self.data)
+
+        self.assertFalse(user.check_password("Password123"))
+
+if __name__ == '__main__':
+    unittest.main()